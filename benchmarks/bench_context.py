@@ -0,0 +1,72 @@
+"""
+检索上下文组装基准：直接拼接 vs 去重合并 vs token 预算
+
+    python -m benchmarks.bench_context                      # 预算 0（不限制）/ 1200 / 800
+    python -m benchmarks.bench_context --budgets 0 600 --k 5 10
+
+对标注集中的每条查询检索 k 个文本块，比较各方式的平均 token 数、压缩比，
+以及相关页面（标注页码）在上下文中的保留率。上下文中的 token 会被带进之后的每一轮 LLM 调用，
+token 数下降直接对应每轮提示词长度和首 token 延迟的下降。
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks.bench_retrieval import DEFAULT_QUERIES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检索上下文组装的 token 基准")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="标注查询集（JSON）")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, 1200, 800])
+    parser.add_argument("--k", type=int, nargs="+", default=[5])
+    args = parser.parse_args()
+
+    from src.rag.context import pack_context
+    from src.rag.metadata import build_metadata_filter
+    from src.rag.retriever import normalize_query, rag_system
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        labelled = json.load(f)
+
+    print(rag_system.initialize())
+    print(f"\n{'k':>3} {'方式':<12} {'平均tokens':>10} {'压缩':>7} {'片段':>6} {'相关页保留':>10} {'组装ms':>8}")
+
+    for k in args.k:
+        retrieved = []
+        for item in labelled:
+            where = build_metadata_filter(item.get("ticker"))
+            retrieved.append((item, rag_system._search(normalize_query(item["query"]), where, k)))
+
+        raw_tokens = []
+        for budget in args.budgets:
+            tokens, segments, kept, elapsed = [], [], [], []
+            for item, docs in retrieved:
+                start = time.perf_counter()
+                packed = pack_context(docs, budget)
+                elapsed.append((time.perf_counter() - start) * 1000)
+
+                tokens.append(packed.tokens)
+                segments.append(packed.segments)
+                if budget == args.budgets[0]:
+                    raw_tokens.append(packed.raw_tokens)
+
+                # 相关页保留率：检索结果中出现过的相关页，组装后仍在上下文中的比例
+                hit_pages = {doc.metadata.get("page") for doc in docs} & set(item["relevant_pages"])
+                if hit_pages:
+                    kept.append(sum(f"第 {page + 1} 页]" in packed.text for page in hit_pages) / len(hit_pages))
+
+            if budget == args.budgets[0]:
+                print(f"{k:>3} {'直接拼接':<12} {statistics.mean(raw_tokens):>10.0f} {'—':>7} {k:>6} {'1.000':>10} {'—':>8}")
+            label = f"预算 {budget}" if budget else "去重合并"
+            print(
+                f"{k:>3} {label:<12} {statistics.mean(tokens):>10.0f} "
+                f"{1 - sum(tokens) / sum(raw_tokens):>7.1%} {statistics.mean(segments):>6.1f} "
+                f"{statistics.mean(kept) if kept else 0:>10.3f} {statistics.mean(elapsed):>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+端到端基准：用模拟 LLM（benchmarks/mock_openai.py）驱动完整的代理图，
+测量不同并发下的延迟、吞吐、每个请求的 LLM 调用次数和内存
+
+    python -m benchmarks.bench_e2e --fake                                # /api/analyze，并发 1 4 16
+    python -m benchmarks.bench_e2e --fake --target stream --concurrency 1 8
+    python -m benchmarks.bench_e2e --fake --target financial            # 单项分析接口
+    python -m benchmarks.bench_e2e --fake --target direct               # 进程内调用 analyze_stock_investment
+    python -m benchmarks.bench_e2e --fake --sequential                  # 主管代理依次调用专家
+    SPECIALIST_PREFETCH=false python -m benchmarks.bench_e2e --fake       # 对比关闭数据预取（环境变量传给应用进程）
+    python -m benchmarks.bench_e2e --fake --record data/bench/llm_recording.jsonl --upstream https://api.deepseek.com/v1
+    python -m benchmarks.bench_e2e --fake --replay data/bench/llm_recording.jsonl
+
+模拟服务按脚本发起工具调用（工具真实执行：财报检索、行情、估值计算），工具结果返回后给出最终回复，
+延迟 = --latency + 输出 token 数 × --token-latency，抖动由请求内容决定。
+每个请求的问题带上序号（同一次运行内不重复、多次运行之间相同），避免专家合并和缓存影响测量，
+也让录制文件（mock_openai --record）可以在之后原样回放。
+
+每个并发级别先重置模拟服务的计数，再以闭环方式（每个并发槽完成一个请求后立即发下一个）发出 --requests 个请求：
+- 延迟 p50 / p95 / p99（stream 目标另外统计首 token 时间）和吞吐（请求 / 秒）
+- 每个请求的 LLM 调用次数和 token 数（模拟服务统计）
+- 应用进程的 RSS / PSS 和峰值 RSS（direct 目标为当前进程）
+
+分析结果缓存关闭、span 不写文件；--fake 时使用假向量和单独的索引目录（data/bench_indexes/e2e-fake）。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_startup import POLL_INTERVAL, _free_port, _request
+from benchmarks.bench_workers import _memory_mb, _percentile
+
+QUERIES = [
+    ("AAPL", "分析这支股票的投资价值"),
+    ("AAPL", "营收和利润率的变化趋势如何"),
+    ("MSFT", "当前估值是否合理"),
+    ("NVDA", "市场情绪和技术面怎么样"),
+]
+
+# 各目标对应的接口（direct 在进程内调用）
+TARGETS = {
+    "analyze": "/api/analyze",
+    "stream": "/api/analyze/stream",
+    "financial": "/api/analyze/financial",
+    "market": "/api/analyze/market",
+    "valuation": "/api/analyze/valuation",
+    "direct": None,
+}
+
+
+def _query(index: int) -> tuple:
+    ticker, question = QUERIES[index % len(QUERIES)]
+    return ticker, f"{question}（请求 {index}）"
+
+
+def _peak_rss_mb(pid: int) -> float:
+    """进程生命周期内的峰值 RSS（Linux VmHWM）"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _app_env(args, mock_url: str) -> dict:
+    """应用进程（或 direct 模式下本进程）的配置"""
+    env = {
+        "DEEPSEEK_API_KEY": "mock",
+        "DEEPSEEK_API_BASE": mock_url,
+        "RESPONSE_CACHE_ENABLED": "false",
+        "TRACING_EXPORT_PATH": "",
+        "PARALLEL_SPECIALISTS": "false" if args.sequential else "true",
+    }
+    if args.fake:
+        env["VECTOR_STORE_PATH"] = os.path.join("data", "bench_indexes", "e2e-fake")
+    return env
+
+
+# ============ 发送请求 ============
+
+async def _http_request(session, base_url: str, target: str, index: int) -> dict:
+    ticker, query = _query(index)
+    path = TARGETS[target]
+    start = time.perf_counter()
+    ttft = None
+    if target in ("analyze", "stream"):
+        request = session.post(f"{base_url}{path}", json={"stock_ticker": ticker, "query": query})
+    else:
+        request = session.post(f"{base_url}{path}", params={"stock_ticker": ticker, "query": query})
+
+    async with request as response:
+        ok = response.status == 200
+        if target == "stream":
+            async for line in response.content:
+                if ttft is None and line.startswith(b"event: token"):
+                    ttft = time.perf_counter() - start
+                elif line.startswith(b"event: error"):
+                    ok = False
+        else:
+            await response.read()
+    return {"ok": ok, "seconds": time.perf_counter() - start, "ttft": ttft}
+
+
+async def _direct_request(index: int) -> dict:
+    from src.agents.supervisor import analyze_stock_investment
+
+    ticker, query = _query(index)
+    start = time.perf_counter()
+    try:
+        result = await analyze_stock_investment(ticker, query)
+        ok = not result.startswith("分析失败")
+    except Exception:
+        ok = False
+    return {"ok": ok, "seconds": time.perf_counter() - start, "ttft": None}
+
+
+async def _run_level(args, base_url: str, concurrency: int, offset: int) -> tuple:
+    """闭环发送 args.requests 个请求，返回 (结果列表, 总耗时)"""
+    import aiohttp
+
+    counter = iter(range(offset, offset + args.requests))
+    results = []
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async def _worker():
+            for index in counter:
+                if args.target == "direct":
+                    results.append(await _direct_request(index))
+                else:
+                    results.append(await _http_request(session, base_url, args.target, index))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(_worker() for _ in range(concurrency)))
+        return results, time.perf_counter() - start
+
+
+# ============ 统计 ============
+
+def _summarize(results: list, elapsed: float, mock_stats: dict, pid: int) -> dict:
+    latencies = [r["seconds"] for r in results if r["ok"]]
+    ttfts = [r["ttft"] for r in results if r["ttft"] is not None]
+    requests = max(1, len(results))
+    rss, pss = _memory_mb(pid)
+    return {
+        "requests": len(results),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "p99": _percentile(latencies, 99),
+        "ttft_p50": _percentile(ttfts, 50) if ttfts else None,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "llm_calls": mock_stats["requests"] / requests,
+        "tool_calls": mock_stats["tool_call_responses"] / requests,
+        "tokens": (mock_stats["prompt_tokens"] + mock_stats["completion_tokens"]) / requests,
+        "replayed": mock_stats["replayed"],
+        "recorded": mock_stats["recorded"],
+        "rss_mb": rss,
+        "pss_mb": pss,
+        "peak_rss_mb": _peak_rss_mb(pid),
+    }
+
+
+def _print_header():
+    print(f"{'并发':>4}{'请求':>6}{'失败':>6}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'首token s':>10}"
+          f"{'吞吐 req/s':>11}{'LLM 调用/请求':>14}{'工具轮/请求':>12}{'tokens/请求':>12}"
+          f"{'RSS MB':>9}{'PSS MB':>9}{'峰值 MB':>9}")
+
+
+def _print_row(concurrency: int, r: dict):
+    ttft = f"{r['ttft_p50']:.2f}" if r["ttft_p50"] is not None else "-"
+    print(f"{concurrency:>4}{r['requests']:>6}{r['failed']:>6}{r['p50']:>8.2f}{r['p95']:>8.2f}{r['p99']:>8.2f}"
+          f"{ttft:>10}{r['throughput']:>11.2f}{r['llm_calls']:>14.1f}{r['tool_calls']:>12.1f}"
+          f"{r['tokens']:>12.0f}{r['rss_mb']:>9.0f}{r['pss_mb']:>9.0f}{r['peak_rss_mb']:>9.0f}")
+
+
+# ============ 主流程 ============
+
+def _start_mock(args, port: int) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "benchmarks.mock_openai", "--port", str(port),
+        "--latency", str(args.latency), "--token-latency", str(args.token_latency),
+        "--jitter", str(args.jitter), "--tool-rounds", str(args.tool_rounds),
+        "--tools-per-turn", str(args.tools_per_turn),
+    ]
+    if args.replay:
+        cmd += ["--replay", args.replay]
+    if args.record:
+        cmd += ["--record", args.record, "--upstream", args.upstream]
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _start_app(args, env: dict, port: int) -> subprocess.Popen:
+    # 与多工作进程基准共用应用子进程入口
+    cmd = [sys.executable, "-m", "benchmarks.bench_workers", "--serve", "app", "--port", str(port)]
+    if args.fake:
+        cmd.append("--fake")
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env={**os.environ, **env})
+
+
+def _wait(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while _request(url, timeout=5)[0] != 200:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} 进程退出")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} 未在 {timeout}s 内就绪")
+        time.sleep(POLL_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准（模拟 LLM）")
+    parser.add_argument("--target", choices=list(TARGETS), default="analyze", help="压测的接口")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="并发级别")
+    parser.add_argument("--requests", type=int, default=24, help="每个并发级别的请求数")
+    parser.add_argument("--sequential", action="store_true", help="主管代理依次调用专家（默认并行）")
+    parser.add_argument("--latency", type=float, default=0.4, help="模拟 LLM 首 token 前的延迟（秒）")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="模拟 LLM 每个输出 token 的时间（秒）")
+    parser.add_argument("--jitter", type=float, default=0.1, help="模拟 LLM 延迟抖动（秒）")
+    parser.add_argument("--tool-rounds", type=int, default=1, help="每个代理的工具调用轮数")
+    parser.add_argument("--tools-per-turn", type=int, default=3, help="每轮同时调用的工具数（顺序模式下主管一轮调用全部专家）")
+    parser.add_argument("--replay", default="", help="回放录制的对话和耗时")
+    parser.add_argument("--record", default="", help="转发给 --upstream 的真实服务并录制（API Key 取 UPSTREAM_API_KEY）")
+    parser.add_argument("--upstream", default="", help="录制时转发的服务地址")
+    parser.add_argument("--fake", action="store_true", help="使用假向量，无需下载模型")
+    parser.add_argument("--timeout", type=float, default=600, help="单个请求和等待就绪的超时时间（秒）")
+    parser.add_argument("--output", default="", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+    if args.record and not args.upstream:
+        parser.error("--record 需要同时指定 --upstream")
+
+    mock_port = _free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock = _start_mock(args, mock_port)
+    app = None
+    try:
+        _wait(f"{mock_url}/stats", mock, args.timeout)
+        env = _app_env(args, mock_url)
+
+        if args.target == "direct":
+            # 在导入配置之前设置环境变量
+            os.environ.update(env)
+            if args.fake:
+                from benchmarks.bench_retrieval import _install_fake_embeddings
+                _install_fake_embeddings()
+            from src.rag.retriever import rag_system
+            rag_system.initialize()
+            base_url, pid = None, os.getpid()
+        else:
+            app_port = _free_port()
+            base_url = f"http://127.0.0.1:{app_port}"
+            app = _start_app(args, env, app_port)
+            _wait(f"{base_url}/ready", app, args.timeout)
+            pid = app.pid
+
+        async def _run_all() -> list:
+            # 预热：第一次请求创建代理、加载检索缓存等，不计入结果
+            await _run_level(argparse.Namespace(**{**vars(args), "requests": 1}), base_url, 1, offset=-1)
+            rows = []
+            offset = 0
+            for concurrency in args.concurrency:
+                _request(f"{mock_url}/stats/reset", {})
+                results, elapsed = await _run_level(args, base_url, concurrency, offset)
+                offset += args.requests
+                summary = _summarize(results, elapsed, _request(f"{mock_url}/stats")[1], pid)
+                _print_row(concurrency, summary)
+                rows.append({"concurrency": concurrency, **summary})
+            return rows
+
+        mode = "顺序" if args.sequential else "并行"
+        print(f"目标 {args.target}（{mode}专家），模拟 LLM 延迟 {args.latency}s + {args.token_latency}s/token，"
+              f"每级 {args.requests} 个请求{'，回放 ' + args.replay if args.replay else ''}"
+              f"{'，录制到 ' + args.record if args.record else ''}")
+        _print_header()
+        rows = asyncio.run(_run_all())
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"args": vars(args), "levels": rows}, f, ensure_ascii=False, indent=2)
+    finally:
+        for process in (app, mock):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
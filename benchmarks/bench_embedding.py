@@ -0,0 +1,146 @@
+"""
+Embedding 阶段基准测试：吞吐量（块/s）与峰值内存
+
+    python -m benchmarks.bench_embedding                    # 1 / 10 / 100 份报告
+    python -m benchmarks.bench_embedding --reports 1 10     # 指定规模
+    python -m benchmarks.bench_embedding --fake             # 离线：使用确定性假向量
+
+每个规模在独立子进程中运行（峰值 RSS 是进程级单调值），分别测量：
+- streaming：EmbeddingStage 按批嵌入并写入，报告逐份生成
+- baseline ：先生成全部文本块，再一次性 Chroma.from_documents（旧实现）
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+CHUNKS_PER_REPORT = 300
+CHUNK_CHARS = 1000
+
+_WORDS = (
+    "revenue net income operating margin cash flow segment iPhone services "
+    "gross profit total assets liabilities shareholders equity dividend "
+    "fiscal year quarter guidance research development tax rate"
+).split()
+
+
+def _synthetic_reports(n_reports: int, seed: int = 0):
+    """逐份生成合成财报文本块，不在内存中保留整个语料"""
+    from langchain_core.documents import Document
+
+    rng = random.Random(seed)
+    for report in range(n_reports):
+        docs, ids = [], []
+        for chunk in range(CHUNKS_PER_REPORT):
+            words = []
+            while sum(len(w) + 1 for w in words) < CHUNK_CHARS:
+                words.append(rng.choice(_WORDS) if rng.random() > 0.2 else f"{rng.randint(1, 999999):,}")
+            docs.append(Document(
+                page_content=" ".join(words),
+                metadata={"company": f"T{report:04d}", "page": chunk // 5}
+            ))
+            ids.append(f"r{report}-c{chunk}")
+        yield docs, ids
+
+
+def _make_embeddings(fake: bool):
+    if fake:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=384)
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from config.settings import settings
+    return HuggingFaceEmbeddings(
+        model_name=settings.embedding_model_name,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+
+def _peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_worker(args):
+    from langchain_chroma import Chroma
+    from src.rag.embedding import EmbeddingStage
+
+    embeddings = _make_embeddings(args.fake)
+    # 预热模型，排除模型加载对内存基线的影响
+    embeddings.embed_documents(["warm up"])
+    rss_before = _peak_rss_mb()
+
+    with tempfile.TemporaryDirectory() as persist_dir:
+        start = time.perf_counter()
+
+        if args.mode == "streaming":
+            store = Chroma(embedding_function=embeddings, persist_directory=persist_dir)
+            stage = EmbeddingStage(store, batch_size=args.batch_size)
+            for docs, ids in _synthetic_reports(args.worker_reports):
+                stage.write(docs, ids)
+            chunks = stage.stats.chunks
+        else:
+            all_docs, all_ids = [], []
+            for docs, ids in _synthetic_reports(args.worker_reports):
+                all_docs.extend(docs)
+                all_ids.extend(ids)
+            Chroma.from_documents(all_docs, embeddings, ids=all_ids, persist_directory=persist_dir)
+            chunks = len(all_docs)
+
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "mode": args.mode,
+        "reports": args.worker_reports,
+        "chunks": chunks,
+        "seconds": round(elapsed, 2),
+        "chunks_per_second": round(chunks / elapsed, 1),
+        "baseline_rss_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding 阶段吞吐量与峰值内存基准")
+    parser.add_argument("--reports", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--modes", nargs="+", default=["streaming", "baseline"])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--fake", action="store_true", help="使用假向量，无需下载模型")
+    parser.add_argument("--worker-reports", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_reports is not None:
+        _run_worker(args)
+        return
+
+    print(f"{'mode':<10} {'reports':>7} {'chunks':>7} {'秒':>8} {'块/s':>8} {'基线MB':>8} {'峰值MB':>8}")
+    for n_reports in args.reports:
+        for mode in args.modes:
+            cmd = [
+                sys.executable, "-m", "benchmarks.bench_embedding",
+                "--worker-reports", str(n_reports), "--mode", mode,
+                "--batch-size", str(args.batch_size),
+            ]
+            if args.fake:
+                cmd.append("--fake")
+            output = subprocess.run(cmd, capture_output=True, text=True, env=os.environ.copy())
+            if output.returncode != 0:
+                print(f"{mode:<10} {n_reports:>7} 失败: {output.stderr.strip().splitlines()[-1:]}")
+                continue
+            r = json.loads(output.stdout.strip().splitlines()[-1])
+            print(
+                f"{r['mode']:<10} {r['reports']:>7} {r['chunks']:>7} {r['seconds']:>8} "
+                f"{r['chunks_per_second']:>8} {r['baseline_rss_mb']:>8} {r['peak_rss_mb']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+技术指标引擎基准测试
+
+    python -m benchmarks.bench_indicators                        # 5000 只股票 × 10 年日线
+    python -m benchmarks.bench_indicators --tickers 500 --days 252
+
+分别测量：
+- full     ：compute_indicators 生成全部指标的完整序列
+- state    ：IndicatorState.from_history 只递推到最新一根 K 线
+- update   ：新 K 线到来时的增量更新 + 读取最新指标
+- per-ticker：逐只股票调用（对照组，模拟未向量化的实现）
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+def _timeit(func, repeat: int = 1) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="技术指标引擎基准")
+    parser.add_argument("--tickers", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=2520)
+    parser.add_argument("--updates", type=int, default=20)
+    parser.add_argument("--per-ticker-sample", type=int, default=100, help="对照组实际运行的股票数，结果按比例外推")
+    args = parser.parse_args()
+
+    from src.market.indicators import IndicatorState, compute_indicators
+
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, size=(args.tickers, args.days)), axis=1))
+    tickers = [f"T{i:05d}" for i in range(args.tickers)]
+    bars = args.tickers * args.days
+    print(f"数据: {args.tickers} 只股票 × {args.days} 根 K 线（{bars:,} 根，{close.nbytes / 1e6:.0f} MB）")
+
+    seconds = _timeit(lambda: compute_indicators(close))
+    print(f"full       : {seconds:8.2f}s  {bars / seconds / 1e6:8.1f} M 根/s")
+
+    seconds = _timeit(lambda: IndicatorState.from_history(tickers, close))
+    print(f"state      : {seconds:8.2f}s  {bars / seconds / 1e6:8.1f} M 根/s")
+
+    state = IndicatorState.from_history(tickers, close[:, :-args.updates])
+    new_bars = close[:, -args.updates:]
+    start = time.perf_counter()
+    for t in range(args.updates):
+        state.update(new_bars[:, t])
+        state.latest()
+    per_update = (time.perf_counter() - start) / args.updates
+    print(f"update     : {per_update * 1000:8.2f}ms / 根新 K 线（全部 {args.tickers} 只股票）")
+
+    sample = min(args.per_ticker_sample, args.tickers)
+    seconds = _timeit(lambda: [compute_indicators(close[i]) for i in range(sample)])
+    print(f"per-ticker : {seconds * args.tickers / sample:8.2f}s  （按 {sample} 只外推）")
+
+
+if __name__ == "__main__":
+    main()
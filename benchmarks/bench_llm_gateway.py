@@ -0,0 +1,122 @@
+"""
+LLM 网关基准：突发负载下直连（ChatOpenAI 默认行为）与经过网关的对比
+
+    python -m benchmarks.bench_llm_gateway
+    python -m benchmarks.bench_llm_gateway --interactive 20 --batch 80 --server-concurrency 8 --gateway-concurrency 8
+
+启动本地模拟服务（benchmarks/mock_openai.py），模拟服务端限流：同时处理的请求超过
+--server-concurrency 时返回 429。同时发起一批 interactive 请求和一批 batch 请求（批量分析通道），统计：
+- 成功 / 失败数、总耗时
+- 服务端收到的请求数与 429 次数（重试堆积的程度）
+- 各通道延迟 p50 / p95（interactive 应明显优先于 batch）
+- 网关的排队等待和重试次数
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_startup import _free_port, _request
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "mock")
+
+
+def _percentile(values, pct):
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def _run_load(args, gateway_enabled: bool) -> dict:
+    from langchain_core.messages import HumanMessage
+    from config.settings import settings
+    import src.core.llm_gateway as llm_gateway
+    from src.core.llm import get_deepseek_llm
+
+    settings.llm_gateway_enabled = gateway_enabled
+    settings.llm_max_concurrency = args.gateway_concurrency
+    settings.llm_batch_max_concurrency = max(1, args.gateway_concurrency // 2)
+    llm_gateway._gateway = None
+    llm = get_deepseek_llm()
+
+    latencies = {llm_gateway.INTERACTIVE: [], llm_gateway.BATCH: []}
+    failures = {llm_gateway.INTERACTIVE: 0, llm_gateway.BATCH: 0}
+
+    async def _call(lane: str, i: int):
+        with llm_gateway.llm_priority(lane):
+            start = time.perf_counter()
+            try:
+                await llm.ainvoke([HumanMessage(content=f"请分析第 {i} 只股票的投资价值。")])
+                latencies[lane].append(time.perf_counter() - start)
+            except Exception:
+                failures[lane] += 1
+
+    start = time.perf_counter()
+    # batch 先发起，interactive 随后到达，检验优先级
+    tasks = [asyncio.create_task(_call(llm_gateway.BATCH, i)) for i in range(args.batch)]
+    await asyncio.sleep(0.05)
+    tasks += [asyncio.create_task(_call(llm_gateway.INTERACTIVE, i)) for i in range(args.interactive)]
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    result = {"elapsed": elapsed, "latencies": latencies, "failures": failures}
+    if gateway_enabled:
+        result["gateway"] = llm_gateway.get_llm_gateway().stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 网关突发负载基准")
+    parser.add_argument("--interactive", type=int, default=20, help="interactive 请求数")
+    parser.add_argument("--batch", type=int, default=60, help="batch 请求数")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟服务的响应延迟（秒）")
+    parser.add_argument("--server-concurrency", type=int, default=8, help="模拟服务允许的并发数，超过返回 429")
+    parser.add_argument("--gateway-concurrency", type=int, default=8, help="网关并发上限")
+    args = parser.parse_args()
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_openai", "--port", str(port), "--latency", str(args.latency),
+         "--max-concurrency", str(args.server_concurrency)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        while _request(f"{base_url}/stats", timeout=2)[0] != 200:
+            time.sleep(0.1)
+
+        from config.settings import settings
+        settings.deepseek_api_base = base_url
+
+        print(f"{'mode':<9}{'成功':>6}{'失败':>6}{'耗时 s':>9}{'服务端请求':>11}{'429':>6}"
+              f"{'交互 p50':>10}{'交互 p95':>10}{'批量 p50':>10}{'批量 p95':>10}")
+        for mode in ("direct", "gateway"):
+            _request(f"{base_url}/stats/reset", {})
+            result = asyncio.run(_run_load(args, gateway_enabled=(mode == "gateway")))
+            server_stats = _request(f"{base_url}/stats")[1]
+            interactive, batch = result["latencies"]["interactive"], result["latencies"]["batch"]
+            print(
+                f"{mode:<9}{len(interactive) + len(batch):>6}{sum(result['failures'].values()):>6}"
+                f"{result['elapsed']:>9.2f}{server_stats['requests']:>11}{server_stats['rate_limited']:>6}"
+                f"{_percentile(interactive, 50):>10.2f}{_percentile(interactive, 95):>10.2f}"
+                f"{_percentile(batch, 50):>10.2f}{_percentile(batch, 95):>10.2f}"
+            )
+            if "gateway" in result:
+                gateway = result["gateway"]
+                for lane, lane_stats in gateway["lanes"].items():
+                    print(f"{'':<9}{lane}: 最大排队 {lane_stats['max_queued']}，"
+                          f"平均等待 {lane_stats['wait_avg_ms']:.0f}ms，p95 等待 {lane_stats['wait_p95_ms']:.0f}ms")
+                print(f"{'':<9}重试 {gateway['retries']} 次，收到 429 {gateway['rate_limited']} 次")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+行情存储基准测试：CSV 导入耗时与报价 / 历史查询延迟
+
+    python -m benchmarks.bench_market_quotes                     # 5000 只股票 × 252 个交易日
+    python -m benchmarks.bench_market_quotes --tickers 1000 --days 2520
+
+合成数据写入临时目录，不影响 data/market_data。
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def _write_csvs(directory: Path, n_tickers: int, n_days: int, tickers_per_file: int = 500, seed: int = 0):
+    """生成带 ticker 列的合成日线 CSV（每个文件多只股票）"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2015-01-01", periods=n_days)
+    tickers = [f"T{i:05d}" for i in range(n_tickers)]
+
+    for file_index in range(0, n_tickers, tickers_per_file):
+        batch = tickers[file_index:file_index + tickers_per_file]
+        returns = rng.normal(0.0003, 0.02, size=(len(batch), n_days))
+        close = 100 * np.exp(np.cumsum(returns, axis=1))
+        frame = pd.DataFrame({
+            "ticker": np.repeat(batch, n_days),
+            "date": np.tile(dates.strftime("%Y-%m-%d"), len(batch)),
+            "open": (close * (1 + rng.normal(0, 0.003, close.shape))).ravel(),
+            "high": (close * 1.01).ravel(),
+            "low": (close * 0.99).ravel(),
+            "close": close.ravel(),
+            "volume": rng.integers(1e5, 1e7, size=close.shape).ravel(),
+        })
+        frame.to_csv(directory / f"prices_{file_index:05d}.csv", index=False)
+    return tickers
+
+
+def _latency_us(func, keys, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        key = random.choice(keys)
+        start = time.perf_counter()
+        func(key)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.fmean(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="行情存储导入与查询基准")
+    parser.add_argument("--tickers", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=252)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    from src.market.store import MarketDataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_dir = Path(tmp) / "csv"
+        csv_dir.mkdir()
+        start = time.perf_counter()
+        tickers = _write_csvs(csv_dir, args.tickers, args.days)
+        print(f"生成 CSV: {args.tickers} 只股票 × {args.days} 天，{time.perf_counter() - start:.2f}s")
+
+        store = MarketDataStore(str(Path(tmp) / "store"))
+        stats = store.import_csv(csv_dir)
+        print(f"导入: {stats.rows:,} 行，{stats.elapsed_seconds:.2f}s（{stats.rows / stats.elapsed_seconds:,.0f} 行/s）")
+
+        start = time.perf_counter()
+        store = MarketDataStore(str(Path(tmp) / "store"))
+        print(f"冷启动加载快照: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        mean, p99 = _latency_us(store.get_quote, tickers, args.lookups)
+        print(f"get_quote:   平均 {mean:.2f}µs，p99 {p99:.2f}µs（{args.lookups:,} 次随机查询）")
+
+        mean, p99 = _latency_us(store.get_history, tickers, min(args.lookups, 10_000))
+        print(f"get_history: 平均 {mean:.2f}µs，p99 {p99:.2f}µs（含内存映射打开）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+蒙特卡洛估值基准测试：耗时、峰值内存与可复现性
+
+    python -m benchmarks.bench_monte_carlo                         # 10^5 / 10^6 / 10^7 条路径
+    python -m benchmarks.bench_monte_carlo --paths 1000000 --workers 1 4
+
+峰值 RSS 是进程级单调值，按路径数从小到大运行时，每行反映截至该行的最大内存。
+"""
+
+import argparse
+import resource
+import time
+
+
+def _peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="蒙特卡洛估值基准")
+    parser.add_argument("--paths", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 0], help="0 表示全部 CPU 核")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from src.valuation.monte_carlo import SimulationParams, run_monte_carlo
+
+    params = SimulationParams(
+        revenue=25.0,
+        margin_mean=0.25, margin_std=0.03,
+        growth_mean=0.08, growth_std=0.03,
+        discount_mean=0.09, discount_std=0.01,
+    )
+
+    print(f"{'paths':>12} {'workers':>8} {'秒':>8} {'M 路径/s':>10} {'均值':>9} {'P50':>9} {'峰值MB':>8}")
+    reference = {}
+    for paths in sorted(args.paths):
+        for workers in args.workers:
+            start = time.perf_counter()
+            result = run_monte_carlo(params, paths=paths, seed=args.seed, price=150.0, workers=workers)
+            seconds = time.perf_counter() - start
+            print(
+                f"{paths:>12,} {result.workers:>8} {seconds:>8.3f} {paths / seconds / 1e6:>10.2f} "
+                f"{result.mean:>9.3f} {result.percentiles[50]:>9.3f} {_peak_rss_mb():>8.1f}"
+            )
+
+            # 同一 seed 在不同进程数下的分位数应完全一致
+            previous = reference.setdefault(paths, result.percentiles)
+            if previous != result.percentiles:
+                print(f"⚠️ {paths:,} 条路径在 {result.workers} 个进程下结果与单进程不一致")
+
+
+if __name__ == "__main__":
+    main()
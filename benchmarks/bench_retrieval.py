@@ -0,0 +1,266 @@
+"""
+检索质量与延迟基准：纯向量 / BM25 / 混合（RRF）/ 混合 + 重排，以及向量索引后端对比
+
+    python -m benchmarks.bench_retrieval                               # 当前配置的向量后端
+    python -m benchmarks.bench_retrieval --k 1 5 10 --modes dense hybrid
+    python -m benchmarks.bench_retrieval --reranker cross-encoder/ms-marco-MiniLM-L-6-v2
+    python -m benchmarks.bench_retrieval --backends chroma faiss:flat faiss:sq8 faiss:sq4
+
+标注集 benchmarks/retrieval_queries.json 中每条查询标注了答案所在的页码（从 0 开始，与文本块元数据一致）。
+recall@k = 前 k 个文本块覆盖的相关页数 / 相关页总数，按查询取平均；MRR 按第一个相关文本块的排名计算。
+
+每个后端在 data/bench_indexes/<后端> 下独立建索引，建索引和测量分别在独立子进程中运行：
+- 加载耗时：打开向量索引并完成第一次检索
+- 内存：打开索引并跑完全部查询后常驻内存（RSS）的增量
+- 重合率：dense 模式前 k 个结果与 Chroma 结果的重合比例（量化 / 近似索引相对现有实现的召回）
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), "retrieval_queries.json")
+DEFAULT_INDEX_ROOT = os.path.join("data", "bench_indexes")
+
+# 不属于向量索引本身的文件（关键词索引、报表数据、清单）
+_NON_VECTOR_FILES = ("bm25_index.sqlite3", "financial_statements.sqlite3", "index_manifest.json")
+
+
+def _percentile(values, pct):
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _rss_mb() -> float:
+    """当前常驻内存（Linux）"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _vector_index_mb(root: str, backend: str) -> float:
+    """向量索引的磁盘占用"""
+    total = 0
+    for directory, _, files in os.walk(root):
+        in_faiss = os.path.basename(directory) == "faiss"
+        for name in files:
+            if name in _NON_VECTOR_FILES or in_faiss != backend.startswith("faiss"):
+                continue
+            total += os.path.getsize(os.path.join(directory, name))
+    return total / 1024 / 1024
+
+
+def _search_fn(rag, mode: str):
+    """各检索模式：返回 (规范化查询, where, k) -> 文本块列表"""
+    from langchain_core.documents import Document
+    from config.settings import settings
+
+    def dense(query, where, k):
+        return rag.vectorstore.similarity_search_by_vector(rag.embed_query(query), k=k, filter=where)
+
+    def bm25(query, where, k):
+        ids = [chunk_id for chunk_id, _ in rag.keyword_index.search(query, where, limit=k)]
+        if not ids:
+            return []
+        fetched = rag.vectorstore.get(ids=ids, include=["metadatas"])
+        by_id = {cid: Document(page_content="", metadata=m or {}, id=cid)
+                 for cid, m in zip(fetched["ids"], fetched["metadatas"])}
+        return [by_id[cid] for cid in ids if cid in by_id]
+
+    def hybrid(query, where, k):
+        return rag._search(query, where, k)
+
+    settings.rag_hybrid_enabled = mode in ("hybrid", "rerank")
+    return {"dense": dense, "bm25": bm25, "hybrid": hybrid, "rerank": hybrid}[mode]
+
+
+def _evaluate(rag, labelled, modes, ks, reranker):
+    """在已打开的 RAGSystem 上跑全部检索模式"""
+    from config.settings import settings
+    from src.rag.metadata import build_metadata_filter
+    from src.rag.retriever import normalize_query
+
+    max_k = max(ks)
+    results = {}
+    for mode in modes:
+        settings.rag_reranker_model = reranker if mode == "rerank" else ""
+        if mode == "rerank" and rag._get_reranker() is None:
+            continue
+        search = _search_fn(rag, mode)
+        rag.clear_cache()
+
+        recalls = {k: [] for k in ks}
+        reciprocal_ranks, latencies, rankings = [], [], []
+        for item in labelled:
+            relevant = set(item["relevant_pages"])
+            where = build_metadata_filter(item.get("ticker"))
+
+            start = time.perf_counter()
+            docs = search(normalize_query(item["query"]), where, max_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            rankings.append([doc.id for doc in docs])
+            pages = [doc.metadata.get("page") for doc in docs]
+            for k in ks:
+                recalls[k].append(len(relevant & set(pages[:k])) / len(relevant))
+            first_hit = next((rank for rank, page in enumerate(pages, 1) if page in relevant), None)
+            reciprocal_ranks.append(1 / first_hit if first_hit else 0.0)
+
+        results[mode] = {
+            "recall": {str(k): statistics.mean(recalls[k]) for k in ks},
+            "mrr": statistics.mean(reciprocal_ranks),
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "rankings": rankings,
+        }
+    return results
+
+
+def _install_fake_embeddings():
+    """离线运行：用确定性假向量替换 HuggingFace 模型（须在导入 RAGSystem 之前调用）"""
+    import langchain_huggingface
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    class _FakeEmbeddings(DeterministicFakeEmbedding):
+        """与 normalize_embeddings=True 一致，输出单位向量"""
+
+        def __init__(self, **kwargs):
+            super().__init__(size=384)
+
+        def _get_embedding(self, seed: int):
+            vector = super()._get_embedding(seed)
+            norm = sum(v * v for v in vector) ** 0.5
+            return [v / norm for v in vector]
+
+    langchain_huggingface.HuggingFaceEmbeddings = _FakeEmbeddings
+
+
+def _run_worker(args):
+    """子进程：按环境变量中的后端建索引（build）或测量（measure），结果以 JSON 输出"""
+    if args.fake:
+        _install_fake_embeddings()
+    from src.rag.retriever import rag_system
+
+    if args.worker == "build":
+        start = time.perf_counter()
+        rag_system.initialize()
+        print(json.dumps({"build_seconds": time.perf_counter() - start}))
+        return
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        labelled = json.load(f)
+
+    # 预热 embedding 模型，排除模型本身对内存和加载耗时的影响
+    probe = rag_system.embed_query(labelled[0]["query"])
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    rag_system._open_vectorstore()
+    rag_system.vectorstore.similarity_search_by_vector(probe, k=1)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    results = _evaluate(rag_system, labelled, args.modes, args.k, args.reranker)
+    print(json.dumps({"load_ms": load_ms, "rss_mb": _rss_mb() - rss_before, "modes": results}))
+
+
+def _run_backend(args, backend: str, phase: str) -> dict:
+    name, _, index_type = backend.partition(":")
+    env = os.environ.copy()
+    env["VECTOR_BACKEND"] = name
+    env["VECTOR_STORE_PATH"] = os.path.join(args.index_root, backend.replace(":", "-"))
+    if index_type:
+        env["FAISS_INDEX_TYPE"] = index_type
+
+    cmd = [
+        sys.executable, "-m", "benchmarks.bench_retrieval", "--worker", phase,
+        "--queries", args.queries, "--reranker", args.reranker,
+        "--k", *map(str, args.k), "--modes", *args.modes,
+    ]
+    if args.fake:
+        cmd.append("--fake")
+    output = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "子进程失败")
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    result["disk_mb"] = _vector_index_mb(env["VECTOR_STORE_PATH"], backend)
+    return result
+
+
+def _print_modes(label: str, results: dict, ks):
+    header = f"{'mode':<8}" + "".join(f"{'R@' + str(k):>8}" for k in ks)
+    print(f"\n[{label}]\n{header}{'MRR':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for mode, r in results.items():
+        row = f"{mode:<8}" + "".join(f"{r['recall'][str(k)]:>8.3f}" for k in ks)
+        print(f"{row}{r['mrr']:>8.3f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="混合检索召回率与延迟基准")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="标注查询集（JSON）")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--modes", nargs="+", default=["dense", "bm25", "hybrid", "rerank"])
+    parser.add_argument("--reranker", default="cross-encoder/ms-marco-MiniLM-L-6-v2", help="rerank 模式使用的模型")
+    parser.add_argument("--backends", nargs="+", help="对比的向量后端，如 chroma faiss:sq8（不指定时使用当前配置）")
+    parser.add_argument("--index-root", default=DEFAULT_INDEX_ROOT, help="后端对比时的索引目录")
+    parser.add_argument("--fake", action="store_true", help="使用假向量，无需下载模型")
+    parser.add_argument("--worker", choices=["build", "measure"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _run_worker(args)
+        return
+
+    if not args.backends:
+        if args.fake:
+            _install_fake_embeddings()
+        from src.rag.retriever import rag_system
+
+        with open(args.queries, "r", encoding="utf-8") as f:
+            labelled = json.load(f)
+        print(rag_system.initialize())
+        _print_modes("当前配置", _evaluate(rag_system, labelled, args.modes, args.k, args.reranker), args.k)
+        return
+
+    reports = {}
+    for backend in args.backends:
+        try:
+            build = _run_backend(args, backend, "build")
+            reports[backend] = {**_run_backend(args, backend, "measure"), "build_seconds": build["build_seconds"]}
+        except Exception as e:
+            print(f"⚠️ {backend} 失败: {e}")
+
+    # 以 Chroma（现有实现）的 dense 结果为参照计算重合率
+    baseline = reports.get("chroma", {}).get("modes", {}).get("dense")
+    overlap_k = min(10, max(args.k))
+    print(f"\n{'backend':<12}{'建索引 s':>10}{'磁盘 MB':>9}{'加载 ms':>9}{'内存 MB':>9}{'dense R@' + str(overlap_k):>12}"
+          f"{'重合@' + str(overlap_k):>10}")
+    for backend, report in reports.items():
+        dense = report["modes"].get("dense")
+        overlap = "—"
+        if baseline and dense:
+            shares = [
+                len(set(a[:overlap_k]) & set(b[:overlap_k])) / max(len(b[:overlap_k]), 1)
+                for a, b in zip(dense["rankings"], baseline["rankings"])
+            ]
+            overlap = f"{statistics.mean(shares):.3f}"
+        recall = f"{dense['recall'][str(overlap_k)]:.3f}" if dense and str(overlap_k) in dense["recall"] else "—"
+        print(
+            f"{backend:<12}{report['build_seconds']:>10.1f}{report['disk_mb']:>9.2f}"
+            f"{report['load_ms']:>9.1f}{report['rss_mb']:>9.1f}{recall:>12}{overlap:>10}"
+        )
+
+    for backend, report in reports.items():
+        _print_modes(backend, report["modes"], args.k)
+
+
+if __name__ == "__main__":
+    main()
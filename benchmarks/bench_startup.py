@@ -0,0 +1,134 @@
+"""
+冷启动基准：从启动进程到 /health、（可选）缓存命中请求、/ready 的耗时
+
+    python -m benchmarks.bench_startup                       # 冷启动 3 次
+    python -m benchmarks.bench_startup --runs 5 --fake       # 假向量，无需下载模型
+    python -m benchmarks.bench_startup --query "苹果公司是否值得投资？" --ticker AAPL
+
+每次启动一个独立的服务进程，以固定间隔轮询：
+- 开始服务：/health 第一次返回 200（进程可以接受请求）
+- 缓存请求：指定 --query 时，开始服务后立即发起一次 /api/analyze，
+  问题已在分析缓存中时应在预热完成前返回（先正常跑一次分析写入缓存）
+- 就绪：/ready 第一次返回 200（embedding 模型、索引和代理预热完成）
+
+同时输出 /ready 返回的各阶段耗时。
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+POLL_INTERVAL = 0.05
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _request(url: str, payload: dict = None, timeout: float = 600):
+    """返回 (状态码, JSON 响应)；连接失败时状态码为 None"""
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null")
+    except (urllib.error.URLError, ConnectionError):
+        return None, None
+
+
+def _serve(args):
+    """子进程：启动服务"""
+    if args.fake:
+        from benchmarks.bench_retrieval import _install_fake_embeddings
+        _install_fake_embeddings()
+    import uvicorn
+    from main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def _run_once(args) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    cmd = [sys.executable, "-m", "benchmarks.bench_startup", "--serve", "--port", str(port)]
+    if args.fake:
+        cmd.append("--fake")
+
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ.copy())
+    result = {}
+    try:
+        while _request(f"{base_url}/health", timeout=5)[0] != 200:
+            if process.poll() is not None:
+                raise RuntimeError("服务进程退出")
+            time.sleep(POLL_INTERVAL)
+        result["serving"] = time.perf_counter() - start
+
+        if args.query:
+            status, body = _request(f"{base_url}/api/analyze", {"stock_ticker": args.ticker, "query": args.query})
+            result["first_analysis"] = time.perf_counter() - start
+            result["first_cached"] = bool(body and body.get("cached"))
+
+        while True:
+            status, body = _request(f"{base_url}/ready", timeout=5)
+            if status == 200:
+                break
+            if body and body.get("error"):
+                raise RuntimeError(f"预热失败: {body['error']}")
+            time.sleep(POLL_INTERVAL)
+        result["ready"] = time.perf_counter() - start
+        result["phases"] = body["phases"]
+    finally:
+        process.terminate()
+        process.wait()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动耗时基准")
+    parser.add_argument("--runs", type=int, default=3, help="冷启动次数")
+    parser.add_argument("--query", help="开始服务后立即发起的分析问题（应已在缓存中）")
+    parser.add_argument("--ticker", default="AAPL")
+    parser.add_argument("--fake", action="store_true", help="使用假向量，无需下载模型")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args)
+        return
+
+    runs = []
+    for i in range(args.runs):
+        run = _run_once(args)
+        runs.append(run)
+        line = f"run {i + 1}: 开始服务 {run['serving']:.2f}s"
+        if "first_analysis" in run:
+            line += f"，首个分析请求 {run['first_analysis']:.2f}s（{'缓存命中' if run['first_cached'] else '未命中'}）"
+        print(f"{line}，就绪 {run['ready']:.2f}s")
+
+    print(f"\n{'指标':<14}{'均值 s':>9}{'最小 s':>9}{'最大 s':>9}")
+    metrics = ["serving", "first_analysis", "ready"] if args.query else ["serving", "ready"]
+    for metric in metrics:
+        values = [run[metric] for run in runs]
+        print(f"{metric:<14}{statistics.mean(values):>9.2f}{min(values):>9.2f}{max(values):>9.2f}")
+
+    print("\n/ready 阶段耗时（均值）")
+    for phase in runs[0]["phases"]:
+        values = [run["phases"].get(phase, 0.0) for run in runs]
+        print(f"  {phase:<16}{statistics.mean(values):>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+多工作进程内存基准：每个进程各自加载（local）与共享检索服务（service）对比
+
+    python -m benchmarks.bench_workers                        # 4 个工作进程，两种模式
+    python -m benchmarks.bench_workers --workers 2 8 --fake   # 假向量，无需下载模型
+
+每种模式下启动若干个独立的应用进程（相当于 uvicorn --workers N 的各个工作进程，
+但可以逐个发送请求），service 模式另外启动一个检索服务进程。
+每个工作进程跑一遍 /api/rag/query 后统计：
+- RSS 合计：各进程常驻内存之和（共享页会被重复计算）
+- PSS 合计：按共享进程数分摊后的内存之和（更接近实际占用）
+- 检索延迟：/api/rag/query 的 p50 / p95（service 模式多一次本机调用）
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_startup import POLL_INTERVAL, _free_port, _request
+
+QUERIES = [
+    "total net sales", "research and development expense", "iPhone revenue",
+    "gross margin percentage", "share repurchase program", "cash and cash equivalents",
+]
+
+
+def _percentile(values, pct):
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _memory_mb(pid: int) -> tuple:
+    """(RSS, PSS)，单位 MB（Linux）"""
+    rss = pss = 0
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Rss:"):
+                rss = int(line.split()[1])
+            elif line.startswith("Pss:"):
+                pss = int(line.split()[1])
+    return rss / 1024, pss / 1024
+
+
+def _serve(args):
+    """子进程：启动应用（--serve app）或检索服务（--serve rag）"""
+    if args.fake:
+        from benchmarks.bench_retrieval import _install_fake_embeddings
+        _install_fake_embeddings()
+    import uvicorn
+
+    if args.serve == "rag":
+        from src.rag.service import app
+        uvicorn.run(app, uds=args.uds, log_level="warning")
+    else:
+        from main import app
+        uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def _spawn(args, role: str, env: dict, port: int = None, uds: str = None) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "benchmarks.bench_workers", "--serve", role]
+    if port:
+        cmd += ["--port", str(port)]
+    if uds:
+        cmd += ["--uds", uds]
+    if args.fake:
+        cmd.append("--fake")
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while _request(f"{url}/ready", timeout=5)[0] != 200:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} 进程退出")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} 未在 {timeout}s 内就绪")
+        time.sleep(POLL_INTERVAL)
+
+
+def _run_mode(args, mode: str, workers: int) -> dict:
+    env = os.environ.copy()
+    processes = []
+    start = time.perf_counter()
+    try:
+        if mode == "service":
+            uds = os.path.join(tempfile.mkdtemp(), "rag.sock")
+            env["RAG_SERVICE_URL"] = f"unix://{uds}"
+            service = _spawn(args, "rag", env, uds=uds)
+            processes.append(service)
+        else:
+            env.pop("RAG_SERVICE_URL", None)
+
+        urls = []
+        for _ in range(workers):
+            port = _free_port()
+            processes.append(_spawn(args, "app", env, port=port))
+            urls.append(f"http://127.0.0.1:{port}")
+        for url, process in zip(urls, processes[-workers:]):
+            _wait_ready(url, process, args.timeout)
+        ready_seconds = time.perf_counter() - start
+
+        latencies = []
+        for url in urls:
+            for query in QUERIES:
+                query_start = time.perf_counter()
+                status, _ = _request(f"{url}/api/rag/query?query={query.replace(' ', '+')}&stock_ticker=AAPL", {})
+                if status != 200:
+                    raise RuntimeError(f"{url} 检索失败: HTTP {status}")
+                latencies.append((time.perf_counter() - query_start) * 1000)
+
+        memory = [_memory_mb(p.pid) for p in processes]
+        return {
+            "ready_seconds": ready_seconds,
+            "rss_mb": sum(m[0] for m in memory),
+            "pss_mb": sum(m[1] for m in memory),
+            "per_process_pss": [round(m[1], 1) for m in memory],
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多工作进程内存基准")
+    parser.add_argument("--workers", type=int, nargs="+", default=[4], help="工作进程数")
+    parser.add_argument("--modes", nargs="+", default=["local", "service"], choices=["local", "service"])
+    parser.add_argument("--timeout", type=float, default=600, help="等待就绪的超时时间（秒）")
+    parser.add_argument("--fake", action="store_true", help="使用假向量，无需下载模型")
+    parser.add_argument("--serve", choices=["app", "rag"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--uds", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args)
+        return
+
+    print(f"{'mode':<9}{'workers':>8}{'就绪 s':>9}{'RSS 合计 MB':>13}{'PSS 合计 MB':>13}{'p50 ms':>9}{'p95 ms':>9}")
+    for workers in args.workers:
+        for mode in args.modes:
+            try:
+                r = _run_mode(args, mode, workers)
+            except Exception as e:
+                print(f"⚠️ {mode} × {workers} 失败: {e}")
+                continue
+            print(
+                f"{mode:<9}{workers:>8}{r['ready_seconds']:>9.1f}{r['rss_mb']:>13.0f}{r['pss_mb']:>13.0f}"
+                f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+            )
+            print(f"{'':<17}各进程 PSS: {r['per_process_pss']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+负载测试：分析请求运行期间 /health 的响应延迟
+
+在服务已启动的情况下运行：
+    python -m benchmarks.load_health --base-url http://127.0.0.1:8000 --analyses 8
+
+脚本会并发发起若干个 /api/analyze 请求，同时以固定间隔轮询 /health，
+最后输出健康检查的 p50 / p95 / 最大延迟。事件循环未被阻塞时，
+健康检查延迟应保持在毫秒级，而不是随分析耗时增长。
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+
+def _percentile(values, pct):
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def _run_analysis(session, base_url, ticker, query, results):
+    start = time.perf_counter()
+    async with session.post(
+            f"{base_url}/api/analyze",
+            json={"stock_ticker": ticker, "query": query}
+    ) as response:
+        await response.read()
+        results.append((response.status, time.perf_counter() - start))
+
+
+async def _poll_health(session, base_url, interval, stop_event, latencies):
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        async with session.get(f"{base_url}/health") as response:
+            await response.read()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def main(args):
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        # 空载基线
+        baseline = []
+        for _ in range(20):
+            start = time.perf_counter()
+            async with session.get(f"{args.base_url}/health") as response:
+                await response.read()
+            baseline.append((time.perf_counter() - start) * 1000)
+
+        analysis_results = []
+        health_latencies = []
+        stop_event = asyncio.Event()
+
+        poller = asyncio.create_task(
+            _poll_health(session, args.base_url, args.interval, stop_event, health_latencies)
+        )
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            _run_analysis(session, args.base_url, args.ticker, args.query, analysis_results)
+            for _ in range(args.analyses)
+        ))
+        elapsed = time.perf_counter() - start
+        stop_event.set()
+        await poller
+
+    print("=" * 60)
+    print(f"分析请求: {args.analyses} 个并发，总耗时 {elapsed:.2f}s")
+    print(f"  状态码: {sorted({status for status, _ in analysis_results})}")
+    if analysis_results:
+        print(f"  平均耗时: {statistics.mean(t for _, t in analysis_results):.2f}s")
+    print(f"/health 空载: p50={_percentile(baseline, 50):.1f}ms  p95={_percentile(baseline, 95):.1f}ms")
+    print(
+        f"/health 负载: n={len(health_latencies)}  "
+        f"p50={_percentile(health_latencies, 50):.1f}ms  "
+        f"p95={_percentile(health_latencies, 95):.1f}ms  "
+        f"max={max(health_latencies, default=0):.1f}ms"
+    )
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="分析负载下的健康检查延迟测试")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--analyses", type=int, default=8, help="并发分析请求数")
+    parser.add_argument("--ticker", default="AAPL")
+    parser.add_argument("--query", default="这支股票值得买入吗？")
+    parser.add_argument("--interval", type=float, default=0.1, help="健康检查轮询间隔（秒）")
+    parser.add_argument("--timeout", type=float, default=600, help="单个请求超时（秒）")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,416 @@
+"""
+本地 OpenAI 兼容模拟服务（/chat/completions），用于在不调用 DeepSeek 的情况下测试 LLM 网关和端到端流程
+
+    python -m benchmarks.mock_openai --port 8900 --latency 0.5 --rpm 120 --max-concurrency 8
+    python -m benchmarks.mock_openai --replay data/bench/llm_recording.jsonl     # 回放录制的对话
+    python -m benchmarks.mock_openai --record data/bench/llm_recording.jsonl \
+        --upstream https://api.deepseek.com/v1                                  # 转发并录制
+
+应用侧设置 DEEPSEEK_API_BASE=http://127.0.0.1:8900 即可。
+
+模拟的服务端行为：
+- 请求带 tools 时按脚本发起工具调用（参数按工具的 JSON Schema 生成），工具结果返回后给出最终回复，
+  代理图会像真实模型一样走完“模型 → 工具 → 模型”的循环；不带 tools 时直接返回固定回复。
+  输入中已附带某些工具的结果（专家数据预取，标题形如「### 当前行情（get_current_stock_price）」）时，
+  视为已完成一轮工具调用，只在 --tool-rounds 更多时继续调用其余工具
+- 延迟 = --latency（首 token 前）+ 输出 token 数 × --token-latency，抖动由请求内容决定（同一请求每次相同）
+- 支持 stream=True（SSE 逐段输出）
+- 每分钟请求数超过 --rpm，或同时处理的请求超过 --max-concurrency 时返回 429（带 Retry-After）
+- 按 --error-rate 随机返回 503
+- --record：把请求转发给 --upstream 的真实服务，按对话指纹录制回复和实际耗时；
+  --replay：按指纹回放录制的回复和耗时，未录制的请求退回脚本回复
+- GET /stats 返回请求数、工具调用回复数、token 用量、429 / 503 次数和观察到的最大并发
+"""
+
+from collections import deque
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_REPLY = "根据财务、市场和估值分析，该股票基本面稳健，估值合理，建议持有。"
+
+# 数值参数按名称给出量级合理的取值（利率为小数，每股数据按美元），其余参数按类型生成
+NUMERIC_ARGS = {
+    "price": 180.0, "current_price": 180.0, "eps": 6.5, "fcf": 7.0, "revenue": 26.0,
+    "growth_rate": 0.06, "discount_rate": 0.09, "growth_mean": 0.06, "growth_std": 0.02,
+    "margin_mean": 0.25, "margin_std": 0.03, "discount_mean": 0.09, "discount_std": 0.01,
+}
+
+_TICKER_PATTERN = re.compile(r"\b[A-Z]{1,5}\b")
+
+
+class MockConfig:
+    def __init__(
+            self,
+            latency: float = 0.5,
+            jitter: float = 0.1,
+            rpm: int = 0,
+            max_concurrency: int = 0,
+            error_rate: float = 0.0,
+            retry_after: float = 1.0,
+            reply: str = DEFAULT_REPLY,
+            token_latency: float = 0.0,
+            tool_rounds: int = 1,
+            tools_per_turn: int = 2,
+            replay_path: str = "",
+            record_path: str = "",
+            upstream: str = ""
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rpm = rpm
+        self.max_concurrency = max_concurrency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.reply = reply
+        self.token_latency = token_latency  # 每个输出 token 的生成时间（秒）
+        self.tool_rounds = tool_rounds  # 每段对话发起几轮工具调用后给出最终回复
+        self.tools_per_turn = tools_per_turn  # 每轮同时调用的工具数
+        self.replay_path = replay_path
+        self.record_path = record_path
+        self.upstream = upstream
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# ============ 对话解析 ============
+
+def _message_text(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def _first_user_text(messages: List[dict]) -> str:
+    for message in messages:
+        if message.get("role") == "user":
+            return _message_text(message)
+    return ""
+
+
+def _tool_names(message: dict) -> List[str]:
+    return [call["function"]["name"] for call in message.get("tool_calls") or []]
+
+
+def fingerprint(payload: dict) -> str:
+    """对话指纹：工具列表 + 每条消息的角色、内容和调用的工具名（不含随机的调用 ID）"""
+    key = {
+        "tools": sorted(tool["function"]["name"] for tool in payload.get("tools") or []),
+        "messages": [
+            [message.get("role"), _message_text(message), _tool_names(message)]
+            for message in payload.get("messages", [])
+        ],
+    }
+    return hashlib.sha1(json.dumps(key, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+
+
+def _tool_arguments(tool: dict, ticker: str, query: str) -> dict:
+    """按工具参数的 JSON Schema 生成必填参数"""
+    parameters = tool["function"].get("parameters") or {}
+    properties = parameters.get("properties") or {}
+    arguments = {}
+    for name in parameters.get("required", list(properties)):
+        schema = properties.get(name, {})
+        kind = schema.get("type")
+        if name in NUMERIC_ARGS:
+            arguments[name] = NUMERIC_ARGS[name]
+        elif kind in ("number", "integer"):
+            arguments[name] = 1
+        elif kind == "array":
+            arguments[name] = [ticker]
+        elif kind == "boolean":
+            arguments[name] = False
+        elif "ticker" in name:
+            arguments[name] = ticker
+        else:
+            arguments[name] = query
+    return arguments
+
+
+def scripted_message(payload: dict, config: MockConfig) -> dict:
+    """
+    脚本回复：带 tools 且工具调用轮数未达到 tool_rounds 时调用尚未调用过的工具，否则返回固定回复
+
+    用户输入中已附带结果的工具（预取数据）算作已调用，并计为一轮工具调用。
+    """
+    messages = payload.get("messages", [])
+    tools = payload.get("tools") or []
+    text = _first_user_text(messages)
+    prefetched = {tool["function"]["name"] for tool in tools if f"（{tool['function']['name']}）" in text}
+    rounds = sum(1 for message in messages if message.get("tool_calls")) + (1 if prefetched else 0)
+    if tools and rounds < config.tool_rounds:
+        called = prefetched | {name for message in messages for name in _tool_names(message)}
+        pending = [tool for tool in tools if tool["function"]["name"] not in called] or tools
+        # 工具参数只取问题本身，不含附带的预取数据
+        query = text.split("\n\n")[0]
+        match = _TICKER_PATTERN.search(query)
+        ticker = match.group(0) if match else "AAPL"
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {
+                        "name": tool["function"]["name"],
+                        "arguments": json.dumps(_tool_arguments(tool, ticker, query), ensure_ascii=False),
+                    },
+                }
+                for tool in pending[:config.tools_per_turn]
+            ],
+        }
+    return {"role": "assistant", "content": config.reply}
+
+
+def load_recording(path: str) -> Dict[str, dict]:
+    """读取录制文件（每行一条 {key, message, usage, latency}），同一指纹以最后一条为准"""
+    recording = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    recording[entry["key"]] = entry
+    return recording
+
+
+# ============ 服务 ============
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    config = config or MockConfig()
+    app = FastAPI(title="Mock OpenAI")
+    window: deque = deque()  # 最近 60 秒内接受的请求时刻
+    stats = {
+        "requests": 0, "completed": 0, "tool_call_responses": 0, "replayed": 0, "recorded": 0,
+        "prompt_tokens": 0, "completion_tokens": 0,
+        "rate_limited": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0,
+    }
+    recording = load_recording(config.replay_path)
+    upstream = {"client": None}
+
+    def _rate_limited() -> bool:
+        now = time.monotonic()
+        while window and window[0] <= now - 60:
+            window.popleft()
+        if config.rpm and len(window) >= config.rpm:
+            return True
+        if config.max_concurrency and stats["in_flight"] >= config.max_concurrency:
+            return True
+        window.append(now)
+        return False
+
+    async def _record(payload: dict, key: str, authorization: Optional[str]) -> dict:
+        """转发给真实服务（非流式），按指纹追加到录制文件"""
+        import httpx
+
+        if upstream["client"] is None:
+            upstream["client"] = httpx.AsyncClient(base_url=config.upstream.rstrip("/"), timeout=300)
+        start = time.perf_counter()
+        response = await upstream["client"].post(
+            "/chat/completions",
+            json={**payload, "stream": False, "stream_options": None},
+            headers={"Authorization": authorization or f"Bearer {os.environ.get('UPSTREAM_API_KEY', '')}"}
+        )
+        response.raise_for_status()
+        body = response.json()
+        entry = {
+            "key": key,
+            "message": body["choices"][0]["message"],
+            "usage": body.get("usage"),
+            "latency": round(time.perf_counter() - start, 4),
+        }
+        with open(config.record_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        recording[key] = entry
+        stats["recorded"] += 1
+        return entry
+
+    async def _chat_completions(request: Request):
+        payload = await request.json()
+        stats["requests"] += 1
+        if _rate_limited():
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)},
+                content={"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}
+            )
+        if config.error_rate and random.random() < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=503, content={"error": {"message": "Service unavailable"}})
+
+        key = fingerprint(payload)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = payload.get("model", "mock")
+
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            entry = recording.get(key)
+            if entry is None and config.record_path and config.upstream:
+                # 录制模式：上游已经花掉了真实耗时，不再额外等待
+                entry = {**await _record(payload, key, request.headers.get("authorization")), "latency": 0.0}
+            elif entry is not None:
+                stats["replayed"] += 1
+        except Exception:
+            stats["in_flight"] -= 1
+            raise
+
+        if entry is not None:
+            message = entry["message"]
+            usage = entry.get("usage")
+            first_delay = delay = entry.get("latency", config.latency)
+        else:
+            message = scripted_message(payload, config)
+            usage = None
+            # 抖动由对话内容决定：重复运行同一负载时每个请求的延迟相同
+            jitter = random.Random(key).uniform(-config.jitter, config.jitter)
+            first_delay = max(0.0, config.latency + jitter)
+            delay = first_delay
+
+        text = message.get("content") or ""
+        if usage is None:
+            prompt_tokens = _estimate_tokens(json.dumps(payload.get("messages", []), ensure_ascii=False))
+            completion_tokens = _estimate_tokens(text or json.dumps(message.get("tool_calls"), ensure_ascii=False))
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+            delay = first_delay + completion_tokens * config.token_latency
+        stats["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        stats["completion_tokens"] += usage.get("completion_tokens") or 0
+        tool_calls = message.get("tool_calls")
+        if tool_calls:
+            stats["tool_call_responses"] += 1
+        finish_reason = "tool_calls" if tool_calls else "stop"
+
+        if not payload.get("stream"):
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                stats["in_flight"] -= 1
+            stats["completed"] += 1
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": usage,
+            }
+
+        include_usage = (payload.get("stream_options") or {}).get("include_usage")
+
+        def _chunk(delta: dict, finish: Optional[str] = None) -> dict:
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+
+        def _sse(chunk: dict) -> str:
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+        async def _events():
+            try:
+                await asyncio.sleep(first_delay)
+                if tool_calls:
+                    await asyncio.sleep(delay - first_delay)
+                    yield _sse(_chunk({"role": "assistant", "tool_calls": [
+                        {"index": i, **call} for i, call in enumerate(tool_calls)
+                    ]}))
+                else:
+                    pieces = [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+                    for piece in pieces:
+                        yield _sse(_chunk({"content": piece}))
+                        await asyncio.sleep((delay - first_delay) / len(pieces))
+                final = _chunk({}, finish_reason)
+                if include_usage:
+                    final["usage"] = usage
+                yield _sse(final)
+                yield "data: [DONE]\n\n"
+                stats["completed"] += 1
+            finally:
+                stats["in_flight"] -= 1
+
+        return StreamingResponse(_events(), media_type="text/event-stream")
+
+    app.add_api_route("/chat/completions", _chat_completions, methods=["POST"])
+    app.add_api_route("/v1/chat/completions", _chat_completions, methods=["POST"])
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        window.clear()
+        for key in stats:
+            if key != "in_flight":
+                stats[key] = 0
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5, help="首 token 前的响应延迟（秒）")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="每个输出 token 的生成时间（秒）")
+    parser.add_argument("--jitter", type=float, default=0.1, help="延迟的随机抖动（秒）")
+    parser.add_argument("--rpm", type=int, default=0, help="每分钟请求数上限，超过返回 429（0 不限）")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="同时处理的请求数上限，超过返回 429（0 不限）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 503 的比例")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After（秒）")
+    parser.add_argument("--reply", default=DEFAULT_REPLY, help="固定回复内容")
+    parser.add_argument("--tool-rounds", type=int, default=1, help="每段对话的工具调用轮数（0 不调用工具）")
+    parser.add_argument("--tools-per-turn", type=int, default=2, help="每轮同时调用的工具数")
+    parser.add_argument("--replay", default="", help="回放的录制文件")
+    parser.add_argument("--record", default="", help="录制文件（需同时指定 --upstream）")
+    parser.add_argument("--upstream", default="", help="录制时转发的真实服务地址，API Key 取请求头或 UPSTREAM_API_KEY")
+    args = parser.parse_args()
+    if args.record and not args.upstream:
+        parser.error("--record 需要同时指定 --upstream")
+
+    import uvicorn
+
+    config = MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        rpm=args.rpm,
+        max_concurrency=args.max_concurrency,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        reply=args.reply,
+        token_latency=args.token_latency,
+        tool_rounds=args.tool_rounds,
+        tools_per_turn=args.tools_per_turn,
+        # 录制时同时回放已录制的部分，中断后可以续录
+        replay_path=args.replay or args.record,
+        record_path=args.record,
+        upstream=args.upstream,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,121 @@
-from pydantic_settings import BaseSettings
-from functools import lru_cache
-
-
-class Settings(BaseSettings):
-    # DeepSeek API 配置
-    deepseek_api_key: str
-    deepseek_api_base: str = "https://api.deepseek.com"  # ✅ 去掉 /v1
-    model_name: str = "deepseek-chat"
-    temperature: float = 0.0
-
-    # 添加属性别名，兼容不同的命名
-    @property
-    def api_key(self):
-        """API Key 的别名"""
-        return self.deepseek_api_key
-
-    @property
-    def base_url(self):
-        """Base URL 的别名"""
-        return self.deepseek_api_base
-
-    # RAG 配置
-    vector_store_path: str = "data/vector_store"
-    pdf_directory: str = "data/financial_reports"
-    chunk_size: int = 1000
-    chunk_overlap: int = 200
-
-    # 服务器配置
-    host: str = "127.0.0.1"  # ✅ 改为 127.0.0.1，WSL 中更好用
-    port: int = 8000
-    debug: bool = True  # ✅ 开发时设为 True
-
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
-
-
-@lru_cache()
-def get_settings() -> Settings:
-    return Settings()
-
-
+from pydantic_settings import BaseSettings
+from functools import lru_cache
+
+
+class Settings(BaseSettings):
+    # DeepSeek API 配置
+    deepseek_api_key: str
+    deepseek_api_base: str = "https://api.deepseek.com"  # ✅ 去掉 /v1
+    model_name: str = "deepseek-chat"
+    temperature: float = 0.0
+
+    # LLM 网关配置（所有代理共享的请求入口，见 src/core/llm_gateway.py）
+    llm_gateway_enabled: bool = True  # 关闭时使用 ChatOpenAI 默认的连接、并发和重试行为
+    llm_max_concurrency: int = 16  # 同时进行中的 LLM 请求数上限
+    llm_batch_max_concurrency: int = 8  # batch 通道（批量分析）最多占用的并发数，其余留给交互请求
+    llm_requests_per_minute: float = 0.0  # 每分钟请求数上限，0 表示不限
+    llm_max_burst: int = 5  # 请求令牌桶容量（允许的突发请求数）
+    llm_tokens_per_minute: float = 0.0  # 每分钟 token（输入 + 输出）上限，0 表示不限
+    llm_expected_completion_tokens: int = 1024  # 每个请求预留的输出 token 数，响应返回后按实际用量修正
+    llm_max_retries: int = 4  # 429 / 5xx / 连接错误的最大重试次数
+    llm_backoff_base: float = 0.5  # 指数退避的初始等待时间（秒）
+    llm_backoff_max: float = 30.0  # 单次退避的最长等待时间（秒）
+    llm_http2: bool = True  # 使用 HTTP/2 连接复用（需安装 h2）
+    llm_max_connections: int = 20  # 连接池最大连接数
+    llm_timeout: float = 120.0  # 单次请求超时时间（秒）
+
+    # 添加属性别名，兼容不同的命名
+    @property
+    def api_key(self):
+        """API Key 的别名"""
+        return self.deepseek_api_key
+
+    @property
+    def base_url(self):
+        """Base URL 的别名"""
+        return self.deepseek_api_base
+
+    # RAG 配置
+    vector_store_path: str = "data/vector_store"
+    pdf_directory: str = "data/financial_reports"
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+    embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    ingest_workers: int = 0  # PDF 解析进程数，0 表示使用全部 CPU 核
+    embedding_batch_size: int = 256  # 每批写入向量数据库的文本块数量
+    vector_backend: str = "chroma"  # 向量索引后端：chroma / faiss（需安装 faiss-cpu）
+    faiss_index_type: str = "sq8"  # FAISS 向量编码：flat（float32）/ sq8（int8）/ sq4（4 bit）
+
+    # RAG 混合检索配置
+    rag_hybrid_enabled: bool = True  # BM25 关键词检索与向量检索融合
+    rag_candidate_k: int = 20  # 每路检索召回的候选文本块数
+    rag_rrf_k: int = 60  # RRF 融合常数，越大越弱化排名靠前的优势
+    rag_reranker_model: str = ""  # 交叉编码器重排模型，留空不启用（如 cross-encoder/ms-marco-MiniLM-L-6-v2）
+    rag_context_token_budget: int = 1200  # 单次检索返回上下文的 token 预算，0 表示不限制
+
+    # RAG 缓存配置
+    rag_embedding_cache_size: int = 4096  # 查询向量缓存条目数
+    rag_result_cache_size: int = 1024  # 检索结果缓存条目数
+    rag_cache_ttl: float = 3600.0  # 缓存过期时间（秒），0 表示不过期
+
+    # 分析结果缓存配置
+    response_cache_enabled: bool = True
+    response_cache_path: str = "data/cache/responses.sqlite3"
+    response_cache_ttl: float = 21600.0  # 6 小时
+    response_cache_similarity: float = 0.95  # 问题语义相似度阈值
+
+    # 行情数据配置
+    market_data_path: str = "data/market_data"  # 本地行情存储目录（快照 + 按列存储的 K 线）
+    market_history_cache_size: int = 512  # 保持内存映射的历史 K 线股票数
+
+    # 蒙特卡洛估值配置
+    monte_carlo_chunk_size: int = 65536  # 每块模拟的路径数（决定峰值内存）
+    monte_carlo_workers: int = 0  # 大规模模拟的进程数，0 表示使用全部 CPU 核
+    monte_carlo_parallel_threshold: int = 4_000_000  # 路径数达到该值才启用进程池
+    monte_carlo_max_paths: int = 10_000_000  # 工具单次调用允许的最大路径数
+
+    # 多代理执行配置
+    parallel_specialists: bool = True  # 并行调用专家代理，再由主管一次性综合
+    specialist_max_concurrency: int = 3  # 同时运行的专家代理数量上限
+    specialist_timeout: float = 180.0  # 单个专家代理的超时时间（秒）
+    specialist_fast_path: bool = True  # 只涉及一个专家时直接返回该专家的输出，跳过主管的调度和综合
+    specialist_prefetch: bool = True  # 专家启动前并发预取行情、情绪、财报片段和关键指标，注入专家输入
+    prefetch_timeout: float = 15.0  # 数据预取的超时时间（秒），未取到的数据由专家按需调用工具
+    batch_max_concurrency: int = 8  # 批量分析时同时分析的股票数量
+
+    # 共享检索服务配置（多个 uvicorn 工作进程共用一份 embedding 模型和向量索引）
+    rag_service_url: str = ""  # 检索服务地址，如 http://127.0.0.1:8100 或 unix:///tmp/rag.sock；留空时每个进程各自加载
+    rag_service_timeout: float = 60.0  # 调用检索服务的超时时间（秒）
+    rag_service_ready_attempts: int = 3  # 预热时等待检索服务就绪的轮数（每轮最长 rag_service_timeout 秒），仍未就绪则预热失败
+
+    # 并发配置
+    rag_executor_workers: int = 4  # RAG（embedding / Chroma）专用线程池大小
+
+    # 链路追踪与指标配置（见 src/core/tracing.py，指标在 GET /metrics 以 Prometheus 格式输出）
+    tracing_enabled: bool = True  # 记录请求、代理步骤、工具、检索和 LLM 调用的 span
+    tracing_service_name: str = "stock-ai-assistant"  # 导出 span 的 service.name
+    tracing_export_path: str = "data/traces/spans.jsonl"  # 本地 OTLP/JSON 文件，留空不写
+    tracing_otlp_endpoint: str = ""  # OTLP/HTTP 接收地址，如 http://localhost:4318/v1/traces；留空不推送
+    tracing_export_interval: float = 2.0  # 批量导出间隔（秒）
+    tracing_export_max_mb: int = 100  # 本地文件超过该大小时轮转为 .1
+
+    # 启动配置
+    rag_sync_on_startup: bool = True  # 启动后在后台增量同步 PDF 索引；False 时只打开已有索引
+    warm_up_on_startup: bool = True  # 启动后在后台预加载 embedding 模型、索引和代理（/ready 据此判断就绪）
+
+    # 服务器配置
+    host: str = "127.0.0.1"  # ✅ 改为 127.0.0.1，WSL 中更好用
+    port: int = 8000
+    debug: bool = True  # ✅ 开发时设为 True
+
+    class Config:
+        env_file = ".env"
+        case_sensitive = False
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    return Settings()
+
+
 settings = get_settings()
\ No newline at end of file
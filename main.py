@@ -1,483 +1,770 @@
-import logging
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
-from datetime import datetime
-
-from src.core.models import StockAnalysisRequest, StockAnalysisResponse, HealthResponse
-from src.agents.supervisor import analyze_stock_investment, quick_analyze
-from src.rag.retriever import rag_system
-from config.settings import settings
-
-# ============ 日志配置 ============
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-
-# ============ 应用启动和关闭事件 ============
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """
-    应用生命周期管理
-    - 启动时初始化 RAG 系统
-    - 关闭时清理资源
-    """
-    # ===== 启动事件 =====
-    logger.info("=" * 50)
-    logger.info("🚀 股票投资 AI 助手 启动中...")
-    logger.info("=" * 50)
-
-    try:
-        # 初始化 RAG 系统
-        logger.info("📚 初始化 RAG 系统...")
-        rag_init_message = rag_system.initialize()
-        logger.info(f"✅ {rag_init_message}")
-
-        logger.info("✅ 应用启动完成")
-        logger.info("=" * 50)
-
-    except Exception as e:
-        logger.error(f"❌ 启动失败: {e}", exc_info=True)
-        raise
-
-    yield
-
-    # ===== 关闭事件 =====
-    logger.info("=" * 50)
-    logger.info("🛑 应用关闭中...")
-    logger.info("=" * 50)
-
-    try:
-        logger.info("✅ 资源清理完成")
-    except Exception as e:
-        logger.error(f"❌ 关闭失败: {e}", exc_info=True)
-
-
-# ============ 创建 FastAPI 应用 ============
-
-app = FastAPI(
-    title="股票投资 AI 助手",
-    description="使用 LangChain 1.0.5 和 DeepSeek 构建的多代理股票投资分析系统",
-    version="1.0.0",
-    lifespan=lifespan
-)
-
-# ============ CORS 配置 ============
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # 允许所有来源（生产环境建议限制）
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-# ============ 根路由 ============
-
-@app.get("/")
-async def root():
-    """
-    API 根路由 - 提供基本信息
-    """
-    return {
-        "name": "股票投资 AI 助手",
-        "version": "1.0.0",
-        "description": "使用 LangChain 1.0.5 和 DeepSeek 构建的多代理股票投资分析系统",
-        "docs": "/docs",
-        "redoc": "/redoc"
-    }
-
-
-# ============ 健康检查 ============
-
-@app.get("/health", response_model=HealthResponse)
-async def health_check():
-    """
-    健康检查端点
-
-    Returns:
-        应用状态和版本信息
-    """
-    return HealthResponse(
-        status="ok",
-        version="1.0.0"
-    )
-
-
-# ============ 主要分析接口 ============
-
-@app.post("/api/analyze", response_model=StockAnalysisResponse)
-async def analyze_stock(request: StockAnalysisRequest):
-    """
-    分析股票投资机会（完整分析）
-
-    这是核心 API 端点，执行完整的多代理分析流程：
-    1. 财务分析 - 分析公司财务报表和财务指标
-    2. 市场分析 - 评估股票价格和市场情绪
-    3. 估值分析 - 计算股票内在价值
-    4. 综合建议 - 生成最终投资建议
-
-    Args:
-        request (StockAnalysisRequest): 包含以下字段：
-            - stock_ticker (str): 股票代码，例如 AAPL、MSFT、GOOGL
-            - query (str): 分析问题，例如 "这支股票值得买入吗？"
-
-    Returns:
-        StockAnalysisResponse: 包含以下字段：
-            - stock_ticker (str): 股票代码
-            - query (str): 原始问题
-            - timestamp (datetime): 分析时间
-            - analysis (str): 详细的分析结果
-            - recommendation (str): 投资建议（买入/持有/卖出）
-            - target_price (float): 目标价格
-
-    Raises:
-        HTTPException: 如果分析过程中出现错误
-
-    Example:
-        >>> import requests
-        >>> response = requests.post(
-        ...     "http://localhost:8000/api/analyze",
-        ...     json={
-        ...         "stock_ticker": "AAPL",
-        ...         "query": "苹果公司是否值得投资？"
-        ...     }
-        ... )
-        >>> print(response.json())
-    """
-    try:
-        logger.info(f"📊 开始分析 {request.stock_ticker}")
-        logger.info(f"   问题: {request.query}")
-
-        # 调用多代理系统进行综合分析
-        analysis_result = await analyze_stock_investment(
-            stock_ticker=request.stock_ticker,
-            user_query=request.query,
-            include_financial=True,
-            include_market=True,
-            include_valuation=True
-        )
-
-        logger.info(f"✅ {request.stock_ticker} 分析完成")
-
-        # 返回结构化响应
-        return StockAnalysisResponse(
-            stock_ticker=request.stock_ticker,
-            query=request.query,
-            timestamp=datetime.now(),
-            analysis=analysis_result,
-            recommendation="买入" if "买入" in analysis_result else "持有",
-            target_price=None
-        )
-
-    except Exception as e:
-        logger.error(f"❌ 分析失败: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"分析失败: {str(e)}"
-        )
-
-
-# ============ 财务分析接口 ============
-
-@app.post("/api/analyze/financial")
-async def analyze_financial(stock_ticker: str, query: str):
-    """
-    仅进行财务分析
-
-    Args:
-        stock_ticker (str): 股票代码
-        query (str): 分析问题
-
-    Returns:
-        财务分析结果
-
-    Example:
-        >>> curl -X POST "http://localhost:8000/api/analyze/financial?stock_ticker=AAPL&query=收入增长怎么样？"
-    """
-    try:
-        logger.info(f"💰 进行财务分析: {stock_ticker}")
-
-        analysis_result = await analyze_stock_investment(
-            stock_ticker=stock_ticker,
-            user_query=query,
-            include_financial=True,
-            include_market=False,
-            include_valuation=False
-        )
-
-        return {
-            "stock_ticker": stock_ticker,
-            "analysis_type": "financial",
-            "query": query,
-            "result": analysis_result,
-            "timestamp": datetime.now()
-        }
-
-    except Exception as e:
-        logger.error(f"❌ 财务分析失败: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"财务分析失败: {str(e)}"
-        )
-
-
-# ============ 市场分析接口 ============
-
-@app.post("/api/analyze/market")
-async def analyze_market(stock_ticker: str, query: str):
-    """
-    仅进行市场分析
-
-    Args:
-        stock_ticker (str): 股票代码
-        query (str): 分析问题
-
-    Returns:
-        市场分析结果
-
-    Example:
-        >>> curl -X POST "http://localhost:8000/api/analyze/market?stock_ticker=AAPL&query=市场情绪如何？"
-    """
-    try:
-        logger.info(f"📈 进行市场分析: {stock_ticker}")
-
-        analysis_result = await analyze_stock_investment(
-            stock_ticker=stock_ticker,
-            user_query=query,
-            include_financial=False,
-            include_market=True,
-            include_valuation=False
-        )
-
-        return {
-            "stock_ticker": stock_ticker,
-            "analysis_type": "market",
-            "query": query,
-            "result": analysis_result,
-            "timestamp": datetime.now()
-        }
-
-    except Exception as e:
-        logger.error(f"❌ 市场分析失败: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"市场分析失败: {str(e)}"
-        )
-
-
-# ============ 估值分析接口 ============
-
-@app.post("/api/analyze/valuation")
-async def analyze_valuation(stock_ticker: str, query: str):
-    """
-    仅进行估值分析
-
-    Args:
-        stock_ticker (str): 股票代码
-        query (str): 分析问题
-
-    Returns:
-        估值分析结果
-
-    Example:
-        >>> curl -X POST "http://localhost:8000/api/analyze/valuation?stock_ticker=AAPL&query=内在价值是多少？"
-    """
-    try:
-        logger.info(f"💎 进行估值分析: {stock_ticker}")
-
-        analysis_result = await analyze_stock_investment(
-            stock_ticker=stock_ticker,
-            user_query=query,
-            include_financial=False,
-            include_market=False,
-            include_valuation=True
-        )
-
-        return {
-            "stock_ticker": stock_ticker,
-            "analysis_type": "valuation",
-            "query": query,
-            "result": analysis_result,
-            "timestamp": datetime.now()
-        }
-
-    except Exception as e:
-        logger.error(f"❌ 估值分析失败: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"估值分析失败: {str(e)}"
-        )
-
-
-# ============ RAG 查询接口 ============
-
-@app.post("/api/rag/query")
-async def rag_query(query: str, stock_ticker: str = None):
-    """
-    直接查询财报 RAG 系统
-
-    不调用代理，直接从向量数据库检索相关财报信息。
-
-    Args:
-        query (str): 搜索查询（例如："收入增长"）
-        stock_ticker (str, optional): 股票代码，用于过滤
-
-    Returns:
-        检索到的相关财报内容
-
-    Example:
-        >>> curl -X POST "http://localhost:8000/api/rag/query?query=收入增长&stock_ticker=AAPL"
-    """
-    try:
-        logger.info(f"🔍 RAG 查询: {query}")
-
-        # 构建查询字符串
-        rag_query_str = f"{stock_ticker} {query}" if stock_ticker else query
-
-        # 检索相关内容
-        context = rag_system.retrieve(rag_query_str)
-
-        return {
-            "query": query,
-            "stock_ticker": stock_ticker,
-            "results": context if context else "未找到相关财报信息",
-            "timestamp": datetime.now()
-        }
-
-    except Exception as e:
-        logger.error(f"❌ RAG 查询失败: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"RAG 查询失败: {str(e)}"
-        )
-
-
-# ============ RAG 初始化接口 ============
-
-@app.post("/api/rag/initialize")
-async def rag_initialize():
-    """
-    初始化 RAG 系统（加载和索引所有 PDF）
-
-    这个接口用于：
-    1. 加载所有财报 PDF 文件
-    2. 分割成文本块
-    3. 生成向量嵌入
-    4. 存储到向量数据库
-
-    Returns:
-        初始化结果信息
-
-    Example:
-        >>> curl -X POST "http://localhost:8000/api/rag/initialize"
-    """
-    try:
-        logger.info("🔄 初始化 RAG 系统...")
-
-        # 初始化 RAG 系统
-        result = rag_system.initialize()
-
-        logger.info(f"✅ {result}")
-
-        return {
-            "status": "success",
-            "message": result,
-            "timestamp": datetime.now()
-        }
-
-    except Exception as e:
-        logger.error(f"❌ RAG 初始化失败: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"RAG 初始化失败: {str(e)}"
-        )
-
-
-# ============ 信息接口 ============
-
-@app.get("/api/info")
-async def get_info():
-    """
-    获取应用配置信息
-
-    Returns:
-        应用配置和运行信息
-    """
-    return {
-        "app_name": "股票投资 AI 助手",
-        "version": "1.0.0",
-        "llm_model": settings.model_name,
-        "llm_temperature": settings.temperature,
-        "vector_store_path": settings.vector_store_path,
-        "pdf_directory": settings.pdf_directory,
-        "debug": settings.debug,
-        "timestamp": datetime.now()
-    }
-
-
-# ============ 错误处理 ============
-
-@app.exception_handler(HTTPException)
-async def http_exception_handler(request, exc):
-    """自定义 HTTP 异常处理"""
-    logger.error(f"HTTP 异常: {exc.detail}")
-    return {
-        "error": True,
-        "status_code": exc.status_code,
-        "detail": exc.detail,
-        "timestamp": datetime.now()
-    }
-
-
-@app.exception_handler(Exception)
-async def general_exception_handler(request, exc):
-    """全局异常处理"""
-    logger.error(f"未处理的异常: {exc}", exc_info=True)
-    return {
-        "error": True,
-        "status_code": 500,
-        "detail": "内部服务器错误",
-        "timestamp": datetime.now()
-    }
-
-
-# ============ 启动命令 ============
-
-if __name__ == "__main__":
-    """
-    运行应用
-
-    开发模式（带自动重载）：
-        python main.py
-        或
-        uvicorn main:app --reload
-
-    生产模式（带多个工作进程）：
-        uvicorn main:app --host 0.0.0.0 --port 8000 --workers 4
-
-    指定主机和端口：
-        uvicorn main:app --host 127.0.0.1 --port 8000
-    """
-    import uvicorn
-
-    print("=" * 60)
-    print("🚀 股票投资 AI 助手")
-    print("=" * 60)
-    print(f"📍 访问地址: http://{settings.host}:{settings.port}")
-    print(f"📚 API 文档: http://{settings.host}:{settings.port}/docs")
-    print(f"🔄 ReDoc: http://{settings.host}:{settings.port}/redoc")
-    print("=" * 60)
-
-    uvicorn.run(
-        "main:app",  # 改为导入字符串格式
-        host=settings.host,
-        port=settings.port,
-        reload=settings.debug,
-        log_level="info"
+# 最先导入：从这里开始记录启动耗时
+from src.core.startup import get_startup_tracker
+import logging
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from datetime import datetime
+import asyncio
+import json
+
+from src.core.models import StockAnalysisRequest, StockAnalysisResponse, HealthResponse, BatchAnalysisRequest
+from src.agents.supervisor import (
+    quick_analyze, run_analysis, get_response_cache, stream_stock_investment,
+    analyze_watchlist, WatchlistSummary, get_supervisor
+)
+from src.agents.financial_analyst import get_financial_analyst
+from src.agents.market_analyst import get_market_analyst
+from src.agents.valuation_expert import get_valuation_expert
+from src.rag.retriever import rag_system
+from src.core.executors import run_in_rag_executor, shutdown_executors
+from src.core.llm_gateway import get_llm_gateway
+from src.core.metrics import get_metrics_registry
+from src.core.tracing import TracingMiddleware, get_tracer
+from config.settings import settings
+
+# ============ 日志配置 ============
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+# ============ 应用启动和关闭事件 ============
+
+def _load_agents():
+    """创建 LLM 客户端和全部代理（第一次导入 langchain_openai 较慢）"""
+    get_financial_analyst()
+    get_market_analyst()
+    get_valuation_expert()
+    get_supervisor()
+
+
+async def _warm_up():
+    """
+    后台预热：加载 embedding 模型、同步 / 打开向量索引、创建代理
+
+    预热期间应用已经在接受请求：缓存命中和不需要检索财报的请求直接处理，
+    需要检索的请求会等待模型加载完成。
+    """
+    startup = get_startup_tracker()
+    try:
+        with startup.phase("embedding_model"):
+            await run_in_rag_executor(rag_system.load_embeddings)
+
+        # 共享检索服务模式下由服务进程同步索引，工作进程只等待服务就绪
+        if settings.rag_sync_on_startup and not settings.rag_service_url:
+            logger.info("📚 后台同步 RAG 索引...")
+            with startup.phase("index_sync"):
+                rag_init_message = await run_in_rag_executor(rag_system.initialize)
+            logger.info(f"✅ {rag_init_message}")
+        else:
+            with startup.phase("index_open"):
+                await run_in_rag_executor(rag_system.load)
+
+        with startup.phase("agents"):
+            await run_in_rag_executor(_load_agents)
+
+        startup.mark_ready()
+        logger.info(f"✅ 预热完成，进程启动后 {startup.ready_seconds:.2f}s 就绪")
+
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        startup.mark_failed(str(e))
+        logger.error(f"❌ 预热失败: {e}", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用生命周期管理
+    - 启动时立即开始接受请求，RAG 系统和代理在后台预热（/ready 反映预热状态）
+    - 关闭时清理资源
+    """
+    # ===== 启动事件 =====
+    logger.info("=" * 50)
+    logger.info("🚀 股票投资 AI 助手 启动中...")
+    logger.info("=" * 50)
+
+    startup = get_startup_tracker()
+    warm_up_task = None
+    if settings.warm_up_on_startup:
+        warm_up_task = asyncio.create_task(_warm_up())
+    else:
+        # 不预热时组件在第一次使用时加载
+        startup.mark_ready()
+
+    startup.mark_serving()
+    logger.info(f"✅ 应用启动完成，进程启动后 {startup.serving_seconds:.2f}s 开始接受请求")
+    logger.info("=" * 50)
+
+    yield
+
+    # ===== 关闭事件 =====
+    logger.info("=" * 50)
+    logger.info("🛑 应用关闭中...")
+    logger.info("=" * 50)
+
+    try:
+        if warm_up_task is not None and not warm_up_task.done():
+            warm_up_task.cancel()
+        shutdown_executors()
+        get_tracer().shutdown()
+        logger.info("✅ 资源清理完成")
+    except Exception as e:
+        logger.error(f"❌ 关闭失败: {e}", exc_info=True)
+
+
+# ============ 创建 FastAPI 应用 ============
+
+app = FastAPI(
+    title="股票投资 AI 助手",
+    description="使用 LangChain 1.0.5 和 DeepSeek 构建的多代理股票投资分析系统",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# 导入模块和创建应用的耗时（不含后台预热）
+get_startup_tracker().record("imports", get_startup_tracker().tracked_seconds())
+
+# ============ 链路追踪 ============
+
+# 每个请求一个根 span，请求内的代理、工具、检索和 LLM 调用记录为子 span（见 src/core/tracing.py）
+app.add_middleware(TracingMiddleware)
+
+
+def _collect_gateway_metrics():
+    """LLM 网关的实时排队数和累计重试 / 限流次数"""
+    if not settings.llm_gateway_enabled:
+        return []
+    stats = get_llm_gateway().stats()
+    lanes = stats["lanes"]
+    return [
+        ("stock_ai_llm_gateway_queued", "gauge", "LLM 网关排队中的请求数",
+         [({"lane": lane}, lane_stats["queued"]) for lane, lane_stats in lanes.items()]),
+        ("stock_ai_llm_gateway_in_flight", "gauge", "LLM 网关进行中的请求数",
+         [({"lane": lane}, lane_stats["in_flight"]) for lane, lane_stats in lanes.items()]),
+        ("stock_ai_llm_gateway_retries_total", "counter", "LLM 请求重试次数", [({}, stats["retries"])]),
+        ("stock_ai_llm_gateway_rate_limited_total", "counter", "LLM 服务端限流（429）次数",
+         [({}, stats["rate_limited"])]),
+    ]
+
+
+get_metrics_registry().register_collector(_collect_gateway_metrics)
+
+# ============ CORS 配置 ============
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # 允许所有来源（生产环境建议限制）
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+# ============ 根路由 ============
+
+@app.get("/")
+async def root():
+    """
+    API 根路由 - 提供基本信息
+    """
+    return {
+        "name": "股票投资 AI 助手",
+        "version": "1.0.0",
+        "description": "使用 LangChain 1.0.5 和 DeepSeek 构建的多代理股票投资分析系统",
+        "docs": "/docs",
+        "redoc": "/redoc"
+    }
+
+
+# ============ 健康检查 ============
+
+@app.get("/health", response_model=HealthResponse)
+async def health_check():
+    """
+    健康检查端点
+
+    Returns:
+        应用状态和版本信息
+    """
+    return HealthResponse(
+        status="ok",
+        version="1.0.0"
+    )
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    就绪检查端点
+
+    后台预热（embedding 模型、向量索引、代理）完成前返回 503，完成后返回 200；
+    /health 只反映进程存活，预热期间也返回 200。
+
+    Returns:
+        就绪状态和启动耗时明细（各阶段秒数、开始接受请求 / 就绪的时刻）
+    """
+    startup = get_startup_tracker().snapshot()
+    return JSONResponse(
+        status_code=200 if startup["ready"] else 503,
+        content={**startup, "timestamp": datetime.now().isoformat()}
+    )
+
+
+# ============ 主要分析接口 ============
+
+@app.post("/api/analyze", response_model=StockAnalysisResponse)
+async def analyze_stock(request: StockAnalysisRequest):
+    """
+    分析股票投资机会（完整分析）
+
+    这是核心 API 端点，执行完整的多代理分析流程：
+    1. 财务分析 - 分析公司财务报表和财务指标
+    2. 市场分析 - 评估股票价格和市场情绪
+    3. 估值分析 - 计算股票内在价值
+    4. 综合建议 - 生成最终投资建议
+
+    Args:
+        request (StockAnalysisRequest): 包含以下字段：
+            - stock_ticker (str): 股票代码，例如 AAPL、MSFT、GOOGL
+            - query (str): 分析问题，例如 "这支股票值得买入吗？"
+
+    Returns:
+        StockAnalysisResponse: 包含以下字段：
+            - stock_ticker (str): 股票代码
+            - query (str): 原始问题
+            - timestamp (datetime): 分析时间
+            - analysis (str): 详细的分析结果
+            - recommendation (str): 投资建议（买入/持有/卖出）
+            - target_price (float): 目标价格
+            - specialist_timings (dict): 各专家代理耗时（并行模式）
+            - cached (bool): 是否来自分析结果缓存
+
+    Raises:
+        HTTPException: 如果分析过程中出现错误
+
+    Example:
+        >>> import requests
+        >>> response = requests.post(
+        ...     "http://localhost:8000/api/analyze",
+        ...     json={
+        ...         "stock_ticker": "AAPL",
+        ...         "query": "苹果公司是否值得投资？"
+        ...     }
+        ... )
+        >>> print(response.json())
+    """
+    try:
+        logger.info(f"📊 开始分析 {request.stock_ticker}")
+        logger.info(f"   问题: {request.query}")
+
+        # 调用多代理系统进行综合分析
+        outcome = await run_analysis(
+            stock_ticker=request.stock_ticker,
+            user_query=request.query,
+            include_financial=True,
+            include_market=True,
+            include_valuation=True
+        )
+        analysis_result = outcome.analysis or "分析失败：没有得到响应"
+
+        logger.info(f"✅ {request.stock_ticker} 分析完成，耗时 {outcome.total_seconds:.2f}s")
+
+        # 返回结构化响应
+        return StockAnalysisResponse(
+            stock_ticker=request.stock_ticker,
+            query=request.query,
+            timestamp=datetime.now(),
+            analysis=analysis_result,
+            recommendation="买入" if "买入" in analysis_result else "持有",
+            target_price=None,
+            specialist_timings=outcome.specialist_timings or None,
+            cached=outcome.cached
+        )
+
+    except Exception as e:
+        logger.error(f"❌ 分析失败: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"分析失败: {str(e)}"
+        )
+
+
+# ============ 流式分析接口 ============
+
+def _format_sse(event: str, data: dict) -> str:
+    """格式化一条 server-sent event"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+@app.post("/api/analyze/stream")
+async def analyze_stock_stream(request: StockAnalysisRequest):
+    """
+    流式分析股票投资机会（server-sent events）
+
+    专家开始 / 完成时立即推送事件，主管的综合结果逐 token 推送，
+    客户端无需等待全部分析结束即可看到输出。
+
+    事件类型：
+        analysis_started, specialist_started, specialist_finished,
+        synthesis_started, token, done（含 ttft_seconds）, error
+
+    Example:
+        >>> curl -N -X POST "http://localhost:8000/api/analyze/stream" \\
+        ...     -H "Content-Type: application/json" \\
+        ...     -d '{"stock_ticker": "AAPL", "query": "苹果公司是否值得投资？"}'
+    """
+    logger.info(f"📡 开始流式分析 {request.stock_ticker}")
+
+    async def event_stream():
+        async for item in stream_stock_investment(
+                stock_ticker=request.stock_ticker,
+                user_query=request.query
+        ):
+            yield _format_sse(item["event"], item["data"])
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 关闭反向代理缓冲
+        }
+    )
+
+
+# ============ 批量分析接口 ============
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """
+    批量分析自选股（NDJSON 流式返回）
+
+    每只股票分析完成后立即输出一行 JSON，最后一行为汇总信息
+    （包含吞吐量 tickers_per_minute）。
+
+    Example:
+        >>> curl -N -X POST "http://localhost:8000/api/analyze/batch" \\
+        ...     -H "Content-Type: application/json" \\
+        ...     -d '{"stock_tickers": ["AAPL", "MSFT", "GOOGL"], "query": "是否值得买入？"}'
+    """
+    logger.info(f"📋 批量分析请求: {len(request.stock_tickers)} 只股票")
+
+    async def result_stream():
+        async for item in analyze_watchlist(
+                stock_tickers=request.stock_tickers,
+                query=request.query,
+                include_financial=request.include_financial,
+                include_market=request.include_market,
+                include_valuation=request.include_valuation,
+                max_concurrency=request.max_concurrency
+        ):
+            if isinstance(item, WatchlistSummary):
+                line = {
+                    "type": "summary",
+                    "total": item.total,
+                    "succeeded": item.succeeded,
+                    "failed": item.failed,
+                    "cached": item.cached,
+                    "elapsed_seconds": round(item.elapsed_seconds, 2),
+                    "tickers_per_minute": round(item.tickers_per_minute, 2),
+                }
+            else:
+                line = {
+                    "type": "result",
+                    "stock_ticker": item.stock_ticker,
+                    "success": item.success,
+                    "analysis": item.analysis,
+                    "recommendation": "买入" if "买入" in item.analysis else "持有",
+                    "cached": item.cached,
+                    "elapsed_seconds": round(item.elapsed_seconds, 2),
+                    "error": item.error,
+                    "timestamp": datetime.now(),
+                }
+            yield json.dumps(line, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+
+# ============ 财务分析接口 ============
+
+@app.post("/api/analyze/financial")
+async def analyze_financial(stock_ticker: str, query: str):
+    """
+    仅进行财务分析
+
+    Args:
+        stock_ticker (str): 股票代码
+        query (str): 分析问题
+
+    Returns:
+        财务分析结果
+
+    Example:
+        >>> curl -X POST "http://localhost:8000/api/analyze/financial?stock_ticker=AAPL&query=收入增长怎么样？"
+    """
+    try:
+        logger.info(f"💰 进行财务分析: {stock_ticker}")
+
+        outcome = await run_analysis(
+            stock_ticker=stock_ticker,
+            user_query=query,
+            include_financial=True,
+            include_market=False,
+            include_valuation=False
+        )
+
+        return {
+            "stock_ticker": stock_ticker,
+            "analysis_type": "financial",
+            "query": query,
+            "result": outcome.analysis or "分析失败：没有得到响应",
+            "mode": outcome.mode,
+            "elapsed_seconds": round(outcome.total_seconds, 2),
+            "timestamp": datetime.now()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ 财务分析失败: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"财务分析失败: {str(e)}"
+        )
+
+
+# ============ 市场分析接口 ============
+
+@app.post("/api/analyze/market")
+async def analyze_market(stock_ticker: str, query: str):
+    """
+    仅进行市场分析
+
+    Args:
+        stock_ticker (str): 股票代码
+        query (str): 分析问题
+
+    Returns:
+        市场分析结果
+
+    Example:
+        >>> curl -X POST "http://localhost:8000/api/analyze/market?stock_ticker=AAPL&query=市场情绪如何？"
+    """
+    try:
+        logger.info(f"📈 进行市场分析: {stock_ticker}")
+
+        outcome = await run_analysis(
+            stock_ticker=stock_ticker,
+            user_query=query,
+            include_financial=False,
+            include_market=True,
+            include_valuation=False
+        )
+
+        return {
+            "stock_ticker": stock_ticker,
+            "analysis_type": "market",
+            "query": query,
+            "result": outcome.analysis or "分析失败：没有得到响应",
+            "mode": outcome.mode,
+            "elapsed_seconds": round(outcome.total_seconds, 2),
+            "timestamp": datetime.now()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ 市场分析失败: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"市场分析失败: {str(e)}"
+        )
+
+
+# ============ 估值分析接口 ============
+
+@app.post("/api/analyze/valuation")
+async def analyze_valuation(stock_ticker: str, query: str):
+    """
+    仅进行估值分析
+
+    Args:
+        stock_ticker (str): 股票代码
+        query (str): 分析问题
+
+    Returns:
+        估值分析结果
+
+    Example:
+        >>> curl -X POST "http://localhost:8000/api/analyze/valuation?stock_ticker=AAPL&query=内在价值是多少？"
+    """
+    try:
+        logger.info(f"💎 进行估值分析: {stock_ticker}")
+
+        outcome = await run_analysis(
+            stock_ticker=stock_ticker,
+            user_query=query,
+            include_financial=False,
+            include_market=False,
+            include_valuation=True
+        )
+
+        return {
+            "stock_ticker": stock_ticker,
+            "analysis_type": "valuation",
+            "query": query,
+            "result": outcome.analysis or "分析失败：没有得到响应",
+            "mode": outcome.mode,
+            "elapsed_seconds": round(outcome.total_seconds, 2),
+            "timestamp": datetime.now()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ 估值分析失败: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"估值分析失败: {str(e)}"
+        )
+
+
+# ============ RAG 查询接口 ============
+
+@app.post("/api/rag/query")
+async def rag_query(
+        query: str,
+        stock_ticker: str = None,
+        fiscal_year: int = None,
+        filing_type: str = None
+):
+    """
+    直接查询财报 RAG 系统
+
+    不调用代理，直接从向量数据库检索相关财报信息。
+
+    Args:
+        query (str): 搜索查询（例如："收入增长"）
+        stock_ticker (str, optional): 股票代码，只检索该公司的财报
+        fiscal_year (int, optional): 财年过滤
+        filing_type (str, optional): 报告类型过滤（10-K / 10-Q 等）
+
+    Returns:
+        检索到的相关财报内容
+
+    Example:
+        >>> curl -X POST "http://localhost:8000/api/rag/query?query=收入增长&stock_ticker=AAPL"
+    """
+    try:
+        logger.info(f"🔍 RAG 查询: {query}")
+
+        # 检索相关内容（元数据过滤下推到向量数据库）
+        context = await run_in_rag_executor(
+            rag_system.retrieve,
+            query,
+            ticker=stock_ticker,
+            fiscal_year=fiscal_year,
+            filing_type=filing_type
+        )
+
+        return {
+            "query": query,
+            "stock_ticker": stock_ticker,
+            "fiscal_year": fiscal_year,
+            "filing_type": filing_type,
+            "results": context if context else "未找到相关财报信息",
+            "timestamp": datetime.now()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ RAG 查询失败: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"RAG 查询失败: {str(e)}"
+        )
+
+
+# ============ RAG 缓存指标接口 ============
+
+@app.get("/api/rag/stats")
+async def rag_stats():
+    """
+    查看 RAG 缓存指标
+
+    Returns:
+        索引版本、查询向量缓存和检索结果缓存的命中率，以及上下文组装的 token 统计
+    """
+    # 共享检索服务模式下是一次同步 HTTP 调用，放到 RAG 线程池中执行
+    stats = await run_in_rag_executor(rag_system.cache_stats)
+    return {
+        **stats,
+        "timestamp": datetime.now()
+    }
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """
+    查看分析结果缓存指标
+
+    Returns:
+        缓存条目数、TTL、相似度阈值和命中率
+    """
+    cache = get_response_cache()
+    return {
+        "enabled": cache is not None,
+        "responses": await run_in_rag_executor(cache.stats) if cache else None,
+        "timestamp": datetime.now()
+    }
+
+
+@app.get("/api/llm/stats")
+async def llm_stats():
+    """
+    查看 LLM 网关指标
+
+    Returns:
+        各优先级通道的排队数、进行中请求数、等待时间，以及重试、限流（429）次数和 token 用量
+    """
+    return {
+        "enabled": settings.llm_gateway_enabled,
+        "gateway": get_llm_gateway().stats() if settings.llm_gateway_enabled else None,
+        "timestamp": datetime.now()
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus 指标
+
+    HTTP 请求数和耗时、各阶段（分析流程 / 专家代理 / 代理步骤 / 工具 / 检索 / LLM 调用）耗时直方图、
+    LLM token 用量和首 token 时间、LLM 网关排队数
+    """
+    return PlainTextResponse(get_metrics_registry().render(), media_type="text/plain; version=0.0.4")
+
+
+# ============ RAG 初始化接口 ============
+
+@app.post("/api/rag/initialize")
+async def rag_initialize():
+    """
+    初始化 RAG 系统（加载和索引所有 PDF）
+
+    这个接口用于：
+    1. 加载所有财报 PDF 文件
+    2. 分割成文本块
+    3. 生成向量嵌入
+    4. 存储到向量数据库
+
+    Returns:
+        初始化结果信息
+
+    Example:
+        >>> curl -X POST "http://localhost:8000/api/rag/initialize"
+    """
+    try:
+        logger.info("🔄 初始化 RAG 系统...")
+
+        # 初始化 RAG 系统
+        result = await run_in_rag_executor(rag_system.initialize)
+
+        logger.info(f"✅ {result}")
+
+        return {
+            "status": "success",
+            "message": result,
+            "timestamp": datetime.now()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ RAG 初始化失败: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"RAG 初始化失败: {str(e)}"
+        )
+
+
+# ============ 信息接口 ============
+
+@app.get("/api/info")
+async def get_info():
+    """
+    获取应用配置信息
+
+    Returns:
+        应用配置和运行信息
+    """
+    return {
+        "app_name": "股票投资 AI 助手",
+        "version": "1.0.0",
+        "llm_model": settings.model_name,
+        "llm_temperature": settings.temperature,
+        "vector_store_path": settings.vector_store_path,
+        "pdf_directory": settings.pdf_directory,
+        "debug": settings.debug,
+        "timestamp": datetime.now()
+    }
+
+
+# ============ 错误处理 ============
+
+@app.exception_handler(HTTPException)
+async def http_exception_handler(request, exc):
+    """自定义 HTTP 异常处理"""
+    logger.error(f"HTTP 异常: {exc.detail}")
+    return {
+        "error": True,
+        "status_code": exc.status_code,
+        "detail": exc.detail,
+        "timestamp": datetime.now()
+    }
+
+
+@app.exception_handler(Exception)
+async def general_exception_handler(request, exc):
+    """全局异常处理"""
+    logger.error(f"未处理的异常: {exc}", exc_info=True)
+    return {
+        "error": True,
+        "status_code": 500,
+        "detail": "内部服务器错误",
+        "timestamp": datetime.now()
+    }
+
+
+# ============ 启动命令 ============
+
+if __name__ == "__main__":
+    """
+    运行应用
+
+    开发模式（带自动重载）：
+        python main.py
+        或
+        uvicorn main:app --reload
+
+    生产模式（带多个工作进程）：
+        uvicorn main:app --host 0.0.0.0 --port 8000 --workers 4
+
+    指定主机和端口：
+        uvicorn main:app --host 127.0.0.1 --port 8000
+    """
+    import uvicorn
+
+    print("=" * 60)
+    print("🚀 股票投资 AI 助手")
+    print("=" * 60)
+    print(f"📍 访问地址: http://{settings.host}:{settings.port}")
+    print(f"📚 API 文档: http://{settings.host}:{settings.port}/docs")
+    print(f"🔄 ReDoc: http://{settings.host}:{settings.port}/redoc")
+    print("=" * 60)
+
+    uvicorn.run(
+        "main:app",  # 改为导入字符串格式
+        host=settings.host,
+        port=settings.port,
+        reload=settings.debug,
+        log_level="info"
     )
\ No newline at end of file
@@ -1,274 +1,1072 @@
-from langchain.agents import create_agent
-from langchain.tools import tool
-from src.core.llm import llm
-from src.agents.financial_analyst import get_financial_analyst
-from src.agents.market_analyst import get_market_analyst
-from src.agents.valuation_expert import get_valuation_expert
-from config.prompts import SUPERVISOR_PROMPT
-import logging
-
-logger = logging.getLogger(__name__)
-
-
-# ============ 定义工具来调用子代理 ============
-
-@tool
-def call_financial_analyst(stock_ticker: str, query: str) -> str:
-    """
-    调用财务分析代理进行财务分析
-
-    Args:
-        stock_ticker: 股票代码（如 AAPL、MSFT）
-        query: 分析问题
-
-    Returns:
-        财务分析结果
-    """
-    try:
-        analyst = get_financial_analyst()
-        result = analyst.invoke({
-            "messages": [
-                {
-                    "role": "user",
-                    "content": f"对 {stock_ticker} 进行财务分析：{query}"
-                }
-            ]
-        })
-
-        messages = result.get("messages", [])
-        if messages:
-            return messages[-1].content
-        return "财务分析无结果"
-
-    except Exception as e:
-        logger.error(f"财务分析失败: {e}")
-        return f"错误：财务分析失败 - {str(e)}"
-
-
-@tool
-def call_market_analyst(stock_ticker: str, query: str) -> str:
-    """
-    调用市场分析代理进行市场分析
-
-    Args:
-        stock_ticker: 股票代码
-        query: 分析问题
-
-    Returns:
-        市场分析结果
-    """
-    try:
-        analyst = get_market_analyst()
-        result = analyst.invoke({
-            "messages": [
-                {
-                    "role": "user",
-                    "content": f"分析 {stock_ticker} 的市场情况：{query}"
-                }
-            ]
-        })
-
-        messages = result.get("messages", [])
-        if messages:
-            return messages[-1].content
-        return "市场分析无结果"
-
-    except Exception as e:
-        logger.error(f"市场分析失败: {e}")
-        return f"错误：市场分析失败 - {str(e)}"
-
-
-@tool
-def call_valuation_expert(stock_ticker: str, query: str) -> str:
-    """
-    调用估值专家进行价值评估
-
-    Args:
-        stock_ticker: 股票代码
-        query: 估值问题
-
-    Returns:
-        估值分析结果
-    """
-    try:
-        expert = get_valuation_expert()
-        result = expert.invoke({
-            "messages": [
-                {
-                    "role": "user",
-                    "content": f"评估 {stock_ticker} 的价值：{query}"
-                }
-            ]
-        })
-
-        messages = result.get("messages", [])
-        if messages:
-            return messages[-1].content
-        return "估值分析无结果"
-
-    except Exception as e:
-        logger.error(f"估值分析失败: {e}")
-        return f"错误：估值分析失败 - {str(e)}"
-
-
-# ============ 创建主管理代理 ============
-
-def create_supervisor_agent():
-    """
-    创建投资决策主管代理
-
-    使用 Tool Calling 模式，通过调用三个专家代理来协调综合分析
-    """
-    return create_agent(
-        model=llm,
-        tools=[
-            call_financial_analyst,
-            call_market_analyst,
-            call_valuation_expert
-        ],
-        system_prompt=SUPERVISOR_PROMPT,
-    )
-
-
-# 单例模式 - 缓存主管理代理
-_supervisor = None
-
-
-def get_supervisor():
-    """
-    获取主管理代理实例（单例）
-
-    Returns:
-        主管理代理实例
-    """
-    global _supervisor
-    if _supervisor is None:
-        logger.info("初始化投资决策主管代理...")
-        _supervisor = create_supervisor_agent()
-        logger.info("✅ 主管理代理初始化完成")
-    return _supervisor
-
-
-async def analyze_stock_investment(
-        stock_ticker: str,
-        user_query: str,
-        include_financial: bool = True,
-        include_market: bool = True,
-        include_valuation: bool = True
-) -> str:
-    """
-    进行综合股票投资分析
-
-    这是主要的分析入口函数，流程如下：
-    1. 主管理代理接收用户的投资问题
-    2. 根据分析偏好调用相应的专家代理
-    3. 财务分析代理：分析公司财务状况
-    4. 市场分析代理：分析市场动向和情绪
-    5. 估值专家代理：评估股票价值
-    6. 主管理代理综合所有信息生成最终建议
-
-    Args:
-        stock_ticker: 股票代码（例如：AAPL）
-        user_query: 用户的投资问题（例如：这支股票值得买入吗？）
-        include_financial: 是否包含财务分析（默认 True）
-        include_market: 是否包含市场分析（默认 True）
-        include_valuation: 是否包含估值分析（默认 True）
-
-    Returns:
-        综合投资分析建议字符串
-
-    Raises:
-        Exception: 如果分析过程中出现错误
-
-    Example:
-        >>> result = await analyze_stock_investment(
-        ...     stock_ticker="AAPL",
-        ...     user_query="苹果公司是否值得投资？"
-        ... )
-        >>> print(result)
-    """
-    try:
-        supervisor = get_supervisor()
-
-        # 构建分析偏好列表
-        analysis_preferences = []
-        if include_financial:
-            analysis_preferences.append("财务状况分析")
-        if include_market:
-            analysis_preferences.append("市场动向分析")
-        if include_valuation:
-            analysis_preferences.append("价值评估分析")
-
-        # 构建完整的分析请求提示
-        full_prompt = f"""
-========================================
-股票投资分析请求
-========================================
-
-股票代码: {stock_ticker}
-用户问题: {user_query}
-
-分析范围: {', '.join(analysis_preferences) if analysis_preferences else '全面分析'}
-
-========================================
-请根据用户偏好调用相应的分析代理，然后综合所有信息提供投资建议。
-
-最终建议应包含以下内容：
-1. 财务评分（1-10分）
-2. 市场评分（1-10分）
-3. 估值评分（1-10分）
-4. 综合建议（强烈买入/买入/持有/卖出/强烈卖出）
-5. 目标价格范围
-6. 关键风险
-7. 投资时间框架建议
-========================================
-"""
-
-        logger.info(f"开始分析 {stock_ticker}，用户问题: {user_query}")
-
-        # 调用主管理代理进行综合分析
-        response = supervisor.invoke({
-            "messages": [
-                {
-                    "role": "user",
-                    "content": full_prompt
-                }
-            ]
-        })
-
-        # 提取响应内容
-        messages = response.get("messages", [])
-        if messages:
-            result = messages[-1].content
-            logger.info(f"✅ 成功完成 {stock_ticker} 的分析")
-            return result
-
-        # 如果没有返回消息，记录警告
-        logger.warning(f"{stock_ticker} 分析未返回结果")
-        return "分析失败：没有得到响应"
-
-    except Exception as e:
-        # 记录错误并重新抛出异常
-        logger.error(f"❌ 综合分析失败: {e}", exc_info=True)
-        raise
-
-
-# 便捷函数 - 用于简化 API 调用
-async def quick_analyze(stock_ticker: str, query: str) -> str:
-    """
-    快速分析股票（包含所有分析类型）
-
-    Args:
-        stock_ticker: 股票代码
-        query: 分析问题
-
-    Returns:
-        分析结果
-    """
-    return await analyze_stock_investment(
-        stock_ticker=stock_ticker,
-        user_query=query,
-        include_financial=True,
-        include_market=True,
-        include_valuation=True
-    )
\ No newline at end of file
+from langchain.agents import create_agent
+from langchain_core.tools import StructuredTool
+from langchain_core.messages import HumanMessage, SystemMessage
+from src.core.llm import get_llm
+from src.core.llm_gateway import BATCH, current_priority, llm_priority
+from src.agents.financial_analyst import get_financial_analyst
+from src.agents.market_analyst import get_market_analyst
+from src.agents.valuation_expert import get_valuation_expert
+from config.prompts import SUPERVISOR_PROMPT, SUPERVISOR_SYNTHESIS_PROMPT
+from src.core.executors import run_in_rag_executor
+from src.core.response_cache import ResponseCache
+from src.core.tracing import span
+from src.rag.retriever import rag_system
+from src.tools.financial import analyze_financial_statements, extract_key_metrics
+from src.tools.market import get_current_stock_price, get_market_data_version, get_market_sentiment
+from src.tools.technical import get_technical_indicators
+from config.settings import settings
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import asyncio
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# ============ 专家代理注册表 ============
+
+class SpecialistSpec(NamedTuple):
+    """专家代理的静态描述"""
+    label: str
+    get_agent: Callable[[], Any]
+    prompt_template: str
+    empty_message: str
+    prefetch: Tuple[str, ...] = ()  # 启动前预取的数据项（PREFETCH_ITEMS 的键）
+
+
+SPECIALISTS: Dict[str, SpecialistSpec] = {
+    "financial": SpecialistSpec(
+        label="财务分析",
+        get_agent=get_financial_analyst,
+        prompt_template="对 {stock_ticker} 进行财务分析：{query}",
+        empty_message="财务分析无结果",
+        prefetch=("filings", "metrics"),
+    ),
+    "market": SpecialistSpec(
+        label="市场分析",
+        get_agent=get_market_analyst,
+        prompt_template="分析 {stock_ticker} 的市场情况：{query}",
+        empty_message="市场分析无结果",
+        prefetch=("quote", "sentiment", "technical"),
+    ),
+    "valuation": SpecialistSpec(
+        label="估值分析",
+        get_agent=get_valuation_expert,
+        prompt_template="评估 {stock_ticker} 的价值：{query}",
+        empty_message="估值分析无结果",
+        prefetch=("quote", "metrics"),
+    ),
+}
+
+
+@dataclass
+class SpecialistReport:
+    """单个专家代理的执行结果"""
+    name: str
+    label: str
+    content: str
+    elapsed_seconds: float
+    success: bool = True
+
+
+@dataclass
+class AnalysisOutcome:
+    """一次综合分析的结果及耗时明细"""
+    analysis: str
+    mode: str = "sequential"
+    specialists: List[SpecialistReport] = field(default_factory=list)
+    synthesis_seconds: float = 0.0
+    total_seconds: float = 0.0
+    cached: bool = False
+
+    @property
+    def succeeded(self) -> bool:
+        """所有专家均成功且主管给出了结果"""
+        return bool(self.analysis) and all(r.success for r in self.specialists)
+
+    @property
+    def specialist_timings(self) -> Dict[str, float]:
+        """各专家代理耗时（秒）"""
+        return {r.name: round(r.elapsed_seconds, 3) for r in self.specialists}
+
+
+# ============ 数据预取 ============
+
+class PrefetchItem(NamedTuple):
+    """预取的数据项：直接调用确定性的工具，省去专家为此花费的 LLM 轮次"""
+    label: str
+    tool: Any
+    build_args: Callable[[str, str], dict]
+
+
+PREFETCH_ITEMS: Dict[str, PrefetchItem] = {
+    "quote": PrefetchItem(
+        "当前行情", get_current_stock_price, lambda ticker, query: {"stock_ticker": ticker}
+    ),
+    "sentiment": PrefetchItem(
+        "市场情绪", get_market_sentiment, lambda ticker, query: {"stock_ticker": ticker}
+    ),
+    "technical": PrefetchItem(
+        "技术指标", get_technical_indicators, lambda ticker, query: {"stock_ticker": ticker}
+    ),
+    "filings": PrefetchItem(
+        "财报片段", analyze_financial_statements, lambda ticker, query: {"stock_ticker": ticker, "query": query}
+    ),
+    "metrics": PrefetchItem(
+        "关键指标", extract_key_metrics, lambda ticker, query: {"stock_ticker": ticker, "metric_type": "关键指标"}
+    ),
+}
+
+# 注入专家输入的预取数据标题；各数据项以「### 名称（工具名）」开头，告诉模型哪些工具已经调用过
+PREFETCH_HEADER = "【预取数据】以下数据已由系统调用对应工具获取，无需重复调用；只在需要补充信息时使用工具。"
+
+
+@dataclass
+class DataBundle:
+    """一次分析预取的数据，各专家按需取用其中的数据项"""
+    stock_ticker: str
+    sections: Dict[str, str] = field(default_factory=dict)  # 数据项名称 -> 工具输出
+    elapsed_seconds: float = 0.0
+
+    def render(self, names: Iterable[str]) -> str:
+        """把指定的数据项格式化为专家输入的附加内容，没有数据时返回空字符串"""
+        parts = [
+            f"### {PREFETCH_ITEMS[name].label}（{PREFETCH_ITEMS[name].tool.name}）\n{self.sections[name]}"
+            for name in names if name in self.sections
+        ]
+        if not parts:
+            return ""
+        return PREFETCH_HEADER + "\n\n" + "\n\n".join(parts)
+
+
+async def prefetch_data(stock_ticker: str, query: str, specialists: List[str]) -> DataBundle:
+    """
+    并发预取各专家需要的标准数据（行情、情绪、技术指标、财报片段、关键指标）
+
+    多个专家需要的相同数据项只取一次；单项失败或超过 settings.prefetch_timeout 时跳过，
+    专家仍可通过工具自行获取。
+    """
+    names = list(dict.fromkeys(item for name in specialists for item in SPECIALISTS[name].prefetch))
+    bundle = DataBundle(stock_ticker=stock_ticker)
+    if not names:
+        return bundle
+
+    async def _fetch(name: str) -> Optional[str]:
+        item = PREFETCH_ITEMS[name]
+        try:
+            return await asyncio.wait_for(
+                item.tool.ainvoke(item.build_args(stock_ticker, query)),
+                timeout=settings.prefetch_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"预取{item.label}超时（{settings.prefetch_timeout}s）: {stock_ticker}")
+        except Exception as e:
+            logger.warning(f"预取{item.label}失败: {stock_ticker} - {e}")
+        return None
+
+    start = time.perf_counter()
+    with span("prefetch.data", "step", **{"stock_ticker": stock_ticker, "prefetch.items": ",".join(names)}):
+        results = await asyncio.gather(*(_fetch(name) for name in names))
+    bundle.sections = {name: result for name, result in zip(names, results) if result}
+    bundle.elapsed_seconds = time.perf_counter() - start
+    logger.info(f"📦 预取 {stock_ticker} 数据 {len(bundle.sections)}/{len(names)} 项，耗时 {bundle.elapsed_seconds:.2f}s")
+    return bundle
+
+
+async def _prefetch_for(stock_ticker: str, query: str, specialists: List[str]) -> Optional[DataBundle]:
+    """按配置预取数据，未启用时返回 None"""
+    if not settings.specialist_prefetch:
+        return None
+    return await prefetch_data(stock_ticker, query, specialists)
+
+
+# 各分析模式在日志中的名称
+_MODE_LABELS = {"direct": "专家直连", "parallel": "并行", "sequential": "顺序"}
+
+
+def _specialist_input(name: str, stock_ticker: str, query: str, data: Optional[DataBundle] = None) -> dict:
+    """构建专家代理的输入消息，附上该专家需要的预取数据"""
+    spec = SPECIALISTS[name]
+    content = spec.prompt_template.format(stock_ticker=stock_ticker, query=query)
+    prefetched = data.render(spec.prefetch) if data is not None else ""
+    if prefetched:
+        content = f"{content}\n\n{prefetched}"
+    return {
+        "messages": [
+            {
+                "role": "user",
+                "content": content
+            }
+        ]
+    }
+
+
+def _last_message_content(result: dict, default: str) -> str:
+    """提取代理返回的最后一条消息内容"""
+    messages = result.get("messages", [])
+    if messages:
+        return messages[-1].content
+    return default
+
+
+def _invoke_specialist(name: str, stock_ticker: str, query: str) -> str:
+    """同步调用专家代理（供主管代理的工具使用）"""
+    spec = SPECIALISTS[name]
+    try:
+        agent = spec.get_agent()
+        result = agent.invoke(_specialist_input(name, stock_ticker, query))
+        return _last_message_content(result, spec.empty_message)
+
+    except Exception as e:
+        logger.error(f"{spec.label}失败: {e}")
+        return f"错误：{spec.label}失败 - {str(e)}"
+
+
+async def run_specialist(
+        name: str,
+        stock_ticker: str,
+        query: str,
+        data: Optional[DataBundle] = None
+) -> SpecialistReport:
+    """
+    异步调用单个专家代理并记录耗时
+
+    Args:
+        name: 专家名称（financial / market / valuation）
+        stock_ticker: 股票代码
+        query: 分析问题
+        data: 已预取的数据；为 None 且启用了预取时，先为该专家单独预取
+
+    Returns:
+        SpecialistReport，失败时 success 为 False，content 为错误信息
+    """
+    spec = SPECIALISTS[name]
+    start = time.perf_counter()
+    with span(f"agent.{name}", "agent", **{"stock_ticker": stock_ticker}) as agent_span:
+        try:
+            if data is None:
+                data = await _prefetch_for(stock_ticker, query, [name])
+            agent = spec.get_agent()
+            result = await asyncio.wait_for(
+                agent.ainvoke(_specialist_input(name, stock_ticker, query, data)),
+                timeout=settings.specialist_timeout
+            )
+            content = _last_message_content(result, spec.empty_message)
+            success = True
+
+        except asyncio.TimeoutError:
+            logger.error(f"{spec.label}超时（{settings.specialist_timeout}s）")
+            content = f"错误：{spec.label}超时"
+            success = False
+
+        except Exception as e:
+            logger.error(f"{spec.label}失败: {e}")
+            content = f"错误：{spec.label}失败 - {str(e)}"
+            success = False
+
+        if not success:
+            agent_span.set_error(content)
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"⏱️ {spec.label}耗时 {elapsed:.2f}s")
+    return SpecialistReport(
+        name=name,
+        label=spec.label,
+        content=content,
+        elapsed_seconds=elapsed,
+        success=success
+    )
+
+
+@dataclass
+class _SharedSpecialist:
+    """进行中的共享专家任务及其等待方数量"""
+    task: "asyncio.Task[SpecialistReport]"
+    waiters: int = 0
+
+
+# 正在运行的专家任务：相同（专家, 股票, 问题, LLM 优先级通道）的并发请求共享同一次执行
+_inflight_specialists: Dict[tuple, _SharedSpecialist] = {}
+
+
+async def run_specialist_shared(
+        name: str,
+        stock_ticker: str,
+        query: str,
+        data: Optional[DataBundle] = None
+) -> SpecialistReport:
+    """
+    调用专家代理，并与正在进行的相同请求合并
+
+    批量分析或并发请求中出现重复的子查询时只执行一次；
+    单个等待方被取消不会影响共享的任务，最后一个等待方离开（如客户端断开）时取消任务。
+    合并键包含当前的 LLM 优先级通道，交互请求不会加入批量通道中运行的任务。
+    预取数据只由股票和问题决定，合并后沿用先发起的请求的预取结果。
+    """
+    key = (name, stock_ticker.strip().upper(), " ".join(query.split()).lower(), current_priority())
+    shared = _inflight_specialists.get(key)
+    if shared is None:
+        shared = _SharedSpecialist(asyncio.ensure_future(run_specialist(name, stock_ticker, query, data)))
+        _inflight_specialists[key] = shared
+
+        def _forget(_, entry=shared):
+            if _inflight_specialists.get(key) is entry:
+                del _inflight_specialists[key]
+
+        shared.task.add_done_callback(_forget)
+    else:
+        logger.info(f"🔗 复用进行中的{SPECIALISTS[name].label}: {stock_ticker}")
+
+    shared.waiters += 1
+    try:
+        return await asyncio.shield(shared.task)
+    finally:
+        shared.waiters -= 1
+        if shared.waiters == 0 and not shared.task.done():
+            # 没有等待方了，不再为无人接收的结果调用 LLM
+            if _inflight_specialists.get(key) is shared:
+                del _inflight_specialists[key]
+            shared.task.cancel()
+
+
+# ============ 定义工具来调用子代理 ============
+
+def _make_specialist_tool(name: str, tool_name: str, description: str) -> StructuredTool:
+    """
+    为专家代理创建主管可调用的工具
+
+    同时提供同步与异步实现：主管以 ainvoke 运行时，
+    专家代理也通过 ainvoke 调用，不会占用事件循环。
+    """
+
+    def _call(stock_ticker: str, query: str) -> str:
+        return _invoke_specialist(name, stock_ticker, query)
+
+    async def _acall(stock_ticker: str, query: str) -> str:
+        report = await run_specialist(name, stock_ticker, query)
+        return report.content
+
+    return StructuredTool.from_function(
+        func=_call,
+        coroutine=_acall,
+        name=tool_name,
+        description=inspect.cleandoc(description),
+    )
+
+
+call_financial_analyst = _make_specialist_tool(
+    "financial",
+    "call_financial_analyst",
+    """
+    调用财务分析代理进行财务分析
+
+    Args:
+        stock_ticker: 股票代码（如 AAPL、MSFT）
+        query: 分析问题
+
+    Returns:
+        财务分析结果
+    """,
+)
+
+call_market_analyst = _make_specialist_tool(
+    "market",
+    "call_market_analyst",
+    """
+    调用市场分析代理进行市场分析
+
+    Args:
+        stock_ticker: 股票代码
+        query: 分析问题
+
+    Returns:
+        市场分析结果
+    """,
+)
+
+call_valuation_expert = _make_specialist_tool(
+    "valuation",
+    "call_valuation_expert",
+    """
+    调用估值专家进行价值评估
+
+    Args:
+        stock_ticker: 股票代码
+        query: 估值问题
+
+    Returns:
+        估值分析结果
+    """,
+)
+
+
+# ============ 创建主管理代理 ============
+
+def create_supervisor_agent():
+    """
+    创建投资决策主管代理
+
+    使用 Tool Calling 模式，通过调用三个专家代理来协调综合分析
+    """
+    return create_agent(
+        model=get_llm(),
+        tools=[
+            call_financial_analyst,
+            call_market_analyst,
+            call_valuation_expert
+        ],
+        system_prompt=SUPERVISOR_PROMPT,
+    )
+
+
+# 单例模式 - 缓存主管理代理
+_supervisor = None
+
+
+def get_supervisor():
+    """
+    获取主管理代理实例（单例）
+
+    Returns:
+        主管理代理实例
+    """
+    global _supervisor
+    if _supervisor is None:
+        logger.info("初始化投资决策主管代理...")
+        _supervisor = create_supervisor_agent()
+        logger.info("✅ 主管理代理初始化完成")
+    return _supervisor
+
+
+def _selected_specialists(
+        include_financial: bool,
+        include_market: bool,
+        include_valuation: bool
+) -> List[str]:
+    """根据分析偏好返回需要调用的专家名称"""
+    selected = []
+    if include_financial:
+        selected.append("financial")
+    if include_market:
+        selected.append("market")
+    if include_valuation:
+        selected.append("valuation")
+    return selected
+
+
+def _build_analysis_prompt(stock_ticker: str, user_query: str, specialists: List[str]) -> str:
+    """构建提交给主管代理的分析请求"""
+    analysis_preferences = [
+        {"financial": "财务状况分析", "market": "市场动向分析", "valuation": "价值评估分析"}[name]
+        for name in specialists
+    ]
+
+    return f"""
+========================================
+股票投资分析请求
+========================================
+
+股票代码: {stock_ticker}
+用户问题: {user_query}
+
+分析范围: {', '.join(analysis_preferences) if analysis_preferences else '全面分析'}
+
+========================================
+请根据用户偏好调用相应的分析代理，然后综合所有信息提供投资建议。
+
+最终建议应包含以下内容：
+1. 财务评分（1-10分）
+2. 市场评分（1-10分）
+3. 估值评分（1-10分）
+4. 综合建议（强烈买入/买入/持有/卖出/强烈卖出）
+5. 目标价格范围
+6. 关键风险
+7. 投资时间框架建议
+========================================
+"""
+
+
+def _build_synthesis_prompt(
+        stock_ticker: str,
+        user_query: str,
+        reports: List[SpecialistReport]
+) -> str:
+    """把各专家的结果合并成主管综合阶段的输入"""
+    sections = "\n\n".join(
+        f"【{report.label}】\n{report.content}" for report in reports
+    )
+
+    return f"""
+========================================
+股票投资分析请求
+========================================
+
+股票代码: {stock_ticker}
+用户问题: {user_query}
+
+========================================
+专家分析结果
+========================================
+
+{sections}
+
+========================================
+请综合以上专家意见，给出最终投资建议，包含：
+1. 财务评分（1-10分）
+2. 市场评分（1-10分）
+3. 估值评分（1-10分）
+4. 综合建议（强烈买入/买入/持有/卖出/强烈卖出）
+5. 目标价格范围
+6. 关键风险
+7. 投资时间框架建议
+========================================
+"""
+
+
+async def run_specialists_parallel(
+        stock_ticker: str,
+        user_query: str,
+        specialists: List[str],
+        data: Optional[DataBundle] = None
+) -> List[SpecialistReport]:
+    """
+    并行调用多个专家代理
+
+    并发数量受 settings.specialist_max_concurrency 限制，
+    返回结果的顺序与 specialists 参数一致。
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.specialist_max_concurrency))
+
+    async def _bounded(name: str) -> SpecialistReport:
+        async with semaphore:
+            return await run_specialist_shared(name, stock_ticker, user_query, data)
+
+    return list(await asyncio.gather(*(_bounded(name) for name in specialists)))
+
+
+async def _analyze_parallel(
+        stock_ticker: str,
+        user_query: str,
+        specialists: List[str]
+) -> AnalysisOutcome:
+    """并行模式：先并发预取数据、运行专家代理，再由主管一次性综合"""
+    data = await _prefetch_for(stock_ticker, user_query, specialists)
+    reports = await run_specialists_parallel(stock_ticker, user_query, specialists, data)
+
+    synthesis_start = time.perf_counter()
+    with span("supervisor.synthesis", "step"):
+        response = await get_llm().ainvoke([
+            SystemMessage(content=SUPERVISOR_SYNTHESIS_PROMPT),
+            HumanMessage(content=_build_synthesis_prompt(stock_ticker, user_query, reports))
+        ])
+    synthesis_seconds = time.perf_counter() - synthesis_start
+    logger.info(f"⏱️ 主管综合耗时 {synthesis_seconds:.2f}s")
+
+    return AnalysisOutcome(
+        analysis=response.content,
+        mode="parallel",
+        specialists=reports,
+        synthesis_seconds=synthesis_seconds
+    )
+
+
+async def _analyze_direct(stock_ticker: str, user_query: str, name: str) -> AnalysisOutcome:
+    """
+    单一范围：直接调用对应的专家代理并返回其输出
+
+    只有一个专家时，主管的调度（顺序模式）和综合（并行模式）都只是转述专家的结论，
+    跳过它们可省去一到两次 LLM 调用。数据预取在 run_specialist 中进行。
+    """
+    report = await run_specialist_shared(name, stock_ticker, user_query)
+    return AnalysisOutcome(analysis=report.content, mode="direct", specialists=[report])
+
+
+async def _analyze_sequential(
+        stock_ticker: str,
+        user_query: str,
+        specialists: List[str]
+) -> AnalysisOutcome:
+    """顺序模式：由主管代理自行决定依次调用哪些专家"""
+    supervisor = get_supervisor()
+
+    # 调用主管理代理进行综合分析
+    response = await supervisor.ainvoke({
+        "messages": [
+            {
+                "role": "user",
+                "content": _build_analysis_prompt(stock_ticker, user_query, specialists)
+            }
+        ]
+    })
+
+    messages = response.get("messages", [])
+    if not messages:
+        logger.warning(f"{stock_ticker} 分析未返回结果")
+        return AnalysisOutcome(analysis="", mode="sequential")
+
+    return AnalysisOutcome(analysis=messages[-1].content, mode="sequential")
+
+
+# ============ 分析结果缓存 ============
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """获取分析结果缓存实例（单例），未启用时返回 None"""
+    global _response_cache
+    if not settings.response_cache_enabled:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            path=settings.response_cache_path,
+            embed=rag_system.embed_query,
+            # 启动预热期间不等待 embedding 模型加载，只做精确匹配
+            embed_ready=lambda: rag_system.embeddings_loaded,
+            ttl=settings.response_cache_ttl,
+            similarity_threshold=settings.response_cache_similarity
+        )
+    return _response_cache
+
+
+def _cache_scope(specialists: List[str]) -> str:
+    """分析范围缓存键，例如 financial+market"""
+    return "+".join(sorted(specialists))
+
+
+def _data_version() -> str:
+    """分析所依赖数据的版本：财报索引版本 + 行情快照版本"""
+    return f"index:{rag_system.index_version}|market:{get_market_data_version()}"
+
+
+async def run_analysis(
+        stock_ticker: str,
+        user_query: str,
+        include_financial: bool = True,
+        include_market: bool = True,
+        include_valuation: bool = True,
+        parallel: Optional[bool] = None,
+        use_cache: bool = True
+) -> AnalysisOutcome:
+    """
+    进行综合股票投资分析，并返回包含耗时明细的结果
+
+    Args:
+        stock_ticker: 股票代码（例如：AAPL）
+        user_query: 用户的投资问题
+        include_financial: 是否包含财务分析（默认 True）
+        include_market: 是否包含市场分析（默认 True）
+        include_valuation: 是否包含估值分析（默认 True）
+        parallel: 是否并行调用专家代理，None 时使用 settings.parallel_specialists
+        use_cache: 是否使用分析结果缓存（还需 settings.response_cache_enabled）
+
+    Returns:
+        AnalysisOutcome，命中缓存时 cached 为 True
+    """
+    if parallel is None:
+        parallel = settings.parallel_specialists
+
+    specialists = _selected_specialists(include_financial, include_market, include_valuation)
+    # 未指定任何范围时视为全面分析
+    if not specialists:
+        specialists = list(SPECIALISTS)
+
+    try:
+        start = time.perf_counter()
+
+        cache = get_response_cache() if use_cache else None
+        query_vector = None
+        if cache is not None:
+            cache_key = (stock_ticker.strip().upper(), _cache_scope(specialists), _data_version())
+            with span("cache.lookup", "cache") as lookup_span:
+                hit, query_vector = await run_in_rag_executor(cache.lookup, *cache_key, user_query)
+                lookup_span.set_attribute("cache.hit", hit is not None)
+            if hit is not None:
+                elapsed = time.perf_counter() - start
+                logger.info(
+                    f"⚡ 分析缓存命中 {stock_ticker}（相似度 {hit.similarity:.3f}，耗时 {elapsed * 1000:.1f}ms）"
+                )
+                return AnalysisOutcome(
+                    analysis=hit.analysis,
+                    mode="cached",
+                    total_seconds=elapsed,
+                    cached=True
+                )
+
+        if len(specialists) == 1 and settings.specialist_fast_path:
+            mode = "direct"
+        else:
+            mode = "parallel" if parallel else "sequential"
+        logger.info(f"开始分析 {stock_ticker}，用户问题: {user_query}（{_MODE_LABELS[mode]}模式）")
+        with span(f"analysis.{mode}", "analysis", **{
+            "stock_ticker": stock_ticker,
+            "specialists": _cache_scope(specialists),
+        }):
+            if mode == "direct":
+                outcome = await _analyze_direct(stock_ticker, user_query, specialists[0])
+            elif parallel:
+                outcome = await _analyze_parallel(stock_ticker, user_query, specialists)
+            else:
+                outcome = await _analyze_sequential(stock_ticker, user_query, specialists)
+
+        outcome.total_seconds = time.perf_counter() - start
+        logger.info(
+            f"✅ 成功完成 {stock_ticker} 的分析，总耗时 {outcome.total_seconds:.2f}s，"
+            f"专家耗时 {outcome.specialist_timings}"
+        )
+
+        # 只缓存所有专家都成功的结果
+        if cache is not None and outcome.succeeded:
+            with span("cache.store", "cache"):
+                await run_in_rag_executor(
+                    cache.store, *cache_key, user_query, outcome.analysis, query_vector
+                )
+
+        return outcome
+
+    except Exception as e:
+        # 记录错误并重新抛出异常
+        logger.error(f"❌ 综合分析失败: {e}", exc_info=True)
+        raise
+
+
+async def stream_stock_investment(
+        stock_ticker: str,
+        user_query: str,
+        include_financial: bool = True,
+        include_market: bool = True,
+        include_valuation: bool = True,
+        use_cache: bool = True
+) -> AsyncIterator[dict]:
+    """
+    流式综合分析
+
+    并行运行专家代理，每个专家开始 / 完成时立即产出事件，
+    随后逐 token 产出主管的综合结果（只涉及一个专家时直接产出该专家的输出）。
+
+    事件格式为 {"event": 名称, "data": 字典}，依次为：
+    - analysis_started：分析开始
+    - specialist_started / specialist_finished：专家开始 / 完成（含输出与耗时）
+    - synthesis_started：主管开始综合（专家直连时没有）
+    - token：综合结果的一个片段
+    - done：结束，含首 token 时间（ttft_seconds）、总耗时和专家耗时
+    - error：出现异常
+    命中分析结果缓存时，直接产出一个完整的 token 事件和 done 事件。
+    """
+    specialists = _selected_specialists(include_financial, include_market, include_valuation)
+    if not specialists:
+        specialists = list(SPECIALISTS)
+
+    start = time.perf_counter()
+    ttft = None
+
+    try:
+        yield {"event": "analysis_started", "data": {
+            "stock_ticker": stock_ticker,
+            "query": user_query,
+            "specialists": specialists,
+        }}
+
+        cache = get_response_cache() if use_cache else None
+        query_vector = None
+        if cache is not None:
+            cache_key = (stock_ticker.strip().upper(), _cache_scope(specialists), _data_version())
+            with span("cache.lookup", "cache") as lookup_span:
+                hit, query_vector = await run_in_rag_executor(cache.lookup, *cache_key, user_query)
+                lookup_span.set_attribute("cache.hit", hit is not None)
+            if hit is not None:
+                elapsed = time.perf_counter() - start
+                yield {"event": "token", "data": {"text": hit.analysis}}
+                yield {"event": "done", "data": {
+                    "cached": True,
+                    "ttft_seconds": round(elapsed, 4),
+                    "total_seconds": round(elapsed, 4),
+                    "specialist_timings": {},
+                }}
+                return
+
+        # ===== 并行运行专家，按完成顺序产出 =====
+        semaphore = asyncio.Semaphore(max(1, settings.specialist_max_concurrency))
+
+        async def _bounded(name: str) -> SpecialistReport:
+            async with semaphore:
+                return await run_specialist_shared(name, stock_ticker, user_query, data)
+
+        for name in specialists:
+            yield {"event": "specialist_started", "data": {"name": name, "label": SPECIALISTS[name].label}}
+
+        data = await _prefetch_for(stock_ticker, user_query, specialists)
+        tasks = [asyncio.create_task(_bounded(name)) for name in specialists]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                report = await next_done
+                yield {"event": "specialist_finished", "data": {
+                    "name": report.name,
+                    "label": report.label,
+                    "success": report.success,
+                    "elapsed_seconds": round(report.elapsed_seconds, 3),
+                    "content": report.content,
+                }}
+        finally:
+            # 客户端断开时取消仍在运行的专家
+            for task in tasks:
+                task.cancel()
+
+        reports = [task.result() for task in tasks]
+
+        synthesis_start = time.perf_counter()
+        parts = []
+        if len(reports) == 1 and settings.specialist_fast_path:
+            # 只有一个专家时直接输出其结论，不再由主管综合
+            ttft = time.perf_counter() - start
+            parts.append(reports[0].content)
+            yield {"event": "token", "data": {"text": reports[0].content}}
+        else:
+            # ===== 主管综合，逐 token 输出 =====
+            yield {"event": "synthesis_started", "data": {}}
+            with span("supervisor.synthesis", "step", **{"streaming": True}):
+                async for chunk in get_llm().astream([
+                    SystemMessage(content=SUPERVISOR_SYNTHESIS_PROMPT),
+                    HumanMessage(content=_build_synthesis_prompt(stock_ticker, user_query, reports))
+                ]):
+                    text = chunk.content
+                    if not text:
+                        continue
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                        logger.info(f"⏱️ {stock_ticker} 首 token 时间 {ttft:.2f}s")
+                    parts.append(text)
+                    yield {"event": "token", "data": {"text": text}}
+
+        outcome = AnalysisOutcome(
+            analysis="".join(parts),
+            mode="stream",
+            specialists=reports,
+            synthesis_seconds=time.perf_counter() - synthesis_start,
+            total_seconds=time.perf_counter() - start
+        )
+        logger.info(
+            f"✅ 流式分析 {stock_ticker} 完成，总耗时 {outcome.total_seconds:.2f}s，"
+            f"专家耗时 {outcome.specialist_timings}"
+        )
+
+        if cache is not None and outcome.succeeded:
+            with span("cache.store", "cache"):
+                await run_in_rag_executor(
+                    cache.store, *cache_key, user_query, outcome.analysis, query_vector
+                )
+
+        yield {"event": "done", "data": {
+            "cached": False,
+            "ttft_seconds": round(ttft, 4) if ttft is not None else None,
+            "synthesis_seconds": round(outcome.synthesis_seconds, 3),
+            "total_seconds": round(outcome.total_seconds, 3),
+            "specialist_timings": outcome.specialist_timings,
+        }}
+
+    except Exception as e:
+        logger.error(f"❌ 流式分析失败: {e}", exc_info=True)
+        yield {"event": "error", "data": {"detail": str(e)}}
+
+
+async def analyze_stock_investment(
+        stock_ticker: str,
+        user_query: str,
+        include_financial: bool = True,
+        include_market: bool = True,
+        include_valuation: bool = True,
+        parallel: Optional[bool] = None
+) -> str:
+    """
+    进行综合股票投资分析
+
+    这是主要的分析入口函数，流程如下：
+    1. 根据分析偏好确定需要调用的专家代理
+    2. 并行模式下：先并发预取行情、财报等数据，同时运行财务、市场、估值专家，再由主管一次性综合
+    3. 顺序模式下：主管理代理通过工具调用依次调用专家代理
+    4. 主管理代理综合所有信息生成最终建议
+
+    Args:
+        stock_ticker: 股票代码（例如：AAPL）
+        user_query: 用户的投资问题（例如：这支股票值得买入吗？）
+        include_financial: 是否包含财务分析（默认 True）
+        include_market: 是否包含市场分析（默认 True）
+        include_valuation: 是否包含估值分析（默认 True）
+        parallel: 是否并行调用专家代理，None 时使用 settings.parallel_specialists
+
+    Returns:
+        综合投资分析建议字符串
+
+    Raises:
+        Exception: 如果分析过程中出现错误
+
+    Example:
+        >>> result = await analyze_stock_investment(
+        ...     stock_ticker="AAPL",
+        ...     user_query="苹果公司是否值得投资？"
+        ... )
+        >>> print(result)
+    """
+    outcome = await run_analysis(
+        stock_ticker=stock_ticker,
+        user_query=user_query,
+        include_financial=include_financial,
+        include_market=include_market,
+        include_valuation=include_valuation,
+        parallel=parallel
+    )
+    return outcome.analysis or "分析失败：没有得到响应"
+
+
+# 便捷函数 - 用于简化 API 调用
+async def quick_analyze(stock_ticker: str, query: str) -> str:
+    """
+    快速分析股票（包含所有分析类型）
+
+    Args:
+        stock_ticker: 股票代码
+        query: 分析问题
+
+    Returns:
+        分析结果
+    """
+    return await analyze_stock_investment(
+        stock_ticker=stock_ticker,
+        user_query=query,
+        include_financial=True,
+        include_market=True,
+        include_valuation=True
+    )
+
+
+# ============ 批量分析 ============
+
+@dataclass
+class WatchlistResult:
+    """批量分析中单只股票的结果"""
+    stock_ticker: str
+    success: bool
+    analysis: str = ""
+    cached: bool = False
+    elapsed_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class WatchlistSummary:
+    """批量分析汇总"""
+    total: int
+    succeeded: int
+    failed: int
+    cached: int
+    elapsed_seconds: float
+
+    @property
+    def tickers_per_minute(self) -> float:
+        return self.total / self.elapsed_seconds * 60 if self.elapsed_seconds else 0.0
+
+
+def _dedupe_tickers(stock_tickers: List[str]) -> List[str]:
+    """规范化并去重股票代码，保持原顺序"""
+    seen, result = set(), []
+    for ticker in stock_tickers:
+        normalized = ticker.strip().upper()
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            result.append(normalized)
+    return result
+
+
+async def analyze_watchlist(
+        stock_tickers: List[str],
+        query: str,
+        include_financial: bool = True,
+        include_market: bool = True,
+        include_valuation: bool = True,
+        max_concurrency: Optional[int] = None
+) -> AsyncIterator[Any]:
+    """
+    批量分析一组股票，按完成顺序逐个产出结果
+
+    - 股票代码去重；相同的专家子查询在并发任务间合并执行
+    - 同时分析的股票数量受 max_concurrency（默认 settings.batch_max_concurrency）限制
+    - LLM 请求走网关的 batch 通道，交互请求优先，且 batch 最多占用 settings.llm_batch_max_concurrency 个并发
+    - 命中分析结果缓存的股票直接返回
+
+    Args:
+        stock_tickers: 股票代码列表
+        query: 对每只股票提出的分析问题
+        max_concurrency: 并发分析的股票数量上限
+
+    Yields:
+        每只股票的 WatchlistResult，最后产出一个 WatchlistSummary
+
+    Example:
+        >>> async for item in analyze_watchlist(["AAPL", "MSFT"], "是否值得买入？"):
+        ...     print(item)
+    """
+    tickers = _dedupe_tickers(stock_tickers)
+    concurrency = max(1, max_concurrency or settings.batch_max_concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    logger.info(f"📋 批量分析 {len(tickers)} 只股票（并发 {concurrency}）")
+    start = time.perf_counter()
+
+    async def _analyze_one(ticker: str) -> WatchlistResult:
+        # 每只股票在独立任务中运行，设置的优先级只作用于本任务
+        with llm_priority(BATCH):
+            async with semaphore:
+                ticker_start = time.perf_counter()
+                try:
+                    outcome = await run_analysis(
+                        stock_ticker=ticker,
+                        user_query=query,
+                        include_financial=include_financial,
+                        include_market=include_market,
+                        include_valuation=include_valuation,
+                        parallel=True
+                    )
+                    return WatchlistResult(
+                        stock_ticker=ticker,
+                        success=outcome.succeeded,
+                        analysis=outcome.analysis,
+                        cached=outcome.cached,
+                        elapsed_seconds=time.perf_counter() - ticker_start
+                    )
+                except Exception as e:
+                    return WatchlistResult(
+                        stock_ticker=ticker,
+                        success=False,
+                        elapsed_seconds=time.perf_counter() - ticker_start,
+                        error=str(e)
+                    )
+
+    succeeded = failed = cached = 0
+    tasks = [asyncio.create_task(_analyze_one(ticker)) for ticker in tickers]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if result.success:
+                succeeded += 1
+            else:
+                failed += 1
+            cached += int(result.cached)
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    summary = WatchlistSummary(
+        total=len(tickers),
+        succeeded=succeeded,
+        failed=failed,
+        cached=cached,
+        elapsed_seconds=time.perf_counter() - start
+    )
+    logger.info(
+        f"✅ 批量分析完成：{summary.succeeded}/{summary.total} 成功，"
+        f"{summary.cached} 个命中缓存，耗时 {summary.elapsed_seconds:.1f}s，"
+        f"吞吐量 {summary.tickers_per_minute:.1f} 只/分钟"
+    )
+    yield summary
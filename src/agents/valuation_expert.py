@@ -1,19 +1,31 @@
-from langchain.agents import create_agent
-from src.core.llm import llm
-from src.tools.valuation import calculate_pe_ratio, calculate_intrinsic_value
-from config.prompts import VALUATION_EXPERT_PROMPT
-
-def create_valuation_expert():
-    return create_agent(
-        model=llm,
-        tools=[calculate_pe_ratio, calculate_intrinsic_value],
-        system_prompt=VALUATION_EXPERT_PROMPT,
-    )
-
-_expert = None
-
-def get_valuation_expert():
-    global _expert
-    if _expert is None:
-        _expert = create_valuation_expert()
+from langchain.agents import create_agent
+from src.core.llm import get_llm
+from src.tools.valuation import (
+    calculate_pe_ratio,
+    calculate_intrinsic_value,
+    dcf_sensitivity_analysis,
+    comparables_valuation,
+    monte_carlo_valuation,
+)
+from config.prompts import VALUATION_EXPERT_PROMPT
+
+def create_valuation_expert():
+    return create_agent(
+        model=get_llm(),
+        tools=[
+            calculate_pe_ratio,
+            calculate_intrinsic_value,
+            dcf_sensitivity_analysis,
+            comparables_valuation,
+            monte_carlo_valuation,
+        ],
+        system_prompt=VALUATION_EXPERT_PROMPT,
+    )
+
+_expert = None
+
+def get_valuation_expert():
+    global _expert
+    if _expert is None:
+        _expert = create_valuation_expert()
     return _expert
\ No newline at end of file
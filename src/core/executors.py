@@ -0,0 +1,53 @@
+"""
+专用线程池
+将 embedding 计算、Chroma 读写等同步阻塞操作移出事件循环
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial
+from typing import Any, Callable, Optional
+from config.settings import settings
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_rag_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_rag_executor() -> ThreadPoolExecutor:
+    """获取 RAG 专用线程池（单例）"""
+    global _rag_executor
+    if _rag_executor is None:
+        _rag_executor = ThreadPoolExecutor(
+            max_workers=settings.rag_executor_workers,
+            thread_name_prefix="rag-worker"
+        )
+        logger.info(f"🧵 RAG 线程池已创建（{settings.rag_executor_workers} 个线程）")
+    return _rag_executor
+
+
+async def run_in_rag_executor(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    在 RAG 专用线程池中执行同步函数，避免阻塞事件循环
+
+    Args:
+        func: 同步函数（如 rag_system.retrieve）
+        *args, **kwargs: 传给 func 的参数
+
+    Returns:
+        func 的返回值
+    """
+    loop = asyncio.get_running_loop()
+    # 与 asyncio.to_thread 一样带上当前上下文（当前 span、LLM 优先级通道等 contextvars）
+    context = copy_context()
+    return await loop.run_in_executor(get_rag_executor(), partial(context.run, func, *args, **kwargs))
+
+
+def shutdown_executors():
+    """关闭线程池（应用关闭时调用）"""
+    global _rag_executor
+    if _rag_executor is not None:
+        _rag_executor.shutdown(wait=False, cancel_futures=True)
+        _rag_executor = None
@@ -1,14 +1,62 @@
-from langchain_openai import ChatOpenAI
-from config.settings import settings
-
-def get_deepseek_llm() -> ChatOpenAI:
-    """初始化 DeepSeek LLM"""
-    return ChatOpenAI(
-        model=settings.model_name,
-        api_key=settings.deepseek_api_key,
-        base_url=settings.deepseek_api_base,
-        temperature=settings.temperature,
-        max_tokens=4096,
-    )
-
-llm = get_deepseek_llm()
\ No newline at end of file
+from typing import TYPE_CHECKING
+from threading import Lock
+from config.settings import settings
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+
+def get_deepseek_llm() -> "ChatOpenAI":
+    """
+    初始化 DeepSeek LLM
+
+    启用 LLM 网关时，异步请求经过共享的连接池、并发上限、令牌桶和重试（src/core/llm_gateway.py），
+    异步的 openai 客户端不再重试，避免两层重试叠加；同步客户端不经过网关，保留 openai 客户端自带的重试。
+    """
+    # langchain_openai 导入较慢，推迟到第一次使用时
+    from langchain_openai import ChatOpenAI
+
+    client_kwargs = {}
+    if settings.llm_gateway_enabled:
+        from src.core.llm_gateway import build_http_clients, get_llm_gateway
+
+        http_client, http_async_client = build_http_clients(get_llm_gateway())
+        client_kwargs = {
+            "http_client": http_client,
+            "http_async_client": http_async_client,
+            "max_retries": 0,
+        }
+
+    llm = ChatOpenAI(
+        model=settings.model_name,
+        api_key=settings.deepseek_api_key,
+        base_url=settings.deepseek_api_base,
+        temperature=settings.temperature,
+        max_tokens=4096,
+        timeout=settings.llm_timeout,
+        # 流式响应的最后一块也带上 token 用量（供追踪指标和网关 token 限额使用）
+        stream_usage=True,
+        **client_kwargs,
+    )
+    if settings.llm_gateway_enabled:
+        # max_retries=0 对同步、异步客户端同时生效，同步客户端恢复 openai 的默认重试
+        import openai
+
+        llm.root_client = llm.root_client.with_options(max_retries=openai.DEFAULT_MAX_RETRIES)
+        llm.client = llm.root_client.chat.completions
+    return llm
+
+
+# 单例模式 - 所有代理共享同一个客户端（连接池和网关）
+_llm = None
+_llm_lock = Lock()
+
+
+def get_llm() -> "ChatOpenAI":
+    """获取共享的 LLM 客户端（单例，第一次调用时创建）"""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = get_deepseek_llm()
+    return _llm
@@ -0,0 +1,452 @@
+"""
+LLM 网关
+所有代理共享的 DeepSeek 请求入口，作为 httpx 传输层挂在 ChatOpenAI 的异步客户端上：
+
+- 连接池：HTTP/2 长连接复用（未安装 h2 时退回 HTTP/1.1）
+- 并发上限：同时进行中的请求数，流式响应读完才释放
+- 令牌桶：每分钟请求数、每分钟 token 数（输入 + 预留输出，响应返回后按实际用量修正）
+- 优先级通道：interactive（API 请求）先于 batch（批量分析）发放，batch 最多占用部分并发
+- 重试：429 / 5xx / 连接错误按带抖动的指数退避重试，遵守 Retry-After；
+  收到 429 时暂停所有请求的发放，避免重试在服务端限流期间堆积
+- 指标：各通道排队数、等待时间、重试和限流次数（/api/llm/stats）
+
+同步调用（invoke）只使用连接池和 openai 客户端自带的重试，应用中的 LLM 调用都是异步的。
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+from config.settings import settings
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# ============ 优先级通道 ============
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)  # 按优先级从高到低
+
+_priority: ContextVar[str] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(lane: str):
+    """
+    在当前上下文（及其中创建的任务）中以指定通道发送 LLM 请求
+
+    Example:
+        >>> with llm_priority(BATCH):
+        ...     await run_analysis(...)
+    """
+    if lane not in LANES:
+        raise ValueError(f"未知的 LLM 优先级通道: {lane}")
+    token = _priority.set(lane)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+# ============ 令牌桶 ============
+
+class TokenBucket:
+    """令牌桶：按每分钟速率匀速补充，最多积累 capacity 个；速率 <= 0 时不限制"""
+
+    def __init__(self, per_minute: float, capacity: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(float(capacity), 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """取出 amount 个令牌还需等待的秒数（超过容量的请求按容量计算，避免永远等待）"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        deficit = min(amount, self.capacity) - self.level
+        return deficit / self.rate if deficit > 0 else 0.0
+
+    def consume(self, amount: float, now: float):
+        if not self.unlimited:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        """归还（amount < 0 时补扣）令牌；实际用量超出预留时允许欠账"""
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + amount)
+
+
+# ============ 调度 ============
+
+@dataclass
+class _Waiter:
+    lane: str
+    tokens: int
+    future: asyncio.Future
+    enqueued: float
+
+
+class LLMGateway:
+    """按优先级通道发放 LLM 请求许可（只在事件循环线程中使用）"""
+
+    def __init__(
+            self,
+            max_concurrency: int,
+            batch_max_concurrency: int,
+            requests_per_minute: float = 0.0,
+            request_burst: int = 5,
+            tokens_per_minute: float = 0.0,
+            max_retries: int = 4,
+            backoff_base: float = 0.5,
+            backoff_max: float = 30.0
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.lane_limits = {INTERACTIVE: self.max_concurrency, BATCH: max(1, batch_max_concurrency)}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._requests = TokenBucket(requests_per_minute, request_burst)
+        # token 桶容量为一分钟的额度
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute)
+        self._queues: Dict[str, deque] = {lane: deque() for lane in LANES}
+        self._in_flight: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # 指标
+        self._waits: Dict[str, deque] = {lane: deque(maxlen=1024) for lane in LANES}
+        self._granted: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._max_queued: Dict[str, int] = {lane: 0 for lane in LANES}
+        self.retries = 0
+        self.rate_limited = 0  # 收到的 429 次数
+        self.failures = 0  # 重试耗尽后仍失败的请求数
+        self.tokens_reserved = 0
+        self.tokens_used = 0
+
+    # ----- 许可 -----
+
+    async def acquire(self, lane: str, tokens: int) -> float:
+        """
+        排队等待发送许可
+
+        Returns:
+            排队等待的秒数
+        """
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(lane, tokens, loop.create_future(), time.monotonic())
+        queue = self._queues[lane]
+        queue.append(waiter)
+        self._max_queued[lane] = max(self._max_queued[lane], len(queue))
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 许可已发放但调用方被取消
+                self.release(lane, tokens, used=0)
+            elif waiter in queue:
+                queue.remove(waiter)
+            raise
+        return time.monotonic() - waiter.enqueued
+
+    def release(self, lane: str, reserved: int, used: Optional[int] = None):
+        """
+        请求结束，归还并发名额
+
+        Args:
+            reserved: 发放许可时预留的 token 数
+            used: 实际用量（未知时为 None，保留预留量）
+        """
+        self._in_flight[lane] -= 1
+        if used is not None:
+            self._tokens.refund(reserved - used)
+            self.tokens_used += used
+        else:
+            self.tokens_used += reserved
+        self._dispatch()
+
+    def _dispatch(self):
+        """按优先级依次发放许可，直到并发名额、令牌或暂停期不允许"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while True:
+            lane = next((lane for lane in LANES if self._queues[lane]), None)
+            if lane is None:
+                return
+            if sum(self._in_flight.values()) >= self.max_concurrency:
+                return  # 有请求结束时 release 会再次调度
+            if self._in_flight[lane] >= self.lane_limits[lane]:
+                return
+
+            waiter = self._queues[lane][0]
+            if waiter.future.done():
+                # 调用方已取消，acquire 还没来得及把它移出队列
+                self._queues[lane].popleft()
+                continue
+            now = time.monotonic()
+            delay = max(
+                self._paused_until - now,
+                self._requests.wait_time(1, now),
+                self._tokens.wait_time(waiter.tokens, now),
+            )
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+
+            self._queues[lane].popleft()
+            self._requests.consume(1, now)
+            self._tokens.consume(waiter.tokens, now)
+            self._in_flight[lane] += 1
+            self._granted[lane] += 1
+            self.tokens_reserved += waiter.tokens
+            self._waits[lane].append(now - waiter.enqueued)
+            waiter.future.set_result(None)
+
+    # ----- 重试 -----
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次重试前的等待时间：全抖动指数退避，不短于服务端的 Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def pause(self, seconds: float):
+        """服务端限流：在 seconds 秒内暂停发放所有通道的许可"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    # ----- 指标 -----
+
+    def stats(self) -> dict:
+        """各通道排队数、进行中请求数和等待时间"""
+        lanes = {}
+        for lane in LANES:
+            waits = sorted(self._waits[lane])
+            lanes[lane] = {
+                "queued": len(self._queues[lane]),
+                "max_queued": self._max_queued[lane],
+                "in_flight": self._in_flight[lane],
+                "limit": self.lane_limits[lane],
+                "granted": self._granted[lane],
+                "wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "lanes": lanes,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "tokens_reserved": self.tokens_reserved,
+            "tokens_used": self.tokens_used,
+        }
+
+
+# ============ httpx 传输层 ============
+
+_RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+_CJK = re.compile(r"[\u4e00-\u9fff]")
+# 非流式 JSON 响应最多缓存的字节数（用于读取 usage）
+_MAX_CAPTURE = 1 << 20
+
+
+def _estimate_tokens(body: bytes) -> int:
+    """按请求体估算本次请求的 token 数：消息 + 工具定义 + 预留的输出"""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return settings.llm_expected_completion_tokens
+    text = json.dumps([payload.get("messages"), payload.get("tools")], ensure_ascii=False)
+    cjk = len(_CJK.findall(text))
+    prompt = cjk + (len(text) - cjk) // 4
+    completion = payload.get("max_tokens") or payload.get("max_completion_tokens") or settings.llm_expected_completion_tokens
+    return prompt + min(completion, settings.llm_expected_completion_tokens)
+
+
+def _retry_after(headers: httpx.Headers) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期）"""
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def _usage_tokens(body: bytes) -> Optional[int]:
+    try:
+        return int(json.loads(body)["usage"]["total_tokens"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class _GatewayStream(httpx.AsyncByteStream):
+    """包装响应体：读完（关闭）时归还并发名额，非流式响应顺带读取实际 token 用量"""
+
+    def __init__(self, inner: httpx.AsyncByteStream, capture: bool, on_close: Callable[[Optional[bytes]], None]):
+        self._inner = inner
+        self._capture = capture
+        self._buffer = bytearray()
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._inner:
+            if self._capture and len(self._buffer) < _MAX_CAPTURE:
+                self._buffer.extend(chunk)
+            yield chunk
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self._inner.aclose()
+        finally:
+            self._on_close(bytes(self._buffer) if self._capture else None)
+
+
+class GatewayTransport(httpx.AsyncBaseTransport):
+    """在连接池之前排队、限速和重试的异步传输层"""
+
+    def __init__(self, gateway: LLMGateway, inner: httpx.AsyncBaseTransport):
+        self.gateway = gateway
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        gateway = self.gateway
+        lane = current_priority()
+        tokens = _estimate_tokens(await request.aread())
+
+        attempt = 0
+        while True:
+            await gateway.acquire(lane, tokens)
+            try:
+                response = await self.inner.handle_async_request(request)
+            except httpx.TransportError as e:
+                gateway.release(lane, tokens, used=0)
+                if attempt >= gateway.max_retries:
+                    gateway.failures += 1
+                    raise
+                delay = gateway.backoff(attempt)
+                logger.warning(f"⚠️ LLM 请求失败（{type(e).__name__}），{delay:.1f}s 后第 {attempt + 1} 次重试")
+            except BaseException:
+                gateway.release(lane, tokens, used=0)
+                raise
+            else:
+                if response.status_code not in _RETRY_STATUS:
+                    response.stream = _GatewayStream(
+                        response.stream,
+                        capture=response.headers.get("content-type", "").startswith("application/json"),
+                        on_close=lambda body: gateway.release(lane, tokens, _usage_tokens(body) if body else None)
+                    )
+                    return response
+
+                if response.status_code == 429:
+                    gateway.rate_limited += 1
+                if attempt >= gateway.max_retries:
+                    # 重试耗尽：把最后一次的错误响应交给 openai 客户端，由它抛出 RateLimitError 等异常
+                    gateway.failures += 1
+                    response.stream = _GatewayStream(
+                        response.stream, capture=False, on_close=lambda _: gateway.release(lane, tokens, used=0)
+                    )
+                    return response
+
+                retry_after = _retry_after(response.headers)
+                await response.aclose()
+                delay = gateway.backoff(attempt, retry_after)
+                if response.status_code == 429:
+                    # 先暂停再归还名额，否则 release 会立即把排队的请求发往正在限流的服务端
+                    gateway.pause(delay)
+                gateway.release(lane, tokens, used=0)
+                logger.warning(
+                    f"⚠️ LLM 请求返回 {response.status_code}，{delay:.1f}s 后第 {attempt + 1} 次重试"
+                )
+
+            gateway.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+# ============ 客户端构建 ============
+
+def _http2_available() -> bool:
+    if not settings.llm_http2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("⚠️ 未安装 h2（pip install 'httpx[http2]'），LLM 连接池使用 HTTP/1.1")
+        return False
+
+
+def build_http_clients(gateway: LLMGateway) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """ChatOpenAI 使用的同步 / 异步 httpx 客户端（共享配置的连接池，异步客户端经过网关）"""
+    http2 = _http2_available()
+    limits = httpx.Limits(
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_connections,
+        keepalive_expiry=60.0,
+    )
+    timeout = httpx.Timeout(settings.llm_timeout, connect=10.0)
+    sync_client = httpx.Client(http2=http2, limits=limits, timeout=timeout)
+    async_client = httpx.AsyncClient(
+        transport=GatewayTransport(gateway, httpx.AsyncHTTPTransport(http2=http2, limits=limits)),
+        timeout=timeout,
+    )
+    return sync_client, async_client
+
+
+# 单例模式
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """获取 LLM 网关实例（单例）"""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway(
+            max_concurrency=settings.llm_max_concurrency,
+            batch_max_concurrency=settings.llm_batch_max_concurrency,
+            requests_per_minute=settings.llm_requests_per_minute,
+            request_burst=settings.llm_max_burst,
+            tokens_per_minute=settings.llm_tokens_per_minute,
+            max_retries=settings.llm_max_retries,
+            backoff_base=settings.llm_backoff_base,
+            backoff_max=settings.llm_backoff_max,
+        )
+    return _gateway
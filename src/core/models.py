@@ -1,19 +1,31 @@
-from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import datetime
-
-class StockAnalysisRequest(BaseModel):
-    stock_ticker: str = Field(..., description="股票代码")
-    query: str = Field(..., description="分析问题")
-
-class StockAnalysisResponse(BaseModel):
-    stock_ticker: str
-    query: str
-    timestamp: datetime = Field(default_factory=datetime.now)
-    analysis: str
-    recommendation: Optional[str] = None
-    target_price: Optional[float] = None
-
-class HealthResponse(BaseModel):
-    status: str
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from datetime import datetime
+
+class StockAnalysisRequest(BaseModel):
+    stock_ticker: str = Field(..., description="股票代码")
+    query: str = Field(..., description="分析问题")
+
+class BatchAnalysisRequest(BaseModel):
+    stock_tickers: List[str] = Field(..., min_length=1, description="股票代码列表")
+    query: str = Field(..., description="对每只股票提出的分析问题")
+    include_financial: bool = True
+    include_market: bool = True
+    include_valuation: bool = True
+    max_concurrency: Optional[int] = Field(default=None, ge=1, description="并发分析的股票数量上限")
+
+class StockAnalysisResponse(BaseModel):
+    stock_ticker: str
+    query: str
+    timestamp: datetime = Field(default_factory=datetime.now)
+    analysis: str
+    recommendation: Optional[str] = None
+    target_price: Optional[float] = None
+    specialist_timings: Optional[Dict[str, float]] = Field(
+        default=None, description="各专家代理耗时（秒），仅并行模式提供"
+    )
+    cached: bool = Field(default=False, description="是否来自分析结果缓存")
+
+class HealthResponse(BaseModel):
+    status: str
     version: str = "1.0.0"
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+语义响应缓存
+缓存完整的主管分析结果，按股票代码、分析范围、数据版本匹配，
+问题文本按 embedding 相似度匹配；使用 SQLite 持久化，重启后仍然有效。
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+import logging
+import sqlite3
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticker TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    data_version TEXT NOT NULL,
+    query TEXT NOT NULL,
+    query_norm TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    analysis TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_lookup
+    ON responses (ticker, scope, data_version, expires_at);
+"""
+
+
+@dataclass
+class CachedResponse:
+    """一条命中的缓存记录"""
+    query: str
+    analysis: str
+    similarity: float
+    created_at: float
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.split()).lower()
+
+
+class ResponseCache:
+    """
+    基于 SQLite 的语义响应缓存
+
+    查找顺序：
+    1. 规范化后完全相同的问题（无需计算 embedding）
+    2. 同一股票 / 范围 / 数据版本下，余弦相似度 ≥ similarity_threshold 的问题
+
+    embed_ready 返回 False 时（embedding 模型仍在后台加载）只做第 1 步，
+    写入的记录不带向量，之后只能按原问题精确命中。
+    """
+
+    def __init__(
+            self,
+            path: str,
+            embed: Callable[[str], Sequence[float]],
+            embed_ready: Optional[Callable[[], bool]] = None,
+            ttl: float = 6 * 3600,
+            similarity_threshold: float = 0.95,
+            max_candidates: int = 256
+    ):
+        self.path = Path(path)
+        self.embed = embed
+        self.embed_ready = embed_ready
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.max_candidates = max_candidates
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _can_embed(self) -> bool:
+        return self.embed_ready is None or self.embed_ready()
+
+    def _embed(self, query_norm: str) -> Optional[List[float]]:
+        """计算查询向量；失败（如检索服务不可用）时返回 None，缓存不影响分析本身"""
+        try:
+            return list(self.embed(query_norm))
+        except Exception as e:
+            logger.warning(f"⚠️ 响应缓存计算查询向量失败，按无向量处理: {e}")
+            return None
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作独立连接，可在线程池中并发调用
+        return sqlite3.connect(self.path, timeout=10)
+
+    def lookup(
+            self,
+            ticker: str,
+            scope: str,
+            data_version: str,
+            query: str
+    ) -> Tuple[Optional[CachedResponse], Optional[List[float]]]:
+        """
+        查找缓存
+
+        Returns:
+            (命中的记录或 None, 计算出的查询向量或 None)；
+            未命中时返回的查询向量可直接传给 store，避免重复计算
+        """
+        now = time.time()
+        query_norm = _normalize(query)
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT query, analysis, created_at FROM responses "
+                "WHERE ticker = ? AND scope = ? AND data_version = ? AND query_norm = ? AND expires_at > ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (ticker, scope, data_version, query_norm, now)
+            ).fetchone()
+            if row:
+                self.hits += 1
+                return CachedResponse(row[0], row[1], 1.0, row[2]), None
+
+            if not self._can_embed():
+                # 不等待模型加载，直接按未命中处理
+                self.misses += 1
+                return None, None
+
+            # 模型加载前写入的记录没有向量，不参与相似度匹配
+            rows = conn.execute(
+                "SELECT query, analysis, created_at, embedding FROM responses "
+                "WHERE ticker = ? AND scope = ? AND data_version = ? AND expires_at > ? AND length(embedding) > 0 "
+                "ORDER BY created_at DESC LIMIT ?",
+                (ticker, scope, data_version, now, self.max_candidates)
+            ).fetchall()
+
+        query_vector = self._embed(query_norm)
+        if query_vector is None:
+            self.misses += 1
+            return None, None
+        if rows:
+            vector = np.asarray(query_vector, dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+            matrix = np.stack([np.frombuffer(r[3], dtype=np.float32) for r in rows])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                self.hits += 1
+                r = rows[best]
+                return CachedResponse(r[0], r[1], float(similarities[best]), r[2]), query_vector
+
+        self.misses += 1
+        return None, query_vector
+
+    def store(
+            self,
+            ticker: str,
+            scope: str,
+            data_version: str,
+            query: str,
+            analysis: str,
+            query_vector: Optional[Sequence[float]] = None
+    ):
+        """写入一条分析结果，并顺带清理过期记录"""
+        query_norm = _normalize(query)
+        if query_vector is None and self._can_embed():
+            query_vector = self._embed(query_norm)
+
+        if query_vector is not None:
+            vector = np.asarray(query_vector, dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+            embedding = vector.tobytes()
+        else:
+            embedding = b""
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "INSERT INTO responses "
+                "(ticker, scope, data_version, query, query_norm, embedding, analysis, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (ticker, scope, data_version, query, query_norm, embedding, analysis, now, now + self.ttl)
+            )
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        """缓存命中率统计"""
+        with self._connect() as conn:
+            size = conn.execute(
+                "SELECT COUNT(*) FROM responses WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "ttl": self.ttl,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
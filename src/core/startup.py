@@ -0,0 +1,111 @@
+"""
+启动耗时与就绪状态
+应用启动分为两段：
+
+1. 导入与创建应用（同步，完成后立即开始接受请求）
+2. 后台预热：加载 embedding 模型、同步 / 打开向量索引、创建 LLM 客户端和代理
+
+/health 只表示进程存活；/ready 在后台预热完成后才返回 200，供负载均衡和自动扩缩容判断。
+各阶段耗时记录在这里，通过 /ready 返回。
+"""
+
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Optional
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _process_age() -> Optional[float]:
+    """进程已运行的秒数（Linux，从 /proc 读取；其他平台返回 None）"""
+    try:
+        with open("/proc/self/stat") as f:
+            # 第 22 个字段为进程启动时刻（开机后的时钟滴答数），进程名可能含空格，从右括号之后切分
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTracker:
+    """记录启动各阶段耗时和就绪状态（线程安全）"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._origin = time.perf_counter()
+        # 本模块导入之前的耗时（解释器启动 + 之前的导入）
+        self.before_tracking = _process_age()
+        self.phases: Dict[str, float] = {}
+        self.serving_seconds: Optional[float] = None  # 开始接受请求的时刻
+        self.ready_seconds: Optional[float] = None  # 预热完成的时刻
+        self.error: Optional[str] = None
+
+    def tracked_seconds(self) -> float:
+        """从本模块导入算起的秒数"""
+        return time.perf_counter() - self._origin
+
+    def elapsed(self) -> float:
+        """从进程启动（无法获取时从本模块导入）算起的秒数"""
+        return (self.before_tracking or 0.0) + self.tracked_seconds()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = round(seconds, 4)
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录一个启动阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.record(name, seconds)
+            logger.info(f"⏱️ 启动阶段 {name}: {seconds:.2f}s")
+
+    def mark_serving(self):
+        """应用已开始接受请求"""
+        with self._lock:
+            self.serving_seconds = round(self.elapsed(), 4)
+
+    def mark_ready(self):
+        """后台预热完成"""
+        with self._lock:
+            self.ready_seconds = round(self.elapsed(), 4)
+
+    def mark_failed(self, error: str):
+        """后台预热失败（保持未就绪）"""
+        with self._lock:
+            self.error = error
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    def snapshot(self) -> dict:
+        """就绪状态与启动耗时明细"""
+        with self._lock:
+            return {
+                "ready": self.ready_seconds is not None,
+                "error": self.error,
+                "serving_seconds": self.serving_seconds,
+                "ready_seconds": self.ready_seconds,
+                "before_tracking_seconds": (
+                    round(self.before_tracking, 4) if self.before_tracking is not None else None
+                ),
+                "phases": dict(self.phases),
+            }
+
+
+# 单例模式 - 模块导入即开始计时，main.py 中最先导入
+_tracker = StartupTracker()
+
+
+def get_startup_tracker() -> StartupTracker:
+    """获取启动状态记录器（单例）"""
+    return _tracker
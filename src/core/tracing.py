@@ -0,0 +1,721 @@
+"""
+链路追踪
+记录一次请求内部的耗时分布：HTTP 请求 → 分析流程 → 专家代理 → 代理步骤 → 工具 → 检索 / LLM 调用。
+
+span 来源：
+- TracingMiddleware：每个 HTTP 请求一个根 span（支持 W3C traceparent 请求头，响应头返回 X-Trace-Id）
+- span() 上下文管理器：分析流程、专家代理、检索（embedding / 检索 / 上下文组装）等代码中的阶段
+- TracingCallbackHandler（LangChain 回调）：代理图的每一步（langgraph 节点）、每次工具调用、
+  每次 LLM 调用（prompt / completion tokens、首 token 时间）
+
+当前 span 通过 contextvars 传递，LangChain 运行内部则按 run_id 关联父子关系；
+两者同时存在时取开始得更晚（层级更深）的一个作为父 span。
+
+导出：
+- 本地 OTLP/JSON 文件（每行一个 ExportTraceServiceRequest，与 OpenTelemetry 文件导出格式一致）
+- 可选的 OTLP/HTTP 接收端（如 OpenTelemetry Collector 的 http://localhost:4318/v1/traces）
+- span 耗时、LLM token 用量和首 token 时间同时汇总为 Prometheus 指标（GET /metrics）
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock, Thread
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import var_child_runnable_config
+from langchain_core.tracers.context import register_configure_hook
+from src.core.llm_gateway import current_priority
+from src.core.metrics import get_metrics_registry
+from config.settings import settings
+import json
+import logging
+import os
+import queue
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# OTLP SpanKind：INTERNAL = 1，SERVER = 2，CLIENT = 3
+_OTLP_KIND = {"http": 2, "llm": 3, "remote": 3}
+
+# 每批导出的最大 span 数
+_EXPORT_BATCH_SIZE = 512
+
+# 回调处理器最多跟踪的进行中运行数（被取消的运行可能收不到结束回调）
+_MAX_TRACKED_RUNS = 10000
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+# ============ Span ============
+
+class Span:
+    """一个计时区间；recording 为 False 的 span 只用于传递 ID（远程父 span）或在关闭追踪时占位"""
+
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "category", "attributes",
+        "start_ns", "end_ns", "_start", "duration", "error", "recording"
+    )
+
+    def __init__(
+            self,
+            name: str,
+            category: str = "internal",
+            trace_id: Optional[str] = None,
+            parent_id: Optional[str] = None,
+            attributes: Optional[Dict[str, Any]] = None,
+            recording: bool = True
+    ):
+        self.trace_id = trace_id or _new_id(128)
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.recording = recording
+
+    @classmethod
+    def remote(cls, trace_id: str, span_id: str) -> "Span":
+        """上游服务传入的父 span（只有 ID，不记录）"""
+        span = cls("remote", trace_id=trace_id, recording=False)
+        span.span_id = span_id
+        span._start = 0.0
+        return span
+
+    @property
+    def started(self) -> float:
+        """开始时刻（perf_counter），用于判断两个候选父 span 哪个更深"""
+        return self._start
+
+    def elapsed(self) -> float:
+        """从开始到现在的秒数"""
+        return time.perf_counter() - self._start
+
+    def set_attribute(self, key: str, value: Any):
+        if self.recording:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        if self.recording:
+            self.attributes.update(attributes)
+
+    def set_error(self, message: str):
+        """标记为失败（用于捕获后不再抛出的错误）"""
+        if self.recording and self.error is None:
+            self.error = message
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.duration = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+        if error is not None:
+            self.error = self.error or f"{type(error).__name__}: {error}"
+
+    def to_otlp(self) -> dict:
+        """OTLP/JSON 格式的 span"""
+        attributes = [_otlp_attribute("span.category", self.category)]
+        attributes += [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None]
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _OTLP_KIND.get(self.category, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": attributes,
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+# 关闭追踪时 span() 返回的占位 span
+_NOOP_SPAN = Span("noop", recording=False)
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("tracing_span", default=None)
+
+# 设置后，当前上下文中的所有 LangChain 运行（代理、工具、LLM）都会带上该回调
+_callback_var: ContextVar[Optional["TracingCallbackHandler"]] = ContextVar("tracing_callback", default=None)
+register_configure_hook(_callback_var, inheritable=True)
+
+
+def current_span() -> Optional[Span]:
+    """当前上下文中的 span"""
+    return _current_span.get()
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Span]:
+    """解析 W3C traceparent 请求头（00-<trace_id>-<span_id>-<flags>）"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return Span.remote(parts[1], parts[2])
+
+
+def traceparent() -> Optional[str]:
+    """当前 span 的 traceparent 请求头，用于调用下游服务（如共享检索服务）"""
+    span = get_tracer().resolve_parent()
+    if span is None or not span.span_id:
+        return None
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+# ============ 指标 ============
+
+class _TracingMetrics:
+    def __init__(self):
+        registry = get_metrics_registry()
+        self.http_requests = registry.counter(
+            "stock_ai_http_requests_total", "HTTP 请求数", ("method", "route", "status")
+        )
+        self.http_seconds = registry.histogram(
+            "stock_ai_http_request_duration_seconds", "HTTP 请求耗时（秒）", ("method", "route")
+        )
+        self.span_seconds = registry.histogram(
+            "stock_ai_span_duration_seconds", "各阶段耗时（秒）", ("category", "name")
+        )
+        self.llm_calls = registry.counter(
+            "stock_ai_llm_calls_total", "LLM 调用次数", ("model", "status")
+        )
+        self.llm_tokens = registry.counter(
+            "stock_ai_llm_tokens_total", "LLM token 用量", ("model", "type")
+        )
+        self.llm_ttft = registry.histogram(
+            "stock_ai_llm_time_to_first_token_seconds", "LLM 首 token 时间（秒）", ("model",)
+        )
+
+
+# ============ 导出 ============
+
+class SpanExporter:
+    """后台线程批量导出 span：追加写入本地 OTLP/JSON 文件，并可推送到 OTLP/HTTP 接收端"""
+
+    def __init__(
+            self,
+            service_name: str,
+            path: str = "",
+            otlp_endpoint: str = "",
+            interval: float = 2.0,
+            max_bytes: int = 100 * 1024 * 1024,
+            max_queue: int = 10000
+    ):
+        self.service_name = service_name
+        self.path = path
+        self.otlp_endpoint = otlp_endpoint
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self.exported = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[Thread] = None
+        self._lock = Lock()
+        self._http = None
+        self._otlp_failing = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path or self.otlp_endpoint)
+
+    def export(self, span: Span):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # 导出跟不上时丢弃，不阻塞请求
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            try:
+                item = self._queue.get(timeout=self.interval)
+                while item is not None:
+                    batch.append(item)
+                    # 批次满时先导出，剩下的留在队列中给下一批（取出后再判断会丢掉这一条）
+                    if len(batch) >= _EXPORT_BATCH_SIZE:
+                        break
+                    item = self._queue.get_nowait()
+                stopping = item is None
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(batch)
+
+    def _payload(self, batch: List[Span]) -> dict:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    _otlp_attribute("service.name", self.service_name),
+                    _otlp_attribute("process.pid", os.getpid()),
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [span.to_otlp() for span in batch],
+                }],
+            }]
+        }
+
+    def _write(self, batch: List[Span]):
+        payload = self._payload(batch)
+        if self.path:
+            try:
+                self._append(json.dumps(payload, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning(f"⚠️ span 写入失败: {e}")
+        if self.otlp_endpoint:
+            self._post(payload)
+        self.exported += len(batch)
+
+    def _append(self, line: str):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 超过大小上限时轮转为 .1（只保留一个旧文件）
+        if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+        # 每批重新以追加方式打开：多个工作进程可写同一个文件，轮转后也能写到新文件
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def _post(self, payload: dict):
+        import httpx
+
+        if self._http is None:
+            self._http = httpx.Client(timeout=5.0)
+        try:
+            self._http.post(self.otlp_endpoint, json=payload).raise_for_status()
+            if self._otlp_failing:
+                logger.info(f"✅ OTLP 导出已恢复: {self.otlp_endpoint}")
+            self._otlp_failing = False
+        except Exception as e:
+            # 接收端不可用时只在第一次失败时记录
+            if not self._otlp_failing:
+                logger.warning(f"⚠️ OTLP 导出失败（{self.otlp_endpoint}）: {e}")
+            self._otlp_failing = True
+
+    def shutdown(self, timeout: float = 5.0):
+        """导出队列中剩余的 span"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+
+# ============ Tracer ============
+
+class Tracer:
+    """创建、结束和导出 span"""
+
+    def __init__(self, enabled: bool = True, exporter: Optional[SpanExporter] = None):
+        self.enabled = enabled
+        self.exporter = exporter
+        self.metrics = _TracingMetrics()
+        self.callback = TracingCallbackHandler(self)
+
+    def resolve_parent(self) -> Optional[Span]:
+        """
+        当前的父 span：contextvars 中的 span 与当前 LangChain 运行对应的 span 取更深的一个
+
+        工具函数内部（如 rag_system.retrieve）没有经过 span()，但 LangChain 记录了所属的工具运行。
+        """
+        span = _current_span.get()
+        config = var_child_runnable_config.get()
+        callbacks = config.get("callbacks") if config else None
+        run_id = getattr(callbacks, "parent_run_id", None)
+        run_span = self.callback.span_for_run(run_id) if run_id else None
+        if run_span is None:
+            return span
+        if span is None or run_span.started > span.started:
+            return run_span
+        return span
+
+    def start_span(
+            self,
+            name: str,
+            category: str = "internal",
+            parent: Optional[Span] = None,
+            attributes: Optional[Dict[str, Any]] = None
+    ) -> Span:
+        """创建 span（不改变当前上下文）；parent 为空时使用 resolve_parent()"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        if parent is None:
+            parent = self.resolve_parent()
+        return Span(
+            name,
+            category,
+            trace_id=parent.trace_id if parent else None,
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes
+        )
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None):
+        """结束 span，记录耗时指标并加入导出队列"""
+        if not span.recording or span.duration is not None:
+            return
+        span.finish(error)
+        if span.category != "http":
+            self.metrics.span_seconds.observe(span.duration, category=span.category, name=span.name)
+        if self.exporter is not None and self.exporter.enabled:
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, category: str = "internal", **attributes) -> Iterator[Span]:
+        """在 with 块内把新 span 设为当前 span"""
+        span = self.start_span(name, category, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        finally:
+            self.end_span(span)
+            _reset(_current_span, token)
+
+    @contextmanager
+    def root_span(
+            self,
+            name: str,
+            category: str = "internal",
+            parent: Optional[Span] = None,
+            **attributes
+    ) -> Iterator[Span]:
+        """
+        请求级的根 span：同时让块内的 LangChain 运行带上追踪回调
+
+        HTTP 请求由 TracingMiddleware 调用；脚本中直接调用分析函数时也可以手动使用。
+        """
+        if self.enabled:
+            # 没有上游 trace 时作为新 trace 的根（不继承当前上下文中的 span）
+            span = Span(
+                name,
+                category,
+                trace_id=parent.trace_id if parent else None,
+                parent_id=parent.span_id if parent else None,
+                attributes=attributes
+            )
+        else:
+            span = _NOOP_SPAN
+        span_token = _current_span.set(span)
+        callback_token = _callback_var.set(self.callback if self.enabled else None)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        finally:
+            self.end_span(span)
+            _reset(_callback_var, callback_token)
+            _reset(_current_span, span_token)
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def _reset(var: ContextVar, token):
+    try:
+        var.reset(token)
+    except ValueError:
+        # 异步生成器被其他上下文关闭（如客户端断开后由事件循环回收）时 token 不属于当前上下文
+        pass
+
+
+# ============ LangChain 回调 ============
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    把 LangChain 运行记录为 span：代理图节点（step.*）、工具（tool.*）和 LLM 调用（llm.chat）
+
+    未单独记录的中间运行（提示词模板、解析器等）归入最近的已记录祖先。
+    """
+
+    # 在调用方的上下文中同步执行：能读到当前 span，且不经过线程池
+    run_inline = True
+
+    def __init__(self, tracer: Tracer):
+        self._tracer = tracer
+        # run_id → (span, 是否为该运行自己创建的 span)
+        self._runs: Dict[UUID, Tuple[Span, bool]] = {}
+        self._lock = Lock()
+
+    def span_for_run(self, run_id: UUID) -> Optional[Span]:
+        entry = self._runs.get(run_id)
+        return entry[0] if entry else None
+
+    def _parent(self, parent_run_id: Optional[UUID]) -> Optional[Span]:
+        span = _current_span.get()
+        run_span = self.span_for_run(parent_run_id) if parent_run_id else None
+        if run_span is None:
+            return span
+        if span is None or run_span.started > span.started:
+            return run_span
+        return span
+
+    def _track(self, run_id: UUID, span: Span, owned: bool):
+        with self._lock:
+            if len(self._runs) >= _MAX_TRACKED_RUNS:
+                self._runs.pop(next(iter(self._runs)))
+            self._runs[run_id] = (span, owned)
+
+    def _start(
+            self,
+            run_id: UUID,
+            parent_run_id: Optional[UUID],
+            name: str,
+            category: str,
+            attributes: Dict[str, Any]
+    ):
+        span = self._tracer.start_span(name, category, parent=self._parent(parent_run_id), attributes=attributes)
+        self._track(run_id, span, owned=True)
+
+    def _link(self, run_id: UUID, parent_run_id: Optional[UUID]):
+        parent = self._parent(parent_run_id)
+        if parent is not None:
+            self._track(run_id, parent, owned=False)
+
+    def _finish(self, run_id: UUID, error: Optional[BaseException] = None) -> Optional[Span]:
+        with self._lock:
+            entry = self._runs.pop(run_id, None)
+        if entry is None or not entry[1]:
+            return None
+        span = entry[0]
+        self._tracer.end_span(span, error)
+        return span
+
+    # ===== 代理图节点 =====
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._start(run_id, parent_run_id, f"step.{node}", "step", {
+                "langgraph.step": metadata.get("langgraph_step"),
+            })
+        else:
+            self._link(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, error)
+
+    # ===== 工具 =====
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, f"tool.{name}", "tool", {"tool.name": name})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, error)
+
+    # ===== LLM =====
+
+    def _start_llm(self, run_id, parent_run_id, metadata, kwargs, messages: int):
+        params = kwargs.get("invocation_params") or {}
+        model = (metadata or {}).get("ls_model_name") or params.get("model") or params.get("model_name") or "unknown"
+        self._start(run_id, parent_run_id, "llm.chat", "llm", {
+            "llm.model": model,
+            "llm.messages": messages,
+            "llm.lane": current_priority(),
+            "llm.streaming": False,
+        })
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self._start_llm(run_id, parent_run_id, metadata, kwargs, len(messages[0]) if messages else 0)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self._start_llm(run_id, parent_run_id, metadata, kwargs, len(prompts))
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        span = self.span_for_run(run_id)
+        if span is not None and "llm.ttft_ms" not in span.attributes:
+            span.set_attributes(**{"llm.ttft_ms": round(span.elapsed() * 1000, 1), "llm.streaming": True})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._finish(run_id)
+        if span is None:
+            return
+        model = span.attributes.get("llm.model", "unknown")
+        prompt_tokens, completion_tokens = _token_usage(response)
+        # 非流式调用在完整响应返回时才拿到第一个 token
+        ttft_ms = span.attributes.setdefault("llm.ttft_ms", round(span.duration * 1000, 1))
+        span.set_attributes(**{"llm.prompt_tokens": prompt_tokens, "llm.completion_tokens": completion_tokens})
+
+        metrics = self._tracer.metrics
+        metrics.llm_calls.inc(model=model, status="ok")
+        metrics.llm_ttft.observe(ttft_ms / 1000, model=model)
+        if prompt_tokens:
+            metrics.llm_tokens.inc(prompt_tokens, model=model, type="prompt")
+        if completion_tokens:
+            metrics.llm_tokens.inc(completion_tokens, model=model, type="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        span = self._finish(run_id, error)
+        if span is not None:
+            self._tracer.metrics.llm_calls.inc(model=span.attributes.get("llm.model", "unknown"), status="error")
+
+
+def _token_usage(response) -> Tuple[Optional[int], Optional[int]]:
+    """从 LLMResult 中取 (prompt_tokens, completion_tokens)：优先 usage_metadata（流式也有），其次 llm_output"""
+    try:
+        usage = response.generations[0][0].message.usage_metadata
+        if usage:
+            return usage.get("input_tokens"), usage.get("output_tokens")
+    except (AttributeError, IndexError):
+        pass
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+
+
+# ============ HTTP 中间件 ============
+
+class TracingMiddleware:
+    """
+    ASGI 中间件：每个 HTTP 请求一个根 span，并记录请求数和耗时指标
+
+    excluded 中的路径（/metrics、健康检查）只计入指标，不生成 span。
+    """
+
+    def __init__(self, app, excluded: Tuple[str, ...] = ("/metrics", "/health", "/ready")):
+        self.app = app
+        self.excluded = excluded
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracer = get_tracer()
+        method = scope["method"]
+        path = scope["path"]
+        traced = tracer.enabled and path not in self.excluded
+        status = {"code": 500}
+        start = time.perf_counter()
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if traced:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-trace-id", span.trace_id.encode())]
+            await send(message)
+
+        if not traced:
+            try:
+                await self.app(scope, receive, _send)
+            finally:
+                self._record(tracer, scope, method, status["code"], time.perf_counter() - start)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        with tracer.root_span(f"{method} {path}", "http", parent=parent, **{
+            "http.method": method,
+            "http.target": path,
+        }) as span:
+            try:
+                await self.app(scope, receive, _send)
+            finally:
+                route = self._route(scope)
+                span.name = f"{method} {route}"
+                span.set_attributes(**{"http.route": route, "http.status_code": status["code"]})
+                if status["code"] >= 500:
+                    span.set_error(f"HTTP {status['code']}")
+                self._record(tracer, scope, method, status["code"], time.perf_counter() - start)
+
+    @staticmethod
+    def _route(scope) -> str:
+        # 使用路由模板而不是实际路径，避免指标标签基数无限增长
+        route = scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+    def _record(self, tracer: Tracer, scope, method: str, status: int, seconds: float):
+        route = self._route(scope)
+        tracer.metrics.http_requests.inc(method=method, route=route, status=str(status))
+        tracer.metrics.http_seconds.observe(seconds, method=method, route=route)
+
+
+# ============ 单例 ============
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = Lock()
+
+
+def get_tracer() -> Tracer:
+    """获取进程内的 Tracer（单例，按 settings 创建）"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = _create_tracer(settings.tracing_service_name)
+    return _tracer
+
+
+def configure_tracing(service_name: str) -> Tracer:
+    """以指定的服务名重新创建 Tracer（如共享检索服务进程），需在处理请求之前调用"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.shutdown()
+        _tracer = _create_tracer(service_name)
+    return _tracer
+
+
+def _create_tracer(service_name: str) -> Tracer:
+    exporter = SpanExporter(
+        service_name=service_name,
+        path=settings.tracing_export_path,
+        otlp_endpoint=settings.tracing_otlp_endpoint,
+        interval=settings.tracing_export_interval,
+        max_bytes=settings.tracing_export_max_mb * 1024 * 1024
+    )
+    return Tracer(enabled=settings.tracing_enabled, exporter=exporter)
+
+
+def span(name: str, category: str = "internal", **attributes):
+    """在当前上下文中记录一个 span：with span("rag.search", "retrieval", k=5) as s: ..."""
+    return get_tracer().span(name, category, **attributes)
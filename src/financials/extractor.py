@@ -0,0 +1,231 @@
+"""
+财务报表抽取
+在 PDF 解析阶段识别利润表、资产负债表、现金流量表所在页面，
+把表格逐行解析为 (报表, 科目, 报告期, 数值) 记录。
+
+只依赖页面文本，可在 PDFLoader 的解析子进程中执行；
+科目名称映射到统一的标准科目（revenue、net_income 等），未识别的科目保留原始名称。
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+import re
+
+# 报表标题（须独占一行，避免匹配目录页）
+STATEMENT_TITLES = {
+    "income": re.compile(
+        r"^(?:CONSOLIDATED\s+)?(?:STATEMENTS?\s+OF\s+(?:OPERATIONS|INCOME|EARNINGS)|INCOME\s+STATEMENTS?)$",
+        re.IGNORECASE,
+    ),
+    "balance": re.compile(
+        r"^(?:CONSOLIDATED\s+)?(?:BALANCE\s+SHEETS?|STATEMENTS?\s+OF\s+FINANCIAL\s+POSITION)$",
+        re.IGNORECASE,
+    ),
+    "cash_flow": re.compile(
+        r"^(?:CONSOLIDATED\s+)?(?:STATEMENTS?\s+OF\s+CASH\s+FLOWS?|CASH\s+FLOWS?\s+STATEMENTS?)$",
+        re.IGNORECASE,
+    ),
+}
+
+# 标准科目：(报表, 科目) -> 原始科目名称的正则（按顺序匹配，先匹配先得）
+LINE_ITEMS = [
+    ("income", "revenue", r"total (net )?(sales|revenues?)|(net )?revenues?|net sales"),
+    ("income", "cost_of_revenue", r"total cost of (sales|revenues?)|cost of (sales|revenues?)"),
+    ("income", "gross_profit", r"gross (margin|profit)"),
+    ("income", "research_development", r"research and development"),
+    ("income", "sga", r"selling, general and administrative"),
+    ("income", "operating_expenses", r"total operating expenses"),
+    ("income", "operating_income", r"operating income|income from operations"),
+    ("income", "pretax_income", r"income before (provision for )?income taxes"),
+    ("income", "income_tax", r"provision for income taxes|income tax expense"),
+    ("income", "net_income", r"net income|net earnings"),
+    ("income", "eps_basic", r"earnings per share / basic|basic (earnings|net income) per share"),
+    ("income", "eps_diluted", r"earnings per share / diluted|diluted (earnings|net income) per share"),
+    ("income", "shares_diluted",
+     r"shares used in computing earnings per share / diluted|weighted[- ]average shares outstanding / diluted"),
+    ("balance", "cash", r"cash and cash equivalents"),
+    ("balance", "accounts_receivable", r"accounts receivable, net"),
+    ("balance", "inventories", r"inventories"),
+    ("balance", "total_current_assets", r"total current assets"),
+    ("balance", "total_assets", r"total assets"),
+    ("balance", "total_current_liabilities", r"total current liabilities"),
+    ("balance", "total_liabilities", r"total liabilities"),
+    ("balance", "total_equity", r"total (shareholders|stockholders)['’] equity"),
+    ("cash_flow", "depreciation", r"depreciation and amortization"),
+    ("cash_flow", "operating_cash_flow",
+     r"(cash generated by|net cash (provided by|from)) operating activities"),
+    ("cash_flow", "capital_expenditure",
+     r"payments for acquisition of property, plant and equipment|"
+     r"(purchases|additions) (of|to) property(, plant)? and equipment|capital expenditures?"),
+    ("cash_flow", "investing_cash_flow",
+     r"(cash generated by|cash used in|net cash (provided by|used in|from)) investing activities"),
+    ("cash_flow", "financing_cash_flow",
+     r"(cash generated by|cash used in|net cash (provided by|used in|from)) financing activities"),
+    ("cash_flow", "dividends_paid", r"payments for dividends( and dividend equivalents)?|dividends paid"),
+    ("cash_flow", "share_repurchases", r"repurchases? of common stock|common stock repurchased"),
+]
+_LINE_ITEM_PATTERNS = [(s, item, re.compile(rf"^(?:{p})$", re.IGNORECASE)) for s, item, p in LINE_ITEMS]
+
+_NUMBER = r"-?[\d,]+(?:\.\d+)?|—|-"
+_VALUES_ONLY = re.compile(rf"^(?:{_NUMBER})(?:\s+(?:{_NUMBER}))*$")
+_LABEL_WITH_VALUES = re.compile(rf"^(.*?[A-Za-z].*?)\s+((?:{_NUMBER})(?:\s+(?:{_NUMBER}))*)$")
+_NEGATIVE = re.compile(r"\(\s*([\d,]+(?:\.\d+)?)\s*\)")
+_DATE = re.compile(r"([A-Z][a-z]+\s+\d{1,2}),?\s+((?:19|20)\d{2})")
+_YEAR = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+_HEADER_LINE = re.compile(
+    r"^(?:\(.*\)|\(?in (millions|thousands|billions).*|years? ended.*|(three|six|nine|twelve) months ended.*|"
+    r"as of.*|[A-Z][a-z]+\s+\d{1,2},?|(?:19|20)\d{2}|[A-Z][a-z]+\s+\d{1,2},?\s+(?:19|20)\d{2})$",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class StatementRow:
+    """一条报表记录（数值已换算为基本单位：美元 / 股）"""
+    statement: str
+    item: str
+    label: str
+    period_end: str
+    fiscal_year: int
+    value: float
+    page: int
+
+
+def _statement_type(lines: List[str]) -> Optional[str]:
+    """报表标题需出现在页面前几行"""
+    for line in lines[:5]:
+        for statement, pattern in STATEMENT_TITLES.items():
+            if pattern.match(line):
+                return statement
+    return None
+
+
+def _scale(header: str) -> Tuple[float, float]:
+    """(金额倍数, 股数倍数)"""
+    header = header.lower()
+    amount = 1e9 if "in billions" in header else 1e6 if "in millions" in header else 1e3 if "in thousands" in header else 1.0
+    shares = 1e3 if "reflected in thousands" in header or "shares in thousands" in header else 1.0
+    return amount, shares
+
+
+def _periods(header: str) -> List[Tuple[str, int]]:
+    """从表头解析报告期：优先完整日期，否则只有年份"""
+    periods = []
+    for month_day, year in _DATE.findall(header):
+        try:
+            date = datetime.strptime(f"{month_day.replace(',', '')} {year}", "%B %d %Y")
+            periods.append((date.date().isoformat(), int(year)))
+        except ValueError:
+            continue
+    if not periods:
+        periods = [(year, int(year)) for year in _YEAR.findall(header)]
+    # 去重并保持顺序
+    return list(dict.fromkeys(periods))
+
+
+def _parse_number(token: str) -> Optional[float]:
+    if token in ("—", "-"):
+        return 0.0
+    try:
+        return float(token.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _canonical_item(statement: str, label: str, section: str) -> str:
+    """映射到标准科目；EPS 等需要结合所在小节判断"""
+    candidates = [f"{section} / {label}", label] if section else [label]
+    for candidate in candidates:
+        for item_statement, item, pattern in _LINE_ITEM_PATTERNS:
+            if item_statement == statement and pattern.match(candidate):
+                return item
+    slug = re.sub(r"[^a-z0-9]+", "_", f"{section} {label}".lower()).strip("_")
+    return f"raw:{slug}"
+
+
+def extract_statements(text: str, page: int) -> List[StatementRow]:
+    """
+    从单页文本中抽取报表记录
+
+    Args:
+        text: 页面文本（pypdf 输出，数字常被拆成单独的行）
+        page: 页码（从 0 开始，与 PyPDFLoader 的元数据一致）
+
+    Returns:
+        StatementRow 列表；不是报表页时返回空列表
+    """
+    # 括号负数可能跨行："(\n321\n)"；美元符号独占一行
+    text = _NEGATIVE.sub(r"-\1", text.replace("$", " "))
+    lines = [line.strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+
+    statement = _statement_type(lines)
+    if statement is None:
+        return []
+
+    # 表头：标题之后、第一条科目之前的日期 / 单位说明
+    start = next(i for i, line in enumerate(lines[:5]) if STATEMENT_TITLES[statement].match(line)) + 1
+    header_lines = []
+    while start < len(lines) and _HEADER_LINE.match(lines[start]):
+        header_lines.append(lines[start])
+        start += 1
+    header = " ".join(header_lines)
+    periods = _periods(header)
+    if not periods:
+        return []
+    amount_scale, share_scale = _scale(header)
+
+    rows: List[StatementRow] = []
+    seen_items = set()
+    section = ""
+    label: Optional[str] = None
+    values: List[float] = []
+
+    def _flush():
+        if label is None or len(values) != len(periods):
+            return
+        item = _canonical_item(statement, label, section)
+        # 同一页中标准科目只取第一次出现的行
+        if item in seen_items:
+            item = f"raw:{item}"
+        seen_items.add(item)
+
+        lowered = f"{section} {label}".lower()
+        if "shares used" in lowered or "weighted" in lowered or item.startswith("shares_"):
+            scale = share_scale
+        elif "per share" in lowered or item.startswith("eps_"):
+            scale = 1.0
+        else:
+            scale = amount_scale
+        for (period_end, fiscal_year), value in zip(periods, values):
+            rows.append(StatementRow(statement, item, label, period_end, fiscal_year, value * scale, page))
+
+    for line in lines[start:]:
+        if _VALUES_ONLY.match(line):
+            if label is not None:
+                values.extend(v for v in map(_parse_number, line.split()) if v is not None)
+                if len(values) >= len(periods):
+                    values = values[:len(periods)]
+                    _flush()
+                    label, values = None, []
+            continue
+
+        # 新的文本行：上一条科目数值不完整时丢弃
+        match = _LABEL_WITH_VALUES.match(line)
+        if match:
+            label, values = match.group(1).strip(" :"), []
+            values = [v for v in map(_parse_number, match.group(2).split()) if v is not None]
+            if len(values) >= len(periods):
+                values = values[:len(periods)]
+                _flush()
+                label, values = None, []
+            continue
+
+        if line.endswith(":"):
+            section = line.rstrip(":").strip()
+            label, values = None, []
+        else:
+            label, values = line, []
+
+    return rows
@@ -0,0 +1,185 @@
+"""
+财务指标计算
+基于报表数据存储直接计算常用指标和比率（ROE、ROA、利润率等），
+并把自然语言的指标名称（中英文）映射到指标定义。
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from src.financials.store import FinancialStore
+import re
+
+
+@dataclass(frozen=True)
+class MetricDefinition:
+    """指标定义：依赖的报表科目 + 计算公式"""
+    label: str
+    items: Tuple[str, ...]
+    # (本期科目, 上期科目) -> 数值；缺少数据时返回 None
+    compute: Callable[[Dict[str, float], Dict[str, float]], Optional[float]]
+    kind: str = "amount"  # amount / ratio / per_share
+
+
+def _item(name: str):
+    return lambda cur, prev: cur.get(name)
+
+
+def _ratio(numerator: str, denominator: str):
+    def compute(cur, prev):
+        if cur.get(numerator) is None or not cur.get(denominator):
+            return None
+        return cur[numerator] / cur[denominator]
+    return compute
+
+
+def _return_on(denominator: str):
+    """净利润 / 期初期末平均值（缺少上期时用期末值）"""
+    def compute(cur, prev):
+        if cur.get("net_income") is None or not cur.get(denominator):
+            return None
+        base = cur[denominator]
+        if prev.get(denominator):
+            base = (base + prev[denominator]) / 2
+        return cur["net_income"] / base
+    return compute
+
+
+def _free_cash_flow(cur, prev):
+    if cur.get("operating_cash_flow") is None or cur.get("capital_expenditure") is None:
+        return None
+    # 资本开支在现金流量表中通常以负数列示
+    return cur["operating_cash_flow"] - abs(cur["capital_expenditure"])
+
+
+def _growth(name: str):
+    def compute(cur, prev):
+        if cur.get(name) is None or not prev.get(name):
+            return None
+        return cur[name] / prev[name] - 1
+    return compute
+
+
+METRICS: Dict[str, MetricDefinition] = {
+    "revenue": MetricDefinition("营业收入", ("revenue",), _item("revenue")),
+    "gross_profit": MetricDefinition("毛利", ("gross_profit",), _item("gross_profit")),
+    "operating_income": MetricDefinition("营业利润", ("operating_income",), _item("operating_income")),
+    "net_income": MetricDefinition("净利润", ("net_income",), _item("net_income")),
+    "eps": MetricDefinition("稀释每股收益", ("eps_diluted",), _item("eps_diluted"), "per_share"),
+    "gross_margin": MetricDefinition("毛利率", ("gross_profit", "revenue"), _ratio("gross_profit", "revenue"), "ratio"),
+    "operating_margin": MetricDefinition(
+        "营业利润率", ("operating_income", "revenue"), _ratio("operating_income", "revenue"), "ratio"
+    ),
+    "net_margin": MetricDefinition("净利率", ("net_income", "revenue"), _ratio("net_income", "revenue"), "ratio"),
+    "revenue_growth": MetricDefinition("营收同比增长", ("revenue",), _growth("revenue"), "ratio"),
+    "roe": MetricDefinition("净资产收益率 ROE", ("net_income", "total_equity"), _return_on("total_equity"), "ratio"),
+    "roa": MetricDefinition("总资产收益率 ROA", ("net_income", "total_assets"), _return_on("total_assets"), "ratio"),
+    "total_assets": MetricDefinition("总资产", ("total_assets",), _item("total_assets")),
+    "total_equity": MetricDefinition("股东权益", ("total_equity",), _item("total_equity")),
+    "current_ratio": MetricDefinition(
+        "流动比率", ("total_current_assets", "total_current_liabilities"),
+        _ratio("total_current_assets", "total_current_liabilities"), "multiple"
+    ),
+    "debt_to_equity": MetricDefinition(
+        "负债权益比", ("total_liabilities", "total_equity"), _ratio("total_liabilities", "total_equity"), "multiple"
+    ),
+    "debt_to_assets": MetricDefinition(
+        "资产负债率", ("total_liabilities", "total_assets"), _ratio("total_liabilities", "total_assets"), "ratio"
+    ),
+    "operating_cash_flow": MetricDefinition("经营活动现金流", ("operating_cash_flow",), _item("operating_cash_flow")),
+    "free_cash_flow": MetricDefinition(
+        "自由现金流", ("operating_cash_flow", "capital_expenditure"), _free_cash_flow
+    ),
+}
+
+# 问题中的关键词 -> 指标（按顺序匹配，较具体的写在前面）
+# 英文缩写只排除相邻的英文字母：\b 在英文字母与中文之间不构成边界，“苹果ROE” 会匹配不到
+METRIC_ALIASES = [
+    (r"(?<![a-z])roe(?![a-z])|净资产收益率|股东权益回报", "roe"),
+    (r"(?<![a-z])roa(?![a-z])|总资产收益率|资产回报", "roa"),
+    (r"gross margin|毛利率", "gross_margin"),
+    (r"operating margin|营业利润率|经营利润率", "operating_margin"),
+    (r"net margin|profit margin|净利率|净利润率", "net_margin"),
+    (r"revenue growth|(营收|收入)(同比)?增长", "revenue_growth"),
+    (r"free cash flow|fcf|自由现金流", "free_cash_flow"),
+    (r"operating cash flow|经营(活动)?现金流", "operating_cash_flow"),
+    (r"current ratio|流动比率", "current_ratio"),
+    (r"debt.to.assets|资产负债率", "debt_to_assets"),
+    (r"debt.to.equity|负债权益比|产权比率", "debt_to_equity"),
+    (r"(?<![a-z])eps(?![a-z])|每股收益", "eps"),
+    (r"gross profit|毛利", "gross_profit"),
+    (r"operating income|营业利润|经营利润", "operating_income"),
+    (r"net income|净利润|利润", "net_income"),
+    (r"revenue|sales|营收|营业收入|收入|销售额", "revenue"),
+    (r"total assets|总资产", "total_assets"),
+    (r"equity|股东权益|净资产", "total_equity"),
+]
+_ALIASES = [(re.compile(pattern, re.IGNORECASE), metric) for pattern, metric in METRIC_ALIASES]
+
+# 泛指“关键指标”时返回的指标组合
+SUMMARY_METRICS = [
+    "revenue", "revenue_growth", "net_income", "gross_margin", "operating_margin",
+    "net_margin", "roe", "roa", "eps", "free_cash_flow", "current_ratio", "debt_to_equity",
+]
+_SUMMARY_WORDS = re.compile(r"关键|主要|核心|全部|概览|总结|key|all|summary|overview", re.IGNORECASE)
+
+
+def match_metrics(text: str) -> List[str]:
+    """从指标描述中识别指标；泛指关键指标时返回 SUMMARY_METRICS"""
+    matched = []
+    remaining = text
+    for pattern, metric in _ALIASES:
+        if pattern.search(remaining):
+            matched.append(metric)
+            # 已匹配的片段不再参与后续匹配，避免“净利率”再匹配出“净利润”
+            remaining = pattern.sub(" ", remaining)
+    if not matched and _SUMMARY_WORDS.search(text):
+        return list(SUMMARY_METRICS)
+    return list(dict.fromkeys(matched))
+
+
+def compute_metrics(
+        store: FinancialStore,
+        ticker: str,
+        metrics: List[str],
+        periods: int = 3
+) -> List[Tuple[str, int, Dict[str, Optional[float]]]]:
+    """
+    计算最近几个报告期的指标
+
+    Returns:
+        [(报告期截止日, 财年, {指标: 数值})]，按报告期从新到旧排列；没有数据时为空列表
+    """
+    definitions = {name: METRICS[name] for name in metrics if name in METRICS}
+    items = [item for d in definitions.values() for item in d.items]
+    data = store.get_items(ticker, items)
+    if not data:
+        return []
+
+    fiscal_years = store.fiscal_years(ticker)
+    period_ends = list(data)
+    result = []
+    for index, period_end in enumerate(period_ends[:periods]):
+        current = data[period_end]
+        previous = data[period_ends[index + 1]] if index + 1 < len(period_ends) else {}
+        values = {name: d.compute(current, previous) for name, d in definitions.items()}
+        if any(v is not None for v in values.values()):
+            result.append((period_end, fiscal_years.get(period_end, 0), values))
+    return result
+
+
+def format_metric(name: str, value: Optional[float]) -> str:
+    """按指标类型格式化数值"""
+    if value is None:
+        return "—"
+    kind = METRICS[name].kind
+    if kind == "ratio":
+        return f"{value:.1%}"
+    if kind == "multiple":
+        return f"{value:.2f}x"
+    if kind == "per_share":
+        return f"${value:.2f}"
+    if abs(value) >= 1e9:
+        return f"${value / 1e9:,.2f}B"
+    if abs(value) >= 1e6:
+        return f"${value / 1e6:,.2f}M"
+    return f"${value:,.0f}"
@@ -0,0 +1,158 @@
+"""
+财务报表数据存储
+入库时抽取的报表科目按 (股票代码, 报告期, 科目) 建索引保存在 SQLite 中，
+指标查询和比率计算直接走索引，不再经过向量检索和 LLM 阅读原文。
+
+数据库与向量数据库放在同一目录，随索引一起重建 / 删除。
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from src.financials.extractor import StatementRow
+from config.settings import settings
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+STORE_FILENAME = "financial_statements.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS line_items (
+    ticker TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    statement TEXT NOT NULL,
+    item TEXT NOT NULL,
+    fiscal_year INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    value REAL NOT NULL,
+    source TEXT NOT NULL,
+    filing_type TEXT,
+    filing_year INTEGER,
+    page INTEGER,
+    PRIMARY KEY (ticker, item, period_end, statement, source)
+);
+CREATE INDEX IF NOT EXISTS idx_line_items_source ON line_items (source);
+"""
+
+
+class FinancialStore:
+    """按 股票代码 / 报告期 / 科目 索引的报表数据存储"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.path.join(settings.vector_store_path, STORE_FILENAME))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作独立连接，可在线程池中并发调用
+        return sqlite3.connect(self.path, timeout=10)
+
+    # ============ 写入（由增量索引器调用） ============
+
+    def replace_source(self, source: str, metadata: dict, rows: Iterable[StatementRow]) -> int:
+        """
+        用一个文件的最新抽取结果替换该文件之前的记录
+
+        Args:
+            source: 文件键（与索引清单一致）
+            metadata: 财报元数据（ticker / filing_type / fiscal_year）
+            rows: 抽取出的报表记录
+
+        Returns:
+            写入的记录数
+        """
+        ticker = metadata.get("ticker")
+        records = [
+            (
+                ticker, row.period_end, row.statement, row.item, row.fiscal_year, row.label, row.value,
+                source, metadata.get("filing_type"), metadata.get("fiscal_year"), row.page,
+            )
+            for row in rows
+        ] if ticker else []
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM line_items WHERE source = ?", (source,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO line_items "
+                "(ticker, period_end, statement, item, fiscal_year, label, value, source, filing_type, filing_year, page) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records
+            )
+        return len(records)
+
+    def remove_source(self, source: str):
+        """删除一个文件的全部记录"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM line_items WHERE source = ?", (source,))
+
+    def clear(self):
+        """清空全部记录（索引全量重建时调用）"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM line_items")
+
+    # ============ 查询 ============
+
+    def get_items(self, ticker: str, items: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """
+        查询科目数值
+
+        同一报告期出现在多份财报中时（如新年报中的上年对比数），取最新一份财报的数值。
+
+        Returns:
+            {报告期截止日: {科目: 数值}}，按报告期从新到旧排列
+        """
+        items = list(dict.fromkeys(items))
+        if not items:
+            return {}
+
+        placeholders = ",".join("?" * len(items))
+        with self._connect() as conn:
+            # SQLite 中与 MAX() 同时选出的裸列取自最大值所在行
+            rows = conn.execute(
+                f"SELECT period_end, item, value, MAX(COALESCE(filing_year, 0)) FROM line_items "
+                f"WHERE ticker = ? AND item IN ({placeholders}) "
+                f"GROUP BY period_end, item ORDER BY period_end DESC",
+                (ticker.strip().upper(), *items)
+            ).fetchall()
+
+        result: Dict[str, Dict[str, float]] = {}
+        for period_end, item, value, _ in rows:
+            result.setdefault(period_end, {})[item] = value
+        return result
+
+    def fiscal_years(self, ticker: str) -> Dict[str, int]:
+        """报告期截止日 -> 财年"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT period_end, fiscal_year FROM line_items WHERE ticker = ?",
+                (ticker.strip().upper(),)
+            ).fetchall()
+        return dict(rows)
+
+    def tickers(self) -> List[str]:
+        """有报表数据的股票代码"""
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT DISTINCT ticker FROM line_items ORDER BY ticker")]
+
+    def stats(self) -> dict:
+        """存储规模统计"""
+        with self._connect() as conn:
+            rows, tickers, sources = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT ticker), COUNT(DISTINCT source) FROM line_items"
+            ).fetchone()
+        return {"rows": rows, "tickers": tickers, "sources": sources}
+
+
+# 单例模式
+_store: Optional[FinancialStore] = None
+
+
+def get_financial_store() -> FinancialStore:
+    """获取报表数据存储实例（单例）"""
+    global _store
+    if _store is None:
+        _store = FinancialStore()
+    return _store
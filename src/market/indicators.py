@@ -0,0 +1,307 @@
+"""
+技术指标引擎
+- 所有指标沿最后一个轴（时间）向量化计算：输入可以是单只股票的一维收盘价序列，
+  也可以是 (股票数, K 线数) 的矩阵，一次调用算完整个股票池
+- 历史较短的股票左侧用 NaN 补齐（见 MarketDataStore.get_close_matrix）
+- 指数平滑类指标（EMA / MACD / RSI）从第一根有效 K 线起递推，
+  与 pandas 的 ewm(adjust=False) 口径一致
+- IndicatorState 只保存递推状态和最近一个窗口的收盘价，
+  新 K 线到来时按 O(股票数 × 窗口) 增量更新，不重算完整历史
+"""
+
+from dataclasses import dataclass, fields
+from typing import Dict, List, Sequence
+import math
+
+import numpy as np
+
+# ============ 默认参数 ============
+
+SMA_WINDOWS = (20, 50, 200)
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_WINDOW, BOLLINGER_WIDTH = 20, 2.0
+VOLATILITY_WINDOW = 20
+TRADING_DAYS = 252
+
+# 增量状态需要保留的收盘价窗口长度
+STATE_WINDOW = max(max(SMA_WINDOWS), BOLLINGER_WINDOW, VOLATILITY_WINDOW + 1)
+
+
+def _span_alpha(span: int) -> float:
+    return 2.0 / (span + 1)
+
+
+def _ewm_step(state: np.ndarray, x: np.ndarray, alpha: float) -> np.ndarray:
+    """指数平滑递推一步：状态为空时以当前值为种子，当前值缺失时保持原状态"""
+    updated = state + alpha * (x - state)
+    return np.where(np.isnan(state), x, np.where(np.isnan(x), state, updated))
+
+
+# ============ 全序列指标 ============
+
+def ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    指数加权移动平均
+
+    时间维上逐步递推，股票维上向量化；内部转为时间优先的连续布局，
+    每一步读写的都是连续内存。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    by_time = np.ascontiguousarray(np.moveaxis(values, -1, 0))
+    out = np.empty_like(by_time)
+    state = np.full(by_time.shape[1:], np.nan)
+    for t in range(by_time.shape[0]):
+        state = _ewm_step(state, by_time[t], alpha)
+        out[t] = state
+    return np.moveaxis(out, 0, -1)
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """指数移动平均（alpha = 2 / (span + 1)）"""
+    return ewm(values, _span_alpha(span))
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """滑动窗口求和（前缀和相减）；窗口内有 NaN 时结果为 NaN"""
+    valid = ~np.isnan(values)
+    has_gaps = not valid.all()
+    total = np.cumsum(np.where(valid, values, 0.0) if has_gaps else values, axis=-1)
+
+    out = np.empty_like(total)
+    out[..., :window] = total[..., :window]
+    np.subtract(total[..., window:], total[..., :-window], out=out[..., window:])
+    out[..., :window - 1] = np.nan
+
+    if has_gaps:
+        count = np.cumsum(valid, axis=-1, dtype=np.int32)
+        count[..., window:] -= count[..., :-window].copy()
+        out = np.where(count >= window, out, np.nan)
+    return out
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """简单移动平均"""
+    return _rolling_sum(np.asarray(values, dtype=np.float64), window) / window
+
+
+def rolling_std(values: np.ndarray, window: int, ddof: int = 0) -> np.ndarray:
+    """滑动窗口标准差"""
+    values = np.asarray(values, dtype=np.float64)
+    # 先减去各行首个有效值，降低平方和相减时的精度损失
+    first = np.argmax(~np.isnan(values), axis=-1)[..., None]
+    shifted = values - np.nan_to_num(np.take_along_axis(values, first, axis=-1))
+    mean = _rolling_sum(shifted, window) / window
+    mean_sq = _rolling_sum(shifted * shifted, window) / window
+    variance = np.maximum(mean_sq - mean * mean, 0.0) * window / (window - ddof)
+    return np.sqrt(variance)
+
+
+def _diff(values: np.ndarray) -> np.ndarray:
+    """一阶差分，首列补 NaN 以保持形状"""
+    out = np.full_like(values, np.nan)
+    out[..., 1:] = values[..., 1:] - values[..., :-1]
+    return out
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """相对强弱指数（Wilder 平滑，alpha = 1 / period）"""
+    close = np.asarray(close, dtype=np.float64)
+    delta = _diff(close)
+    avg_gain = ewm(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0)), 1.0 / period)
+    avg_loss = ewm(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0)), 1.0 / period)
+    result = _rsi_from_averages(avg_gain, avg_loss)
+
+    # 预热期（有效差分不足 period 个）不输出
+    warm = np.cumsum(~np.isnan(delta), axis=-1) < period
+    result[warm] = np.nan
+    return result
+
+
+def _rsi_from_averages(avg_gain: np.ndarray, avg_loss: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    # 窗口内没有下跌：有上涨为 100，完全走平为 50
+    return np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), result)
+
+
+def macd(
+        close: np.ndarray,
+        fast: int = MACD_FAST,
+        slow: int = MACD_SLOW,
+        signal: int = MACD_SIGNAL
+) -> Dict[str, np.ndarray]:
+    """MACD 线、信号线与柱状图"""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return {"macd": line, "macd_signal": signal_line, "macd_hist": line - signal_line}
+
+
+def bollinger(
+        close: np.ndarray,
+        window: int = BOLLINGER_WINDOW,
+        width: float = BOLLINGER_WIDTH
+) -> Dict[str, np.ndarray]:
+    """布林带（中轨为简单均线，带宽按总体标准差）"""
+    middle = sma(close, window)
+    deviation = rolling_std(close, window, ddof=0)
+    return {
+        "bb_middle": middle,
+        "bb_upper": middle + width * deviation,
+        "bb_lower": middle - width * deviation,
+    }
+
+
+def volatility(close: np.ndarray, window: int = VOLATILITY_WINDOW) -> np.ndarray:
+    """年化波动率（对数收益率的滑动样本标准差 × √252）"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_returns = _diff(np.log(np.asarray(close, dtype=np.float64)))
+    return rolling_std(log_returns, window, ddof=1) * math.sqrt(TRADING_DAYS)
+
+
+def drawdown(close: np.ndarray) -> Dict[str, np.ndarray]:
+    """当前回撤与历史最大回撤（相对历史最高收盘价）"""
+    close = np.asarray(close, dtype=np.float64)
+    running_max = np.fmax.accumulate(close, axis=-1)
+    current = close / running_max - 1.0
+    return {"drawdown": current, "max_drawdown": np.fmin.accumulate(current, axis=-1)}
+
+
+def compute_indicators(close: np.ndarray) -> Dict[str, np.ndarray]:
+    """计算全部指标的完整序列，返回与输入同形状的数组"""
+    close = np.asarray(close, dtype=np.float64)
+    result = {f"sma_{w}": sma(close, w) for w in SMA_WINDOWS}
+    result["rsi"] = rsi(close)
+    result.update(macd(close))
+    result.update(bollinger(close))
+    result["volatility"] = volatility(close)
+    result.update(drawdown(close))
+    return result
+
+
+# ============ 增量状态 ============
+
+@dataclass
+class IndicatorState:
+    """
+    多只股票的指标递推状态
+
+    所有数组的第一维是股票；window 保存最近 STATE_WINDOW 根收盘价（左侧 NaN 补齐），
+    用于计算均线、布林带和波动率。
+    """
+    tickers: List[str]
+    bars: np.ndarray
+    last_close: np.ndarray
+    window: np.ndarray
+    ema_fast: np.ndarray
+    ema_slow: np.ndarray
+    macd_signal: np.ndarray
+    avg_gain: np.ndarray
+    avg_loss: np.ndarray
+    running_max: np.ndarray
+    max_drawdown: np.ndarray
+
+    @classmethod
+    def empty(cls, tickers: Sequence[str]) -> "IndicatorState":
+        n = len(tickers)
+        nan = lambda: np.full(n, np.nan)
+        return cls(
+            tickers=list(tickers),
+            bars=np.zeros(n, dtype=np.int64),
+            last_close=nan(),
+            window=np.full((n, STATE_WINDOW), np.nan),
+            ema_fast=nan(), ema_slow=nan(), macd_signal=nan(),
+            avg_gain=nan(), avg_loss=nan(),
+            running_max=nan(), max_drawdown=nan(),
+        )
+
+    @classmethod
+    def from_history(cls, tickers: Sequence[str], close: np.ndarray) -> "IndicatorState":
+        """
+        从历史收盘价矩阵构建状态
+
+        只在时间维上递推状态向量，不生成完整的指标序列。
+        """
+        close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+        state = cls.empty(tickers)
+        by_time = np.ascontiguousarray(close.T)
+        for t in range(by_time.shape[0]):
+            state._advance(by_time[t])
+
+        tail = close[:, -STATE_WINDOW:]
+        state.window[:, STATE_WINDOW - tail.shape[1]:] = tail
+        return state
+
+    def _advance(self, x: np.ndarray):
+        """递推状态向前一步（不含收盘价窗口）"""
+        delta = x - self.last_close
+        gain = np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0))
+        loss = np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0))
+        self.avg_gain = _ewm_step(self.avg_gain, gain, 1.0 / RSI_PERIOD)
+        self.avg_loss = _ewm_step(self.avg_loss, loss, 1.0 / RSI_PERIOD)
+
+        self.ema_fast = _ewm_step(self.ema_fast, x, _span_alpha(MACD_FAST))
+        self.ema_slow = _ewm_step(self.ema_slow, x, _span_alpha(MACD_SLOW))
+        self.macd_signal = _ewm_step(self.macd_signal, self.ema_fast - self.ema_slow, _span_alpha(MACD_SIGNAL))
+
+        self.running_max = np.fmax(self.running_max, x)
+        self.max_drawdown = np.fmin(self.max_drawdown, x / self.running_max - 1.0)
+
+        valid = ~np.isnan(x)
+        self.bars = self.bars + valid
+        self.last_close = np.where(valid, x, self.last_close)
+
+    def update(self, close: np.ndarray):
+        """
+        追加新 K 线
+
+        Args:
+            close: 形状为 (股票数,) 的一根 K 线，或 (股票数, 新 K 线数) 的若干根；
+                   某只股票没有新数据时传 NaN
+        """
+        close = np.asarray(close, dtype=np.float64)
+        if close.ndim == 1:
+            close = close[:, None]
+
+        for t in range(close.shape[1]):
+            x = close[:, t]
+            self._advance(x)
+            valid = ~np.isnan(x)
+            self.window[valid] = np.roll(self.window[valid], -1, axis=1)
+            self.window[valid, -1] = x[valid]
+
+    def select(self, rows: Sequence[int]) -> "IndicatorState":
+        """取出部分股票的状态（副本）"""
+        rows = list(rows)
+        values = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            values[f.name] = [value[i] for i in rows] if f.name == "tickers" else value[rows].copy()
+        return IndicatorState(**values)
+
+    def latest(self) -> Dict[str, np.ndarray]:
+        """最新一根 K 线的全部指标值（每个数组形状为 (股票数,)）"""
+        result = {f"sma_{w}": self.window[:, -w:].mean(axis=1) for w in SMA_WINDOWS}
+
+        result["rsi"] = np.where(self.bars > RSI_PERIOD, _rsi_from_averages(self.avg_gain, self.avg_loss), np.nan)
+
+        line = self.ema_fast - self.ema_slow
+        result.update({"macd": line, "macd_signal": self.macd_signal, "macd_hist": line - self.macd_signal})
+
+        recent = self.window[:, -BOLLINGER_WINDOW:]
+        middle = recent.mean(axis=1)
+        deviation = recent.std(axis=1)
+        result.update({
+            "bb_middle": middle,
+            "bb_upper": middle + BOLLINGER_WIDTH * deviation,
+            "bb_lower": middle - BOLLINGER_WIDTH * deviation,
+        })
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_returns = np.diff(np.log(self.window[:, -(VOLATILITY_WINDOW + 1):]), axis=1)
+        result["volatility"] = log_returns.std(axis=1, ddof=1) * math.sqrt(TRADING_DAYS)
+
+        result["drawdown"] = self.last_close / self.running_max - 1.0
+        result["max_drawdown"] = self.max_drawdown
+        result["close"] = self.last_close
+        return result
@@ -0,0 +1,341 @@
+"""
+本地行情数据存储
+- 历史 K 线按股票、按列存为 NumPy .npy 文件，读取时内存映射（mmap）
+- 最新报价保存在内存快照中，查询为 O(1) 字典查找
+- 支持从 CSV 批量导入，便于离线测试
+- 其他进程（如命令行导入）更新快照后，运行中的服务在下一次查询时重新加载
+- 导入逐列替换 .npy 文件，读取时校验各列长度一致，读到新旧混合的列时重试
+
+目录结构：
+    data/market_data/
+    ├── snapshot.json          # 最新报价快照
+    └── AAPL/
+        ├── date.npy           # datetime64[D]
+        ├── open.npy / high.npy / low.npy / close.npy / volume.npy
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from src.core.cache import TTLCache
+from config.settings import settings
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+SNAPSHOT_FILENAME = "snapshot.json"
+
+# 其他进程导入时各列 .npy 逐个替换，读到新旧混合（长度不一致）的列时重新读取的次数和间隔（秒）
+_HISTORY_READ_RETRIES = 10
+_HISTORY_RETRY_INTERVAL = 0.05
+
+
+class Quote(NamedTuple):
+    """最新报价"""
+    ticker: str
+    date: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    prev_close: Optional[float]
+
+    @property
+    def change_pct(self) -> Optional[float]:
+        """相对前收盘价的涨跌幅（%）"""
+        if not self.prev_close:
+            return None
+        return (self.close / self.prev_close - 1) * 100
+
+
+class PriceHistory(NamedTuple):
+    """历史 K 线（列式，内存映射的只读数组）"""
+    dates: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+
+@dataclass
+class ImportStats:
+    """CSV 导入统计"""
+    files: int = 0
+    rows: int = 0
+    tickers: List[str] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+
+def _atomic_save(path: Path, array: np.ndarray):
+    """先写临时文件再替换，读者不会看到写了一半的数组"""
+    tmp_path = path.with_name(path.stem + ".tmp.npy")
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+class MarketDataStore:
+    """本地行情数据存储"""
+
+    # 检查快照文件是否被其他进程更新的最小间隔（秒），查询热路径上最多每秒 stat 一次
+    snapshot_check_interval = 1.0
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.market_data_path)
+        self._quotes: Dict[str, Quote] = {}
+        # 每个内存映射数组会占用一个文件描述符，历史数据句柄按 LRU 限量缓存
+        self._histories = TTLCache(maxsize=settings.market_history_cache_size)
+        self._write_lock = Lock()
+        self.snapshot_version: Optional[str] = None
+        self._snapshot_mtime: Optional[int] = None  # 已加载快照文件的修改时间
+        self._checked_at = time.monotonic()
+        self.load_snapshot()
+
+    # ============ 报价快照 ============
+
+    def load_snapshot(self):
+        """从磁盘加载最新报价快照"""
+        snapshot_path = self.root / SNAPSHOT_FILENAME
+        try:
+            mtime = snapshot_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+
+        with open(snapshot_path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+
+        self._snapshot_mtime = mtime
+        self._quotes = {ticker: Quote(ticker, *values) for ticker, values in snapshot["quotes"].items()}
+        self.snapshot_version = snapshot.get("version")
+        logger.info(f"📈 已加载 {len(self._quotes)} 只股票的报价快照（版本 {self.snapshot_version}）")
+
+    def _save_snapshot(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        snapshot = {
+            "version": self.snapshot_version,
+            "quotes": {ticker: list(quote[1:]) for ticker, quote in self._quotes.items()},
+        }
+        tmp_path = self.root / (SNAPSHOT_FILENAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.root / SNAPSHOT_FILENAME)
+        self._snapshot_mtime = (self.root / SNAPSHOT_FILENAME).stat().st_mtime_ns
+
+    def refresh(self):
+        """
+        快照文件被其他进程替换时重新加载报价，并丢弃历史数据的内存映射
+
+        导入会先替换各股票的 .npy 文件、最后写快照，旧的映射仍指向被替换的文件；
+        按 snapshot_check_interval 限频检查，本进程的导入不会触发重新加载。
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.snapshot_check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = (self.root / SNAPSHOT_FILENAME).stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._snapshot_mtime or not self._write_lock.acquire(blocking=False):
+            # 未变化，或本进程正在导入（导入结束时会更新快照）
+            return
+        try:
+            self.load_snapshot()
+            self._histories.clear()
+        finally:
+            self._write_lock.release()
+
+    def get_quote(self, ticker: str) -> Optional[Quote]:
+        """查询最新报价（O(1)）"""
+        self.refresh()
+        return self._quotes.get(ticker.strip().upper())
+
+    def tickers(self) -> List[str]:
+        """已有行情数据的股票代码"""
+        self.refresh()
+        return sorted(self._quotes)
+
+    # ============ 历史 K 线 ============
+
+    def get_history(self, ticker: str) -> Optional[PriceHistory]:
+        """读取历史 K 线（内存映射，不把整段历史读入内存）"""
+        self.refresh()
+        ticker = ticker.strip().upper()
+        history = self._histories.get(ticker)
+        if history is not None:
+            return history
+
+        ticker_dir = self.root / ticker
+        if not (ticker_dir / "date.npy").exists():
+            return None
+
+        for attempt in range(_HISTORY_READ_RETRIES):
+            history = PriceHistory(*(
+                np.load(ticker_dir / f"{column}.npy", mmap_mode="r")
+                for column in ("date",) + PRICE_COLUMNS
+            ))
+            if all(len(column) == len(history.dates) for column in history):
+                self._histories.set(ticker, history)
+                return history
+            # 导入进程正在逐列替换文件，稍后重新映射
+            time.sleep(_HISTORY_RETRY_INTERVAL)
+
+        logger.warning(f"⚠️ {ticker} 的历史数据各列长度不一致（可能正在导入），暂不可用")
+        return None
+
+    def get_close_matrix(
+            self,
+            tickers: Iterable[str],
+            lookback: Optional[int] = None
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        读取多只股票的收盘价矩阵
+
+        各股票按最近一根 K 线右对齐，历史较短的股票左侧用 NaN 补齐。
+
+        Args:
+            tickers: 股票代码，没有行情数据的会被跳过
+            lookback: 只取最近 N 根 K 线，None 表示全部历史
+
+        Returns:
+            (有数据的股票代码, 形状为 (股票数, K 线数) 的 float64 矩阵)
+        """
+        found, series = [], []
+        for ticker in tickers:
+            history = self.get_history(ticker)
+            if history is None or not len(history):
+                continue
+            close = history.close if lookback is None else history.close[-lookback:]
+            found.append(ticker.strip().upper())
+            series.append(close)
+
+        width = max((len(s) for s in series), default=0)
+        matrix = np.full((len(series), width), np.nan)
+        for row, close in enumerate(series):
+            matrix[row, width - len(close):] = close
+        return found, matrix
+
+    # ============ CSV 导入 ============
+
+    def _write_ticker(self, ticker: str, frame: pd.DataFrame):
+        """合并并写入一只股票的历史数据，同时更新报价快照"""
+        existing = self.get_history(ticker)
+        if existing is not None and len(existing):
+            old = pd.DataFrame({"date": np.asarray(existing.dates)})
+            for column in PRICE_COLUMNS:
+                old[column] = np.asarray(getattr(existing, column))
+            frame = pd.concat([old, frame], ignore_index=True)
+
+        # 同一日期以新导入的数据为准
+        frame = frame.drop_duplicates(subset="date", keep="last").sort_values("date")
+
+        ticker_dir = self.root / ticker
+        ticker_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_save(ticker_dir / "date.npy", frame["date"].to_numpy(dtype="datetime64[D]"))
+        for column in PRICE_COLUMNS:
+            _atomic_save(ticker_dir / f"{column}.npy", frame[column].to_numpy(dtype=np.float64))
+        self._histories.pop(ticker)
+
+        last = frame.iloc[-1]
+        prev_close = float(frame["close"].iloc[-2]) if len(frame) > 1 else None
+        self._quotes[ticker] = Quote(
+            ticker=ticker,
+            date=str(np.datetime64(last["date"], "D")),
+            open=float(last["open"]),
+            high=float(last["high"]),
+            low=float(last["low"]),
+            close=float(last["close"]),
+            volume=float(last["volume"]),
+            prev_close=prev_close,
+        )
+
+    def import_csv(self, paths: Union[str, Path, Iterable[Union[str, Path]]]) -> ImportStats:
+        """
+        从 CSV 批量导入历史行情
+
+        CSV 需包含 date, open, high, low, close, volume 列（不区分大小写）；
+        包含 ticker 列时一个文件可以有多只股票，否则以文件名作为股票代码。
+        目录参数会导入其中所有 .csv 文件。
+
+        Returns:
+            ImportStats
+        """
+        start = datetime.now()
+        if isinstance(paths, (str, Path)):
+            paths = [paths]
+
+        files: List[Path] = []
+        for path in map(Path, paths):
+            files.extend(sorted(path.glob("*.csv")) if path.is_dir() else [path])
+
+        stats = ImportStats()
+        touched = set()
+
+        with self._write_lock:
+            for csv_file in files:
+                frame = pd.read_csv(csv_file)
+                frame.columns = [c.strip().lower() for c in frame.columns]
+                missing = {"date", *PRICE_COLUMNS} - set(frame.columns)
+                if missing:
+                    raise ValueError(f"{csv_file} 缺少列: {sorted(missing)}")
+
+                frame["date"] = pd.to_datetime(frame["date"]).dt.normalize()
+                if "ticker" not in frame.columns:
+                    frame["ticker"] = csv_file.stem
+                frame["ticker"] = frame["ticker"].astype(str).str.strip().str.upper()
+
+                for ticker, group in frame.groupby("ticker", sort=False):
+                    self._write_ticker(ticker, group[["date", *PRICE_COLUMNS]])
+                    touched.add(ticker)
+
+                stats.files += 1
+                stats.rows += len(frame)
+
+            self.snapshot_version = datetime.now().isoformat(timespec="milliseconds")
+            self._save_snapshot()
+
+        stats.tickers = sorted(touched)
+        stats.elapsed_seconds = (datetime.now() - start).total_seconds()
+        logger.info(
+            f"✅ 导入 {stats.files} 个 CSV，{stats.rows} 行，{len(stats.tickers)} 只股票，"
+            f"耗时 {stats.elapsed_seconds:.2f}s"
+        )
+        return stats
+
+
+# 单例模式
+_store: Optional[MarketDataStore] = None
+
+
+def get_market_store() -> MarketDataStore:
+    """获取行情数据存储实例（单例）"""
+    global _store
+    if _store is None:
+        _store = MarketDataStore()
+    return _store
+
+
+if __name__ == "__main__":
+    """
+    从 CSV 导入行情数据：
+        python -m src.market.store data/prices/
+        python -m src.market.store AAPL.csv MSFT.csv
+    """
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    result = get_market_store().import_csv(sys.argv[1:])
+    print(f"导入完成：{len(result.tickers)} 只股票，{result.rows} 行")
@@ -0,0 +1,213 @@
+"""
+BM25 关键词索引
+入库时为每个文本块建立倒排索引，与向量数据库放在同一目录，随增量索引一起更新。
+
+向量检索对科目名称、业务分部名称、具体数字等精确词项不敏感，
+关键词检索与向量检索的结果在 RAGSystem 中做融合。
+"""
+
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+from src.rag.metadata import where_to_sql
+from config.settings import settings
+import logging
+import math
+import os
+import re
+import sqlite3
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+BM25_FILENAME = "bm25_index.sqlite3"
+
+# BM25 参数（常用取值）
+K1 = 1.2
+B = 0.75
+
+# 英文单词 / 数字（去掉千分位，保留小数），中文按单字切分
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.,]\d+)*|[\u4e00-\u9fff]")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "which will with our we us".split()
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    ticker TEXT,
+    fiscal_year INTEGER,
+    filing_type TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings (chunk_id);
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """小写分词，数字去掉千分位（391,035 -> 391035），去除停用词"""
+    # NFKC 把 PDF 中的连字（ﬁ、ﬀ）还原为普通字母
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for token in _TOKEN.findall(text):
+        token = token.replace(",", "")
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """基于 SQLite 倒排表的 BM25 关键词索引"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.path.join(settings.vector_store_path, BM25_FILENAME))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作独立连接，可在线程池中并发调用
+        return sqlite3.connect(self.path, timeout=10)
+
+    # ============ 写入（由增量索引器调用） ============
+
+    def replace_source(self, source: str, chunk_ids: List[str], docs: List[Document]) -> int:
+        """
+        用一个文件的全部文本块替换该文件之前的倒排记录
+
+        分词开销远小于 embedding，文件变化时整体重写即可。
+
+        Returns:
+            写入的文本块数
+        """
+        chunk_rows, posting_rows = [], []
+        for chunk_id, doc in zip(chunk_ids, docs):
+            counts = Counter(tokenize(doc.page_content))
+            metadata = doc.metadata
+            chunk_rows.append((
+                chunk_id, source, sum(counts.values()),
+                metadata.get("ticker"), metadata.get("fiscal_year"), metadata.get("filing_type"),
+            ))
+            posting_rows.extend((term, chunk_id, tf) for term, tf in counts.items())
+
+        with self._connect() as conn:
+            self._delete_source(conn, source)
+            conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?)", chunk_rows)
+            conn.executemany("INSERT OR REPLACE INTO postings VALUES (?, ?, ?)", posting_rows)
+        return len(chunk_rows)
+
+    @staticmethod
+    def _delete_source(conn: sqlite3.Connection, source: str):
+        conn.execute(
+            "DELETE FROM postings WHERE chunk_id IN (SELECT chunk_id FROM chunks WHERE source = ?)",
+            (source,)
+        )
+        conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+
+    def remove_source(self, source: str):
+        """删除一个文件的全部倒排记录"""
+        with self._connect() as conn:
+            self._delete_source(conn, source)
+
+    def clear(self):
+        """清空索引（向量数据库全量重建时调用）"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM chunks")
+
+    # ============ 查询 ============
+
+    def search(self, query: str, where: Optional[dict] = None, limit: int = 20) -> List[Tuple[str, float]]:
+        """
+        BM25 检索
+
+        Args:
+            query: 查询文本
+            where: Chroma 格式的元数据过滤条件（build_metadata_filter 的输出）
+            limit: 返回的文本块数量
+
+        Returns:
+            [(chunk_id, score)]，按得分从高到低排列
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        filter_sql, filter_params = where_to_sql(where, "c.")
+        placeholders = ",".join("?" * len(terms))
+        with self._connect() as conn:
+            total, avg_length = conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            if not total:
+                return []
+
+            # IDF 按全量语料计算，过滤条件只作用于候选文本块
+            doc_freq = dict(conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term",
+                terms
+            ).fetchall())
+            weights = [
+                (term, math.log(1 + (total - df + 0.5) / (df + 0.5)))
+                for term, df in doc_freq.items()
+            ]
+            if not weights:
+                return []
+
+            values = ",".join(["(?, ?)"] * len(weights))
+            rows = conn.execute(
+                f"WITH q(term, idf) AS (VALUES {values}) "
+                f"SELECT p.chunk_id, SUM(q.idf * p.tf * {K1 + 1} / "
+                f"(p.tf + {K1} * (1 - {B} + {B} * c.length / ?))) AS score "
+                f"FROM q JOIN postings p ON p.term = q.term JOIN chunks c ON c.chunk_id = p.chunk_id "
+                f"{'WHERE ' + filter_sql if filter_sql else ''} "
+                f"GROUP BY p.chunk_id ORDER BY score DESC LIMIT ?",
+                [v for pair in weights for v in pair] + [avg_length or 1.0] + filter_params + [limit]
+            ).fetchall()
+        return [(chunk_id, score) for chunk_id, score in rows]
+
+    def stats(self) -> dict:
+        """索引规模统计"""
+        with self._connect() as conn:
+            chunks, sources = conn.execute("SELECT COUNT(*), COUNT(DISTINCT source) FROM chunks").fetchone()
+            terms = conn.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()[0]
+        return {"chunks": chunks, "sources": sources, "terms": terms}
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[str]:
+    """
+    倒数排名融合（RRF）：score = Σ 1 / (k + rank)
+
+    只依赖排名，不需要把 BM25 得分和向量距离归一化到同一尺度。
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, 1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class CrossEncoderReranker:
+    """交叉编码器重排（sentence-transformers CrossEncoder，CPU 运行）"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import CrossEncoder
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def rerank(self, query: str, docs: List[Document], top_k: int) -> List[Document]:
+        """按 (查询, 文本块) 相关性得分重排，返回前 top_k 个"""
+        if not docs:
+            return []
+        scores = self.model.predict([(query, doc.page_content) for doc in docs])
+        order = sorted(range(len(docs)), key=lambda i: float(scores[i]), reverse=True)
+        return [docs[i] for i in order[:top_k]]
@@ -0,0 +1,178 @@
+"""
+共享检索服务客户端
+配置 RAG_SERVICE_URL 后，每个 uvicorn 工作进程都不再加载 embedding 模型和向量索引，
+检索和查询向量计算都转发给同一个检索服务进程（python -m src.rag.service）。
+
+接口与 RAGSystem 一致，工具、主管代理和 API 不需要区分两种模式。
+"""
+
+from typing import List, Optional
+from src.rag.indexer import read_index_version
+from src.core.tracing import span, traceparent
+from config.settings import settings
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 等待检索服务就绪时的轮询间隔（秒）
+_READY_POLL_INTERVAL = 0.5
+# 服务未就绪时，embeddings_loaded 两次查询之间的最小间隔（秒）
+_READY_RECHECK_INTERVAL = 5.0
+# 两轮等待之间退避的上限（秒）
+_MAX_RETRY_BACKOFF = 30.0
+
+
+class RAGServiceUnavailable(RuntimeError):
+    """检索服务连接失败（服务未启动或已退出）"""
+
+
+class RAGServiceClient:
+    """调用共享检索服务的 RAGSystem 替代实现"""
+
+    def __init__(self, url: str, timeout: float = 60.0):
+        """
+        Args:
+            url: 服务地址，http://host:port 或 unix:///path/to/socket（本机推荐，省去 TCP 开销）
+            timeout: 单次调用超时时间（秒）
+        """
+        import httpx
+
+        self.url = url
+        if url.startswith("unix://"):
+            transport = httpx.HTTPTransport(uds=url[len("unix://"):])
+            base_url = "http://rag-service"
+        else:
+            transport = None
+            base_url = url.rstrip("/")
+        # httpx.Client 线程安全，RAG 线程池中的多个线程共用一个连接池
+        self._client = httpx.Client(base_url=base_url, transport=transport, timeout=timeout)
+        self._ready = False
+        self._checked_at = float("-inf")
+
+    def _post(self, path: str, payload: Optional[dict] = None) -> dict:
+        # 把当前 trace 传给服务进程，检索服务记录的 span 挂在同一个 trace 下
+        header = traceparent()
+        response = self._client.post(path, json=payload or {}, headers={"traceparent": header} if header else None)
+        response.raise_for_status()
+        return response.json()
+
+    def _get(self, path: str) -> dict:
+        response = self._client.get(path)
+        response.raise_for_status()
+        return response.json()
+
+    # ============ 就绪状态 ============
+
+    def _check_ready(self) -> bool:
+        self._checked_at = time.monotonic()
+        try:
+            self._ready = self._client.get("/ready", timeout=2.0).status_code == 200
+        except Exception:
+            self._ready = False
+        return self._ready
+
+    @property
+    def embeddings_loaded(self) -> bool:
+        """
+        检索服务是否已加载完 embedding 模型
+
+        服务就绪后不再查询；未就绪时按 _READY_RECHECK_INTERVAL 限频查询，
+        期间直接返回 False，不会在每次调用时都发起同步 HTTP 请求。
+        """
+        if self._ready:
+            return True
+        if time.monotonic() - self._checked_at < _READY_RECHECK_INTERVAL:
+            return False
+        return self._check_ready()
+
+    @property
+    def index_version(self) -> int:
+        """索引版本直接读清单文件（与服务进程共享同一目录），不经过网络"""
+        return read_index_version()
+
+    def load(self) -> bool:
+        """等待检索服务完成预热"""
+        deadline = time.monotonic() + settings.rag_service_timeout
+        while not self._check_ready():
+            if time.monotonic() > deadline:
+                logger.warning(f"⚠️ 检索服务 {self.url} 未在 {settings.rag_service_timeout}s 内就绪")
+                return False
+            time.sleep(_READY_POLL_INTERVAL)
+        logger.info(f"✅ 检索服务 {self.url} 已就绪")
+        return True
+
+    def load_embeddings(self):
+        """
+        模型在服务进程中加载，这里等待服务就绪（工作进程的 /ready 随之变化）
+
+        最多等待 settings.rag_service_ready_attempts 轮，轮间指数退避；
+        仍未就绪时抛出 RuntimeError，预热标记为失败，/ready 返回错误信息。
+        """
+        attempts = max(1, settings.rag_service_ready_attempts)
+        for attempt in range(1, attempts + 1):
+            if self.load():
+                return
+            if attempt < attempts:
+                time.sleep(min(_READY_POLL_INTERVAL * 2 ** attempt, _MAX_RETRY_BACKOFF))
+        raise RuntimeError(f"检索服务 {self.url} 未就绪（已等待 {attempts} 轮）")
+
+    # ============ 检索 ============
+
+    def initialize(self) -> str:
+        """请求服务增量同步 PDF 索引（服务进程是唯一的写入者）"""
+        try:
+            return self._post("/initialize")["message"]
+        except Exception as e:
+            logger.error(f"❌ RAG 初始化失败: {e}", exc_info=True)
+            return f"初始化失败: {str(e)}"
+
+    def retrieve(
+            self,
+            query: str,
+            ticker: Optional[str] = None,
+            fiscal_year: Optional[int] = None,
+            filing_type: Optional[str] = None,
+            k: int = 5
+    ) -> str:
+        """检索相关财报（参数与返回值同 RAGSystem.retrieve）"""
+        try:
+            with span("rag.retrieve", "remote", **{"rag.k": k, "rag.ticker": ticker, "rag.service_url": self.url}):
+                return self._post("/retrieve", {
+                    "query": query,
+                    "ticker": ticker,
+                    "fiscal_year": fiscal_year,
+                    "filing_type": filing_type,
+                    "k": k,
+                })["context"]
+        except Exception as e:
+            logger.error(f"❌ 检索失败: {e}", exc_info=True)
+            return ""
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        生成查询向量（服务端带缓存）
+
+        Raises:
+            RAGServiceUnavailable: 连接检索服务失败
+        """
+        import httpx
+
+        try:
+            with span("rag.embed", "remote", **{"rag.service_url": self.url}):
+                return self._post("/embed", {"text": query})["vector"]
+        except httpx.TransportError as e:
+            # 服务已不可用：重置就绪状态，embeddings_loaded 按限频重新查询
+            self._ready = False
+            self._checked_at = time.monotonic()
+            raise RAGServiceUnavailable(f"检索服务 {self.url} 不可用: {e}") from e
+
+    # ============ 指标 ============
+
+    def cache_stats(self) -> dict:
+        """检索服务的缓存命中率等指标"""
+        return {**self._get("/stats"), "service_url": self.url}
+
+    def clear_cache(self):
+        """清空服务端的查询向量和检索结果缓存"""
+        self._post("/cache/clear")
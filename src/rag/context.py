@@ -0,0 +1,201 @@
+"""
+检索上下文组装
+检索到的文本块在拼接进工具输出之前先做一遍整理：
+
+1. 去掉相邻文本块之间的重叠片段（chunk_overlap 导致同一段文字重复出现）
+2. 同一页的文本块合并为一个片段，只保留一个来源标题
+3. 按相关性顺序装入 token 预算，超出预算的片段截断或丢弃
+
+工具输出会被带进之后的每一轮 LLM 调用，上下文越短，每轮的提示词越短。
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# 不重叠的同页片段之间的分隔符
+GAP_MARKER = " … "
+# 剩余预算少于该值时不再截断装入，直接丢弃后续片段
+MIN_SEGMENT_TOKENS = 40
+# 无 start_index 时用于定位重叠的前缀长度
+_PROBE_CHARS = 50
+
+_CJK = re.compile(r"[\u4e00-\u9fff]")
+
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text: str) -> int:
+    """
+    估算 token 数
+
+    优先使用 tiktoken（cl100k_base，与 DeepSeek 分词器的数量级一致）；
+    未安装或编码文件无法下载时按经验值估算：中文 1 字 ≈ 1 token，其余 4 字符 ≈ 1 token。
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"⚠️ tiktoken 不可用，按字符数估算 token: {e}")
+            _encoding_failed = True
+
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def describe_source(doc: Document) -> str:
+    """文档来源描述，例如：AAPL 10-K FY2025 第 12 页"""
+    metadata = doc.metadata
+    parts = [metadata.get("ticker") or metadata.get("company", "Unknown")]
+    if metadata.get("filing_type"):
+        parts.append(metadata["filing_type"])
+    if metadata.get("fiscal_year"):
+        parts.append(f"FY{metadata['fiscal_year']}")
+    if metadata.get("page") is not None:
+        parts.append(f"第 {int(metadata['page']) + 1} 页")
+    return " ".join(str(p) for p in parts)
+
+
+@dataclass
+class PackedContext:
+    """组装结果与 token 统计"""
+    text: str
+    chunks: int = 0  # 输入的文本块数
+    segments: int = 0  # 输出的片段数
+    raw_tokens: int = 0  # 直接拼接全部文本块的 token 数
+    tokens: int = 0  # 组装后的 token 数
+    truncated: bool = False  # 是否因预算截断或丢弃了内容
+
+
+def _overlap_at(left: str, right: str) -> Optional[int]:
+    """right 的开头与 left 的结尾重叠时，返回 right 中重叠部分之后的位置"""
+    probe = right[:_PROBE_CHARS]
+    if not probe:
+        return None
+    position = left.find(probe, max(0, len(left) - len(right)))
+    while position != -1:
+        tail = left[position:]
+        if right.startswith(tail):
+            return len(tail)
+        position = left.find(probe, position + 1)
+    return None
+
+
+def _merge_page(docs: List[Document]) -> str:
+    """合并同一页的文本块，去掉重叠部分"""
+    if all(doc.metadata.get("start_index") is not None for doc in docs):
+        # 有原文偏移量（add_start_index）时按偏移量精确拼接
+        ordered = sorted(docs, key=lambda d: d.metadata["start_index"])
+        text = ordered[0].page_content
+        end = ordered[0].metadata["start_index"] + len(text)
+        for doc in ordered[1:]:
+            start, content = doc.metadata["start_index"], doc.page_content
+            if start + len(content) <= end:
+                continue  # 完全包含在已拼接的范围内
+            if start < end:
+                text += content[end - start:]
+            else:
+                # 两块之间只隔着被分割器去掉的空白时视为连续
+                text += "\n" + content if start - end <= 2 else GAP_MARKER + content
+            end = start + len(content)
+        return text
+
+    # 旧索引没有偏移量：按文本查找前后重叠，直到没有可以拼接的片段
+    blocks: List[str] = []
+    for content in (doc.page_content for doc in docs):
+        pending = content
+        while True:
+            if any(pending in block for block in blocks):
+                break
+            for i, block in enumerate(blocks):
+                cut = _overlap_at(block, pending)
+                if cut is not None:
+                    pending = block + pending[cut:]
+                    del blocks[i]
+                    break
+                cut = _overlap_at(pending, block)
+                if cut is not None:
+                    pending = pending + block[cut:]
+                    del blocks[i]
+                    break
+            else:
+                blocks.append(pending)
+                break
+    return GAP_MARKER.join(blocks)
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """按 token 预算截断，尽量停在句末或行末"""
+    # token 与字符数大致成比例，先按比例估计再逐步收缩
+    ratio = max_tokens / max(count_tokens(text), 1)
+    cut = text[:int(len(text) * ratio)]
+    while cut and count_tokens(cut) > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    boundary = max(cut.rfind(". "), cut.rfind("。"), cut.rfind("\n"))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + " …"
+
+
+def pack_context(docs: List[Document], token_budget: int = 0) -> PackedContext:
+    """
+    组装检索上下文
+
+    Args:
+        docs: 按相关性排序的文本块
+        token_budget: token 预算，0 表示不限制
+
+    Returns:
+        PackedContext；片段按其中最相关文本块的排名排序
+    """
+    if not docs:
+        return PackedContext("")
+
+    # 按 (文件来源, 页码) 分组，组的顺序取组内第一个（最相关）文本块的排名
+    groups: Dict[Tuple, List[Document]] = {}
+    for doc in docs:
+        key = (doc.metadata.get("source"), describe_source(doc), doc.metadata.get("page"))
+        groups.setdefault(key, []).append(doc)
+
+    # 对照：逐块直接拼接（旧格式）的 token 数
+    raw_tokens = count_tokens("".join(
+        f"\n=== 文档 {i} [{describe_source(doc)}] ===\n{doc.page_content}\n" for i, doc in enumerate(docs, 1)
+    ))
+    parts, used, truncated = [], 0, False
+    for index, group in enumerate(groups.values(), 1):
+        header = f"\n=== 文档 {index} [{describe_source(group[0])}] ===\n"
+        body = _merge_page(group)
+        header_tokens = count_tokens(header)
+        body_tokens = count_tokens(body)
+
+        if token_budget and used + header_tokens + body_tokens > token_budget:
+            truncated = True
+            remaining = token_budget - used - header_tokens
+            if remaining < MIN_SEGMENT_TOKENS:
+                break
+            body = _truncate(body, remaining)
+            body_tokens = count_tokens(body)
+
+        parts.append(f"{header}{body}\n")
+        used += header_tokens + body_tokens
+        if truncated:
+            break
+
+    text = "".join(parts)
+    return PackedContext(
+        text=text,
+        chunks=len(docs),
+        segments=len(parts),
+        raw_tokens=raw_tokens,
+        tokens=count_tokens(text),
+        truncated=truncated,
+    )
@@ -0,0 +1,59 @@
+"""
+流式 embedding 阶段
+按固定批大小嵌入文本块并立即写入向量数据库，
+峰值内存只与批大小有关，与语料规模无关。
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional
+from langchain_core.documents import Document
+from config.settings import settings
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EmbeddingStats:
+    """embedding 阶段的累计统计"""
+    chunks: int = 0
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class EmbeddingStage:
+    """
+    批量写入向量数据库
+
+    每批文本块由向量数据库的 embedding 函数（RAGSystem 中的 HuggingFaceEmbeddings）
+    嵌入后立即 upsert，批与批之间不保留文本、向量或写入负载。
+    """
+
+    def __init__(self, vectorstore, batch_size: Optional[int] = None):
+        self.vectorstore = vectorstore
+        self.batch_size = max(1, batch_size or settings.embedding_batch_size)
+        self.stats = EmbeddingStats()
+
+    def write(self, docs: List[Document], ids: List[str]):
+        """分批嵌入并写入一组文本块"""
+        for i in range(0, len(docs), self.batch_size):
+            start = time.perf_counter()
+            batch_docs = docs[i:i + self.batch_size]
+            self.vectorstore.add_documents(batch_docs, ids=ids[i:i + self.batch_size])
+
+            self.stats.chunks += len(batch_docs)
+            self.stats.batches += 1
+            self.stats.elapsed_seconds += time.perf_counter() - start
+
+    def log_summary(self):
+        """记录累计吞吐量"""
+        if self.stats.chunks:
+            logger.info(
+                f"🧮 Embedding：{self.stats.chunks} 块 / {self.stats.batches} 批，"
+                f"{self.stats.elapsed_seconds:.2f}s（{self.stats.chunks_per_second:.1f} 块/s）"
+            )
@@ -0,0 +1,312 @@
+"""
+FAISS 向量索引（可选后端）
+向量以标量量化（int8 / int4）编码保存在单个索引文件中，检索时以内存映射方式打开，
+启动只读取文件头，按需由操作系统分页加载，多个进程共享同一份页缓存。
+量化范围需要足够的训练样本，向量数达到 _MIN_TRAIN_SAMPLES 之前先以 float32 扁平索引保存。
+文本块原文和元数据保存在同目录的 SQLite 文档库中，元数据过滤先在文档库中选出候选 ID，
+再通过 IDSelector 下推到 FAISS 检索。
+
+对外提供与 Chroma 相同的接口子集（add_documents / delete / get / reset_collection /
+similarity_search_by_vector），IncrementalIndexer 和 EmbeddingStage 不需要区分后端。
+
+通过 VECTOR_BACKEND=faiss 启用，需要安装 faiss-cpu。
+"""
+
+from pathlib import Path
+from threading import RLock
+from typing import List, Optional
+from langchain_core.documents import Document
+from src.rag.metadata import where_to_sql
+import json
+import logging
+import os
+import sqlite3
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.faiss"
+DOCSTORE_FILENAME = "docstore.sqlite3"
+
+# 量化范围在训练集 min/max 的基础上两端各放宽的比例，容纳后续批次中超出范围的分量
+_RANGE_MARGIN = 0.2
+# 训练量化范围所需的最少向量数；不足时先以 float32 暂存在扁平索引中，
+# 避免只用第一个文件的少量文本块训练出过窄的范围
+_MIN_TRAIN_SAMPLES = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    faiss_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chunk_id TEXT NOT NULL UNIQUE,
+    document TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    ticker TEXT,
+    fiscal_year INTEGER,
+    filing_type TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_ticker ON chunks (ticker, fiscal_year);
+"""
+
+
+class FaissVectorStore:
+    """量化向量 + 内存映射的本地 FAISS 索引"""
+
+    def __init__(self, embedding_function, persist_directory: str, index_type: str = "sq8"):
+        """
+        Args:
+            embedding_function: LangChain Embeddings（与 Chroma 后端相同的模型）
+            persist_directory: 向量数据库目录，索引文件保存在其下的 faiss/ 子目录
+            index_type: flat（float32）/ sq8（int8 标量量化）/ sq4（4 bit 标量量化）
+        """
+        import faiss
+
+        if index_type not in ("flat", "sq8", "sq4"):
+            raise ValueError(f"不支持的 FAISS 索引类型: {index_type}")
+
+        self._faiss = faiss
+        self.embedding_function = embedding_function
+        self.index_type = index_type
+        self.directory = Path(persist_directory) / "faiss"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / INDEX_FILENAME
+        self.docstore_path = self.directory / DOCSTORE_FILENAME
+
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+        self._lock = RLock()
+        self._index = None
+        self._mapped = False  # 当前索引是否为只读内存映射
+        self._mapped_mtime = None  # 映射时索引文件的修改时间
+        self._dirty = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作独立连接，可在线程池中并发调用
+        return sqlite3.connect(self.docstore_path, timeout=10)
+
+    # ============ 索引加载 ============
+
+    def _new_index(self, dimension: int, index_type: str):
+        faiss = self._faiss
+        if index_type == "flat":
+            base = faiss.IndexFlatIP(dimension)
+        else:
+            qtype = faiss.ScalarQuantizer.QT_8bit if index_type == "sq8" else faiss.ScalarQuantizer.QT_4bit
+            base = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+            base.sq.rangestat = faiss.ScalarQuantizer.RS_minmax
+            base.sq.rangestat_arg = _RANGE_MARGIN
+        # IDMap2 支持按 ID 删除和重建向量
+        return faiss.IndexIDMap2(base)
+
+    def _is_staging(self, index) -> bool:
+        """量化索引攒够训练样本之前，向量暂存在扁平索引中"""
+        return self.index_type != "flat" and isinstance(
+            self._faiss.downcast_index(index.index), self._faiss.IndexFlat
+        )
+
+    def _quantize(self, index):
+        """用暂存的全部 float32 向量训练量化范围，转换为标量量化索引（ID 不变）"""
+        base = self._faiss.downcast_index(index.index)
+        vectors = base.reconstruct_n(0, base.ntotal)
+        ids = self._faiss.vector_to_array(index.id_map)
+        quantized = self._new_index(index.d, self.index_type)
+        quantized.train(vectors)
+        quantized.add_with_ids(vectors, ids)
+        logger.info(f"🗜️ FAISS 索引已用 {len(ids)} 个向量训练量化范围（{self.index_type}）")
+        return quantized
+
+    def _read_index(self):
+        """
+        检索用索引：文件存在时以内存映射方式打开
+
+        其他进程（单一写入者）替换了索引文件时重新映射，多个进程读同一份页缓存。
+        """
+        if self._index is not None and not self._mapped:
+            return self._index
+        try:
+            mtime = self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return self._index
+        if self._index is None or mtime != self._mapped_mtime:
+            # IO_FLAG_MMAP_IFC 映射扁平编码（faiss >= 1.10），旧版本退回 IO_FLAG_MMAP
+            flag = getattr(self._faiss, "IO_FLAG_MMAP_IFC", self._faiss.IO_FLAG_MMAP)
+            self._index = self._faiss.read_index(str(self.index_path), flag)
+            self._mapped, self._mapped_mtime = True, mtime
+        return self._index
+
+    def _writable_index(self, dimension: int):
+        """
+        写入用索引：内存映射的编码不可修改，写入前完整读入内存
+
+        新进程第一次写入时（尚未检索过，_index 为空）同样先读入磁盘上的索引，
+        否则新建的空索引在 flush 时会覆盖之前写入的全部向量。
+        """
+        if self._mapped or (self._index is None and self.index_path.exists()):
+            self._index = self._faiss.read_index(str(self.index_path))
+            self._mapped = False
+        if self._index is None:
+            # 量化索引先从扁平索引开始，训练样本足够后再转换
+            self._index = self._new_index(dimension, "flat")
+        return self._index
+
+    def flush(self):
+        """把内存中的索引原子写入磁盘（增量索引器每处理完一个文件调用一次）"""
+        with self._lock:
+            if not self._dirty or self._index is None:
+                return
+            tmp_path = self.index_path.with_suffix(".tmp")
+            self._faiss.write_index(self._index, str(tmp_path))
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    # ============ 写入 ============
+
+    def add_documents(self, documents: List[Document], ids: List[str]) -> List[str]:
+        """嵌入并写入文本块；ID 已存在时覆盖（与 Chroma upsert 语义一致）"""
+        if not documents:
+            return []
+        vectors = np.asarray(
+            self.embedding_function.embed_documents([doc.page_content for doc in documents]),
+            dtype=np.float32
+        )
+        self._faiss.normalize_L2(vectors)
+
+        with self._lock, self._connect() as conn:
+            index = self._writable_index(vectors.shape[1])
+            self._delete_rows(conn, index, ids)
+
+            faiss_ids = []
+            for chunk_id, doc in zip(ids, documents):
+                metadata = doc.metadata
+                cursor = conn.execute(
+                    "INSERT INTO chunks (chunk_id, document, metadata, ticker, fiscal_year, filing_type) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        chunk_id, doc.page_content, json.dumps(metadata, ensure_ascii=False),
+                        metadata.get("ticker"), metadata.get("fiscal_year"), metadata.get("filing_type"),
+                    )
+                )
+                faiss_ids.append(cursor.lastrowid)
+
+            # 写入失败时文档库事务回滚
+            index.add_with_ids(vectors, np.asarray(faiss_ids, dtype=np.int64))
+            # 量化范围训练后不再变化（全量重建时重新训练），因此等样本足够再训练
+            if self._is_staging(index) and index.ntotal >= _MIN_TRAIN_SAMPLES:
+                self._index = self._quantize(index)
+            self._dirty = True
+        return list(ids)
+
+    def _delete_rows(self, conn: sqlite3.Connection, index, ids: List[str]) -> int:
+        placeholders = ",".join("?" * len(ids))
+        faiss_ids = [row[0] for row in conn.execute(
+            f"SELECT faiss_id FROM chunks WHERE chunk_id IN ({placeholders})", ids
+        )]
+        if faiss_ids:
+            conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", ids)
+            index.remove_ids(self._faiss.IDSelectorBatch(np.asarray(faiss_ids, dtype=np.int64)))
+            self._dirty = True
+        return len(faiss_ids)
+
+    def delete(self, ids: Optional[List[str]] = None):
+        """按文本块 ID 删除"""
+        if not ids:
+            return
+        with self._lock, self._connect() as conn:
+            index = self._read_index()
+            if index is None:
+                conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({','.join('?' * len(ids))})", ids)
+                return
+            self._delete_rows(conn, self._writable_index(index.d), ids)
+
+    def reset_collection(self):
+        """清空索引和文档库（全量重建时调用）"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM chunks")
+            self._index, self._mapped, self._dirty = None, False, False
+            if self.index_path.exists():
+                self.index_path.unlink()
+
+    # ============ 查询 ============
+
+    def get(
+            self,
+            ids: Optional[List[str]] = None,
+            limit: Optional[int] = None,
+            include: Optional[List[str]] = None
+    ) -> dict:
+        """按 ID 读取文本块（返回格式与 Chroma.get 一致）"""
+        include = ["documents", "metadatas"] if include is None else include
+        sql = "SELECT chunk_id, document, metadata FROM chunks"
+        params: list = []
+        if ids is not None:
+            if not ids:
+                return {"ids": [], "documents": [], "metadatas": []}
+            sql += f" WHERE chunk_id IN ({','.join('?' * len(ids))})"
+            params = list(ids)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        result = {"ids": [row[0] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [row[1] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(row[2]) for row in rows]
+        return result
+
+    def similarity_search_by_vector(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            filter: Optional[dict] = None,
+            **kwargs
+    ) -> List[Document]:
+        """向量检索；filter 为 Chroma 格式的 where 条件，翻译为候选 ID 集合下推到 FAISS"""
+        params = None
+        if filter:
+            filter_sql, filter_params = where_to_sql(filter)
+            with self._connect() as conn:
+                candidates = [row[0] for row in conn.execute(
+                    f"SELECT faiss_id FROM chunks WHERE {filter_sql}", filter_params
+                )]
+            if not candidates:
+                return []
+            selector = self._faiss.IDSelectorBatch(np.asarray(candidates, dtype=np.int64))
+            params = self._faiss.SearchParameters(sel=selector)
+
+        query = np.asarray([embedding], dtype=np.float32)
+        self._faiss.normalize_L2(query)
+        # 增量写入时索引在内存中被修改，检索与写入互斥
+        with self._lock:
+            index = self._read_index()
+            if index is None or index.ntotal == 0:
+                return []
+            _, labels = index.search(query, k, params=params)
+        faiss_ids = [int(i) for i in labels[0] if i != -1]
+        if not faiss_ids:
+            return []
+
+        with self._connect() as conn:
+            rows = {row[0]: row[1:] for row in conn.execute(
+                f"SELECT faiss_id, chunk_id, document, metadata FROM chunks "
+                f"WHERE faiss_id IN ({','.join('?' * len(faiss_ids))})",
+                faiss_ids
+            )}
+        return [
+            Document(page_content=rows[i][1], metadata=json.loads(rows[i][2]), id=rows[i][0])
+            for i in faiss_ids if i in rows
+        ]
+
+    def stats(self) -> dict:
+        """索引规模与磁盘占用"""
+        with self._lock:
+            index = self._read_index()
+        return {
+            "index_type": self.index_type,
+            "vectors": index.ntotal if index is not None else 0,
+            "index_bytes": self.index_path.stat().st_size if self.index_path.exists() else 0,
+            "memory_mapped": self._mapped,
+        }
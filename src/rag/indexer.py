@@ -0,0 +1,389 @@
+"""
+增量索引
+通过清单文件（manifest）记录每个 PDF 的内容哈希和文本块哈希，
+启动时只解析、嵌入新增或变更的财报，并删除已移除财报的文本块。
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from src.financials.store import STORE_FILENAME, FinancialStore
+from src.rag.bm25 import BM25_FILENAME, BM25Index
+from src.rag.embedding import EmbeddingStage
+from src.rag.loader import FileLoadResult, PDFLoader
+from config.settings import settings
+import hashlib
+import json
+import logging
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows 不支持 flock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "index_manifest.json"
+LOCK_FILENAME = ".index.lock"
+
+# 文本块 ID / 元数据格式发生变化时递增，触发全量重建
+MANIFEST_SCHEMA_VERSION = 2
+
+
+@dataclass
+class IndexStats:
+    """一次增量同步的统计信息"""
+    added_files: List[str] = field(default_factory=list)
+    updated_files: List[str] = field(default_factory=list)
+    removed_files: List[str] = field(default_factory=list)
+    unchanged_files: int = 0
+    failed_files: List[str] = field(default_factory=list)
+    added_chunks: int = 0
+    removed_chunks: int = 0
+    statement_rows: int = 0
+    keyword_chunks: int = 0
+    total_chunks: int = 0
+    rebuilt: bool = False
+    elapsed_seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        """索引内容是否发生变化"""
+        return bool(
+            self.added_chunks or self.removed_chunks or self.statement_rows or self.keyword_chunks or self.rebuilt
+        )
+
+    def summary(self) -> str:
+        """生成可读的同步摘要"""
+        return (
+            f"索引同步完成：新增 {len(self.added_files)} 个文件，"
+            f"更新 {len(self.updated_files)} 个，删除 {len(self.removed_files)} 个，"
+            f"未变化 {self.unchanged_files} 个；"
+            f"写入 {self.added_chunks} 个文本块，删除 {self.removed_chunks} 个，"
+            f"抽取 {self.statement_rows} 条报表科目，"
+            f"共 {self.total_chunks} 个文档块，耗时 {self.elapsed_seconds:.2f}s"
+        )
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    """流式计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_sha256(doc: Document) -> str:
+    """文本块哈希：内容 + 页码，页码变化也视为不同的块"""
+    payload = f"{doc.metadata.get('page', '')}\x00{doc.page_content}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def assign_chunk_ids(file_key: str, docs: List[Document]) -> Tuple[List[str], List[str]]:
+    """
+    为文件的文本块生成确定性 ID
+
+    相同内容的块在重新解析后得到相同 ID，因此文件变更时只需写入真正变化的块。
+    同一文件内重复出现的块通过序号区分。
+
+    Returns:
+        (chunk_ids, chunk_hashes)
+    """
+    file_digest = hashlib.sha256(file_key.encode("utf-8")).hexdigest()[:12]
+    seen: Dict[str, int] = {}
+    ids, hashes = [], []
+
+    for doc in docs:
+        chunk_hash = chunk_sha256(doc)
+        occurrence = seen.get(chunk_hash, 0)
+        seen[chunk_hash] = occurrence + 1
+        ids.append(f"{file_digest}-{chunk_hash[:24]}-{occurrence}")
+        hashes.append(chunk_hash)
+
+    return ids, hashes
+
+
+class IncrementalIndexer:
+    """基于清单文件的增量索引器"""
+
+    def __init__(
+            self,
+            vectorstore,
+            loader: Optional[PDFLoader] = None,
+            manifest_path: Optional[str] = None,
+            statement_store: Optional[FinancialStore] = None,
+            keyword_index: Optional[BM25Index] = None
+    ):
+        self.vectorstore = vectorstore
+        self.loader = loader or PDFLoader()
+        self.manifest_path = Path(manifest_path or os.path.join(settings.vector_store_path, MANIFEST_FILENAME))
+        self.embedding_stage = EmbeddingStage(vectorstore)
+        # 报表数据库与清单放在同一目录，随索引一起重建
+        self.statement_store = statement_store or FinancialStore(str(self.manifest_path.parent / STORE_FILENAME))
+        self.keyword_index = keyword_index or BM25Index(str(self.manifest_path.parent / BM25_FILENAME))
+
+    # ============ 清单读写 ============
+
+    @staticmethod
+    def fingerprint() -> dict:
+        """影响索引内容的配置，任一变化都需要全量重建"""
+        fingerprint = {
+            "schema": MANIFEST_SCHEMA_VERSION,
+            "embedding_model": settings.embedding_model_name,
+            "chunk_size": settings.chunk_size,
+            "chunk_overlap": settings.chunk_overlap,
+        }
+        # 默认的 Chroma 后端不写入该字段，已有索引升级后不会被重建
+        if settings.vector_backend != "chroma":
+            fingerprint["vector_backend"] = f"{settings.vector_backend}:{settings.faiss_index_type}"
+        return fingerprint
+
+    def load_manifest(self) -> Optional[dict]:
+        """读取清单文件，不存在或损坏时返回 None"""
+        if not self.manifest_path.exists():
+            return None
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ 索引清单损坏，将重建索引: {e}")
+            return None
+
+    def save_manifest(self, manifest: dict):
+        """原子写入清单文件"""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest["updated_at"] = datetime.now().isoformat()
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _new_manifest(self, version: int = 0) -> dict:
+        return {"fingerprint": self.fingerprint(), "version": version, "files": {}}
+
+    def _file_key(self, pdf_file: Path) -> str:
+        """清单中的文件键：相对 PDF 目录的路径"""
+        try:
+            return pdf_file.relative_to(settings.pdf_directory).as_posix()
+        except ValueError:
+            return pdf_file.as_posix()
+
+    # ============ 同步 ============
+
+    def _prepare_manifest(self, stats: IndexStats) -> dict:
+        """加载清单；配置变化或旧版无清单索引时清空集合"""
+        manifest = self.load_manifest()
+
+        if manifest is not None and manifest.get("fingerprint") == self.fingerprint():
+            return manifest
+
+        version = manifest.get("version", 0) if manifest else 0
+        # 清单重建时所有文件都会重新解析，报表数据和关键词索引一并重建
+        self.statement_store.clear()
+        self.keyword_index.clear()
+        has_chunks = bool(self.vectorstore.get(limit=1, include=[])["ids"])
+        if has_chunks:
+            reason = "索引配置已变化" if manifest else "发现无清单的旧索引"
+            logger.info(f"♻️ {reason}，清空向量集合后全量重建")
+            self.vectorstore.reset_collection()
+            stats.rebuilt = True
+
+        return self._new_manifest(version)
+
+    def _apply_file(self, file_key: str, entry: Optional[dict], result: FileLoadResult, stats: IndexStats) -> dict:
+        """写入一个新增或变更文件的解析结果，只嵌入真正变化的文本块"""
+        docs = result.documents
+        chunk_ids, chunk_hashes = assign_chunk_ids(file_key, docs)
+
+        old_ids = set(entry["chunk_ids"]) if entry else set()
+        new_ids = set(chunk_ids)
+
+        # 先写入后删除：写入失败时旧块仍在，清单未更新，下次同步会重试
+        to_add = [(cid, doc) for cid, doc in zip(chunk_ids, docs) if cid not in old_ids]
+        if to_add:
+            self.embedding_stage.write([doc for _, doc in to_add], [cid for cid, _ in to_add])
+            stats.added_chunks += len(to_add)
+
+        stale_ids = sorted(old_ids - new_ids)
+        if stale_ids:
+            self.vectorstore.delete(ids=stale_ids)
+            stats.removed_chunks += len(stale_ids)
+
+        statement_rows = self.statement_store.replace_source(file_key, result.metadata, result.statements)
+        stats.statement_rows += statement_rows
+        stats.keyword_chunks += self.keyword_index.replace_source(file_key, chunk_ids, docs)
+
+        logger.info(
+            f"🧩 {file_key}: {len(docs)} 个文本块，新增 {len(to_add)}，删除 {len(stale_ids)}，"
+            f"报表科目 {statement_rows} 条"
+        )
+        return {
+            "chunk_ids": chunk_ids,
+            "chunk_hashes": chunk_hashes,
+            "statement_rows": statement_rows,
+            "keyword_indexed": True,
+        }
+
+    def _scan(self, files: Dict[str, dict], stats: IndexStats) -> Tuple[Dict[Path, dict], set]:
+        """
+        扫描 PDF 目录，找出需要重新解析的文件
+
+        - 大小和修改时间未变的文件直接跳过（不计算哈希）
+        - 内容哈希未变的文件只更新文件状态
+        - 尚未抽取报表或尚未建立关键词索引的旧清单条目重新解析一次（文本块 ID 不变，不会重复嵌入）
+
+        Returns:
+            (待解析文件 -> 文件状态, 目录中出现的全部文件键)
+        """
+        to_parse: Dict[Path, dict] = {}
+        seen = set()
+
+        for pdf_file in self.loader.list_pdfs():
+            file_key = self._file_key(pdf_file)
+            seen.add(file_key)
+            entry = files.get(file_key)
+
+            try:
+                stat = pdf_file.stat()
+                complete = entry is not None and "statement_rows" in entry and entry.get("keyword_indexed")
+                if complete and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+                    stats.unchanged_files += 1
+                    continue
+
+                file_hash = file_sha256(pdf_file)
+                if complete and entry.get("sha256") == file_hash:
+                    entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                    stats.unchanged_files += 1
+                    continue
+
+                to_parse[pdf_file] = {
+                    "file_key": file_key,
+                    "sha256": file_hash,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                }
+
+            except OSError as e:
+                logger.error(f"❌ 读取失败 {file_key}: {e}")
+                stats.failed_files.append(file_key)
+
+        return to_parse, seen
+
+    def sync(self) -> IndexStats:
+        """
+        将向量数据库与 PDF 目录同步
+
+        - 未变化的文件跳过
+        - 新增或变更的文件由 PDFLoader 并行解析，按完成顺序逐个写入，
+          仅嵌入变化的文本块
+        - 已删除文件的文本块从向量数据库中移除
+
+        同一目录同时只有一个进程写入（跨进程文件锁），后来的进程等待锁释放后
+        再扫描，此时文件已是最新，只做哈希比对。
+
+        Returns:
+            IndexStats
+        """
+        with index_write_lock(self.manifest_path.parent):
+            return self._sync()
+
+    def _sync(self) -> IndexStats:
+        start = time.perf_counter()
+        stats = IndexStats()
+        manifest = self._prepare_manifest(stats)
+        files: Dict[str, dict] = manifest["files"]
+
+        to_parse, seen = self._scan(files, stats)
+
+        for result in self.loader.iter_load(to_parse):
+            file_state = to_parse[result.path]
+            file_key = file_state.pop("file_key")
+            entry = files.get(file_key)
+
+            if result.error:
+                stats.failed_files.append(file_key)
+                continue
+
+            try:
+                new_entry = self._apply_file(file_key, entry, result, stats)
+                new_entry.update(file_state)
+                self._flush_vectorstore()
+                (stats.updated_files if entry else stats.added_files).append(file_key)
+                files[file_key] = new_entry
+
+                # 每个文件处理完立即保存，中断后不会重复嵌入
+                self.save_manifest(manifest)
+
+            except Exception as e:
+                logger.error(f"❌ 索引失败 {file_key}: {e}", exc_info=True)
+                stats.failed_files.append(file_key)
+
+        for file_key in sorted(set(files) - seen):
+            stale_ids = files.pop(file_key)["chunk_ids"]
+            if stale_ids:
+                self.vectorstore.delete(ids=stale_ids)
+            self.statement_store.remove_source(file_key)
+            self.keyword_index.remove_source(file_key)
+            stats.removed_chunks += len(stale_ids)
+            stats.removed_files.append(file_key)
+            logger.info(f"🗑️ {file_key} 已移除，删除 {len(stale_ids)} 个文本块")
+
+        if stats.changed:
+            manifest["version"] = manifest.get("version", 0) + 1
+        self._flush_vectorstore()
+        self.save_manifest(manifest)
+
+        self.embedding_stage.log_summary()
+        stats.total_chunks = sum(len(entry["chunk_ids"]) for entry in files.values())
+        stats.elapsed_seconds = time.perf_counter() - start
+        logger.info(f"✅ {stats.summary()}")
+        return stats
+
+    def _flush_vectorstore(self):
+        """需要显式落盘的向量索引（FAISS）在保存清单前写入磁盘；Chroma 自动持久化"""
+        flush = getattr(self.vectorstore, "flush", None)
+        if flush is not None:
+            flush()
+
+    def current_version(self) -> int:
+        """当前索引版本号（每次内容变化递增）"""
+        return read_index_version(str(self.manifest_path))
+
+
+@contextmanager
+def index_write_lock(directory: Path):
+    """索引目录的跨进程写锁（多个 uvicorn 工作进程同时启动时，同步操作依次进行）"""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / LOCK_FILENAME, "a") as lock_file:
+        if fcntl is None:
+            yield
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info("⏳ 另一个进程正在写入索引，等待完成...")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_index_version(manifest_path: Optional[str] = None) -> int:
+    """
+    只读取清单中的索引版本号，不打开向量数据库
+
+    应用启动时用它确定分析缓存的数据版本，预热完成前的缓存请求也能命中。
+    """
+    path = Path(manifest_path or os.path.join(settings.vector_store_path, MANIFEST_FILENAME))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("version", 0)
+    except (OSError, ValueError):
+        return 0
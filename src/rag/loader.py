@@ -1,35 +1,170 @@
-from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from config.settings import settings
-
-
-class PDFLoader:
-    def __init__(self):
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.chunk_size,
-            chunk_overlap=settings.chunk_overlap,
-        )
-
-    def load_all_pdfs(self):
-        """加载所有 PDF 文件"""
-        documents = []
-        pdf_dir = Path(settings.pdf_directory)
-
-        if not pdf_dir.exists():
-            return documents
-
-        for pdf_file in pdf_dir.glob("**/*.pdf"):
-            try:
-                loader = PyPDFLoader(str(pdf_file))
-                docs = loader.load()
-
-                # 添加元数据
-                for doc in docs:
-                    doc.metadata["company"] = pdf_file.stem.split("_")[0]
-
-                documents.extend(docs)
-            except Exception as e:
-                print(f"加载失败 {pdf_file}: {e}")
-
-        return self.splitter.split_documents(documents)
\ No newline at end of file
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.financials.extractor import StatementRow, extract_statements
+from src.rag.metadata import parse_filing_metadata
+from config.settings import settings
+import logging
+import multiprocessing
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FileLoadResult:
+    """单个 PDF 的解析结果与吞吐量"""
+    path: Path
+    documents: List[Document]
+    pages: int = 0
+    elapsed_seconds: float = 0.0
+    error: Optional[str] = None
+    metadata: dict = field(default_factory=dict)
+    statements: List[StatementRow] = field(default_factory=list)
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return len(self.documents) / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def _load_and_split(pdf_path: str, chunk_size: int, chunk_overlap: int) -> FileLoadResult:
+    """
+    解析并分割单个 PDF（可在子进程中执行）
+
+    参数全部显式传入，不依赖子进程中的全局状态。
+    """
+    pdf_file = Path(pdf_path)
+    start = time.perf_counter()
+    try:
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            add_start_index=True,  # 记录块在页面中的偏移量，组装上下文时据此去掉重叠部分
+        )
+        documents = []
+        statements = []
+        page_count = 0
+        filing_metadata = None
+
+        # 逐页解析、逐页分割，不在内存中保留整份财报的页面
+        for page in PyPDFLoader(pdf_path).lazy_load():
+            # 添加元数据：股票代码、财年、报告类型（首页文本用于兜底识别）
+            if filing_metadata is None:
+                filing_metadata = parse_filing_metadata(pdf_file, page.page_content)
+            page.metadata.update(filing_metadata)
+            # 报表页抽取为结构化科目（非报表页只检查前几行标题，开销很小）
+            statements.extend(extract_statements(page.page_content, page.metadata.get("page", page_count)))
+            documents.extend(splitter.split_documents([page]))
+            page_count += 1
+
+        return FileLoadResult(
+            pdf_file, documents, page_count, time.perf_counter() - start,
+            metadata=filing_metadata or {}, statements=statements
+        )
+
+    except Exception as e:
+        return FileLoadResult(pdf_file, [], 0, time.perf_counter() - start, error=str(e))
+
+
+class PDFLoader:
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Args:
+            workers: 解析进程数，None 时使用 settings.ingest_workers（0 表示 CPU 核数）
+        """
+        workers = settings.ingest_workers if workers is None else workers
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+
+    def list_pdfs(self) -> List[Path]:
+        """列出 PDF 目录下的所有 PDF 文件（按路径排序）"""
+        pdf_dir = Path(settings.pdf_directory)
+
+        if not pdf_dir.exists():
+            return []
+
+        return sorted(pdf_dir.glob("**/*.pdf"))
+
+    def load_pdf(self, pdf_file: Path) -> List[Document]:
+        """加载单个 PDF 文件并分割成文本块"""
+        result = _load_and_split(str(pdf_file), settings.chunk_size, settings.chunk_overlap)
+        if result.error:
+            raise RuntimeError(result.error)
+        return result.documents
+
+    def iter_load(self, pdf_files: Iterable[Path]) -> Iterator[FileLoadResult]:
+        """
+        并行解析多个 PDF，按完成顺序逐个产出结果
+
+        使用进程池绕开 GIL；同时在途的文件数限制为进程数的 2 倍，
+        下游（embedding）处理较慢时不会把所有文件的文本块堆积在内存里。
+        """
+        pdf_files = list(pdf_files)
+        if not pdf_files:
+            return
+
+        workers = min(self.workers, len(pdf_files))
+        if workers <= 1:
+            for pdf_file in pdf_files:
+                yield self._log_result(
+                    _load_and_split(str(pdf_file), settings.chunk_size, settings.chunk_overlap)
+                )
+            return
+
+        logger.info(f"⚙️ 使用 {workers} 个进程并行解析 {len(pdf_files)} 个 PDF")
+        pending_files = iter(pdf_files)
+        # spawn 避免 fork 已加载 embedding 模型（及其线程池）的父进程
+        context = multiprocessing.get_context("spawn")
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            in_flight = set()
+
+            def _submit_next() -> bool:
+                pdf_file = next(pending_files, None)
+                if pdf_file is None:
+                    return False
+                in_flight.add(executor.submit(
+                    _load_and_split, str(pdf_file), settings.chunk_size, settings.chunk_overlap
+                ))
+                return True
+
+            for _ in range(workers * 2):
+                if not _submit_next():
+                    break
+
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _submit_next()
+                    yield self._log_result(future.result())
+
+    @staticmethod
+    def _log_result(result: FileLoadResult) -> FileLoadResult:
+        """记录单个文件的解析吞吐量"""
+        if result.error:
+            logger.error(f"❌ 加载失败 {result.path}: {result.error}")
+        else:
+            logger.info(
+                f"📄 {result.path.name}: {result.pages} 页 → {len(result.documents)} 块，"
+                f"{len(result.statements)} 条报表科目，"
+                f"{result.elapsed_seconds:.2f}s（{result.pages_per_second:.1f} 页/s，"
+                f"{result.chunks_per_second:.1f} 块/s）"
+            )
+        return result
+
+    def load_all_pdfs(self):
+        """加载所有 PDF 文件"""
+        documents = []
+
+        for result in self.iter_load(self.list_pdfs()):
+            documents.extend(result.documents)
+
+        return documents
@@ -0,0 +1,138 @@
+"""
+财报元数据
+在入库时从文件名（必要时从首页文本）提取股票代码、财年和报告类型，
+检索时把过滤条件下推到 Chroma 的 where 子句。
+"""
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+import re
+
+# 文件名示例：AAPL-2025-10K-251437791.pdf、MSFT_2024_10-Q.pdf、TSLA 2023 annual report.pdf
+_TOKEN_SPLIT = re.compile(r"[-_\s]+")
+_FORM_WITH_DASH = re.compile(r"(?<![A-Za-z0-9])(10|20|40|8)-([KQF])(?![A-Za-z0-9])", re.IGNORECASE)
+_TICKER = re.compile(r"^[A-Z][A-Z0-9.]{0,5}$")
+_YEAR = re.compile(r"^(?:FY)?((?:19|20)\d{2})$", re.IGNORECASE)
+
+FILING_TYPES = {
+    "10K": "10-K",
+    "10Q": "10-Q",
+    "20F": "20-F",
+    "40F": "40-F",
+    "8K": "8-K",
+    "ANNUAL": "ANNUAL",
+}
+
+# 可下推到 SQLite 存储（关键词索引 / FAISS 文档库）的元数据字段
+FILTER_COLUMNS = ("ticker", "fiscal_year", "filing_type")
+
+# 首页文本兜底
+_TEXT_FORM = re.compile(r"\bFORM\s+(10-K|10-Q|20-F|40-F|8-K)\b", re.IGNORECASE)
+_TEXT_FISCAL_YEAR = re.compile(
+    r"fiscal\s+year\s+ended\s+[A-Za-z]+\s+\d{1,2},\s+((?:19|20)\d{2})", re.IGNORECASE
+)
+
+
+def normalize_ticker(ticker: Optional[str]) -> Optional[str]:
+    """统一股票代码格式（去空白、大写）"""
+    if not ticker:
+        return None
+    ticker = ticker.strip().upper()
+    return ticker or None
+
+
+def parse_filing_metadata(pdf_file: Path, first_page_text: str = "") -> dict:
+    """
+    从文件名提取财报元数据
+
+    Args:
+        pdf_file: PDF 路径
+        first_page_text: 首页文本，文件名中缺少财年或报告类型时用于兜底
+
+    Returns:
+        包含 ticker / company / fiscal_year / filing_type 的字典，
+        无法识别的字段不出现（Chroma 元数据不接受 None）
+    """
+    stem = _FORM_WITH_DASH.sub(r"\1\2", pdf_file.stem)
+    tokens = [t for t in _TOKEN_SPLIT.split(stem) if t]
+    metadata = {}
+
+    if tokens and _TICKER.match(tokens[0].upper()) and not _YEAR.match(tokens[0]):
+        metadata["ticker"] = tokens[0].upper()
+
+    for token in tokens[1:]:
+        year_match = _YEAR.match(token)
+        if year_match and "fiscal_year" not in metadata:
+            metadata["fiscal_year"] = int(year_match.group(1))
+            continue
+
+        filing_type = FILING_TYPES.get(token.upper())
+        if filing_type and "filing_type" not in metadata:
+            metadata["filing_type"] = filing_type
+
+    if first_page_text:
+        if "filing_type" not in metadata:
+            form_match = _TEXT_FORM.search(first_page_text)
+            if form_match:
+                metadata["filing_type"] = form_match.group(1).upper()
+
+        if "fiscal_year" not in metadata:
+            year_match = _TEXT_FISCAL_YEAR.search(first_page_text)
+            if year_match:
+                metadata["fiscal_year"] = int(year_match.group(1))
+
+    # 兼容旧字段：company 与 ticker 一致
+    metadata["company"] = metadata.get("ticker", pdf_file.stem.split("_")[0])
+    return metadata
+
+
+def build_metadata_filter(
+        ticker: Optional[str] = None,
+        fiscal_year: Optional[int] = None,
+        filing_type: Optional[str] = None
+) -> Optional[dict]:
+    """
+    构建 Chroma where 过滤条件
+
+    Returns:
+        单个条件时直接返回该条件，多个条件时用 $and 组合，没有条件时返回 None
+    """
+    conditions = []
+
+    ticker = normalize_ticker(ticker)
+    if ticker:
+        conditions.append({"ticker": ticker})
+    if fiscal_year:
+        conditions.append({"fiscal_year": int(fiscal_year)})
+    if filing_type:
+        normalized = FILING_TYPES.get(filing_type.replace("-", "").upper(), filing_type.upper())
+        conditions.append({"filing_type": normalized})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def where_to_sql(where: Optional[dict], prefix: str = "") -> Tuple[str, List]:
+    """
+    把 build_metadata_filter 生成的 where 条件翻译成 SQL 条件
+
+    Args:
+        where: 单个条件或 $and 组合
+        prefix: 列名前缀（如表别名 "c."）
+
+    Returns:
+        (SQL 条件, 参数)，没有条件时为 ("", [])
+    """
+    if not where:
+        return "", []
+    clauses, params = [], []
+    for condition in where.get("$and", [where]):
+        for column, value in condition.items():
+            if column not in FILTER_COLUMNS:
+                raise ValueError(f"不支持的过滤字段: {column}")
+            clauses.append(f"{prefix}{column} = ?")
+            params.append(value)
+    return " AND ".join(clauses), params
@@ -1,110 +1,346 @@
-"""
-RAG 检索系统
-使用 HuggingFace embeddings（免费、本地运行）
-"""
-
-from langchain_chroma import Chroma  # ✅ 更新导入
-from langchain_huggingface import HuggingFaceEmbeddings # ✅ 使用免费的
-from src.rag.loader import PDFLoader
-from config.settings import settings
-import logging
-import os
-
-logger = logging.getLogger(__name__)
-
-
-class RAGSystem:
-    def __init__(self):
-        """初始化 RAG 系统"""
-        logger.info("🔧 初始化 RAG 系统...")
-
-        # ✅ 使用 HuggingFace 免费 embeddings（本地运行，不需要 API）
-        logger.info("📦 加载 HuggingFace embeddings 模型...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",  # 轻量级、高质量
-            model_kwargs={'device': 'cpu'},  # CPU 运行
-            encode_kwargs={'normalize_embeddings': True}  # 标准化向量
-        )
-        logger.info("✅ Embeddings 模型加载成功")
-
-        self.vectorstore = None
-        self.retriever = None
-
-    def initialize(self):
-        """初始化向量数据库"""
-        try:
-            logger.info("📚 开始加载 PDF 文档...")
-
-            loader = PDFLoader()
-            documents = loader.load_all_pdfs()
-
-            if documents:
-                logger.info(f"📄 成功加载 {len(documents)} 个文档块")
-                logger.info("🔄 正在生成向量嵌入...")
-
-                # 创建向量数据库
-                self.vectorstore = Chroma.from_documents(
-                    documents,
-                    self.embeddings,
-                    persist_directory=settings.vector_store_path
-                )
-
-                # 创建检索器
-                self.retriever = self.vectorstore.as_retriever(
-                    search_kwargs={"k": 5}
-                )
-
-                logger.info("✅ 向量数据库创建成功")
-                return f"已加载 {len(documents)} 个文档块"
-            else:
-                logger.warning("⚠️ 没有找到 PDF 文件")
-                return "没有可用的 PDF 文件"
-
-        except Exception as e:
-            logger.error(f"❌ RAG 初始化失败: {e}", exc_info=True)
-            return f"初始化失败: {str(e)}"
-
-    def retrieve(self, query: str) -> str:
-        """检索相关财报"""
-        try:
-            # 如果检索器未初始化，尝试从持久化存储加载
-            if not self.retriever:
-                logger.info("🔄 从持久化存储加载向量数据库...")
-
-                if os.path.exists(settings.vector_store_path):
-                    self.vectorstore = Chroma(
-                        embedding_function=self.embeddings,
-                        persist_directory=settings.vector_store_path
-                    )
-                    self.retriever = self.vectorstore.as_retriever(
-                        search_kwargs={"k": 5}
-                    )
-                    logger.info("✅ 向量数据库加载成功")
-                else:
-                    logger.warning("⚠️ 向量数据库不存在，请先初始化")
-                    return ""
-
-            # 执行检索
-            logger.info(f"🔍 检索查询: {query}")
-            docs = self.retriever.invoke(query)
-
-            if not docs:
-                logger.info("📭 未找到相关文档")
-                return ""
-
-            # 构建上下文
-            context = ""
-            for i, doc in enumerate(docs, 1):
-                company = doc.metadata.get("company", "Unknown")
-                context += f"\n=== 文档 {i} [{company}] ===\n{doc.page_content}\n"
-
-            logger.info(f"✅ 检索到 {len(docs)} 个相关文档")
-            return context
-
-        except Exception as e:
-            logger.error(f"❌ 检索失败: {e}", exc_info=True)
-            return ""
-
-
-# 创建全局实例
-rag_system = RAGSystem()
\ No newline at end of file
+"""
+RAG 检索系统
+使用 HuggingFace embeddings（免费、本地运行）
+
+embedding 模型和向量数据库在第一次使用时才加载（应用启动时由后台预热触发），
+导入本模块不会加载模型。
+"""
+
+from langchain_core.documents import Document
+from src.rag.bm25 import BM25Index, CrossEncoderReranker, reciprocal_rank_fusion
+from src.rag.context import PackedContext, pack_context
+from src.rag.indexer import IncrementalIndexer, read_index_version
+from src.rag.metadata import build_metadata_filter
+from src.core.cache import TTLCache
+from src.core.tracing import Span, span
+from threading import Lock, RLock
+from typing import List, Optional
+from config.settings import settings
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询：去首尾空白、合并连续空白、转小写"""
+    return " ".join(query.split()).lower()
+
+
+class RAGSystem:
+    def __init__(self):
+        """初始化 RAG 系统"""
+        self._embeddings = None  # 第一次使用时加载，见 embeddings 属性
+        self._load_lock = RLock()  # 模型加载与向量数据库打开只进行一次
+
+        self.vectorstore = None
+        self.keyword_index = None  # BM25 关键词索引，与向量数据库同目录
+        self._reranker = None
+        self._reranker_failed = False
+        # 索引内容每次变化递增；启动时直接读清单，不必等待向量数据库打开
+        self.index_version = read_index_version()
+
+        # 查询向量缓存与检索结果缓存（结果缓存键包含索引版本，索引变化后自动失效）
+        self._embedding_cache = TTLCache(settings.rag_embedding_cache_size, settings.rag_cache_ttl)
+        self._result_cache = TTLCache(settings.rag_result_cache_size, settings.rag_cache_ttl)
+
+        # 上下文组装的累计 token 统计（只统计未命中缓存的检索）
+        self._context_lock = Lock()
+        self._context_stats = {"calls": 0, "chunks": 0, "segments": 0, "raw_tokens": 0, "tokens": 0, "truncated": 0}
+
+    @property
+    def embeddings(self):
+        """HuggingFace embeddings 模型（懒加载，并发调用时只加载一次）"""
+        if self._embeddings is None:
+            with self._load_lock:
+                if self._embeddings is None:
+                    # sentence-transformers 导入和模型加载需要数秒，推迟到第一次使用时
+                    from langchain_huggingface import HuggingFaceEmbeddings
+
+                    # ✅ 使用 HuggingFace 免费 embeddings（本地运行，不需要 API）
+                    logger.info("📦 加载 HuggingFace embeddings 模型...")
+                    self._embeddings = HuggingFaceEmbeddings(
+                        model_name=settings.embedding_model_name,  # 默认 all-MiniLM-L6-v2：轻量级、高质量
+                        model_kwargs={'device': 'cpu'},  # CPU 运行
+                        encode_kwargs={'normalize_embeddings': True}  # 标准化向量
+                    )
+                    logger.info("✅ Embeddings 模型加载成功")
+        return self._embeddings
+
+    @property
+    def embeddings_loaded(self) -> bool:
+        """embedding 模型是否已加载（未加载时调用 embed_query 会阻塞到加载完成）"""
+        return self._embeddings is not None
+
+    def load_embeddings(self):
+        """预加载 embedding 模型（应用启动后由后台预热调用）"""
+        return self.embeddings
+
+    def _open_vectorstore(self):
+        """打开（或创建）持久化的向量数据库（按 VECTOR_BACKEND 选择 Chroma 或 FAISS）"""
+        if self.vectorstore is not None:
+            return self.vectorstore
+        with self._load_lock:
+            if self.vectorstore is not None:
+                return self.vectorstore
+            if settings.vector_backend == "faiss":
+                from src.rag.faiss_store import FaissVectorStore
+                self.vectorstore = FaissVectorStore(
+                    self.embeddings,
+                    persist_directory=settings.vector_store_path,
+                    index_type=settings.faiss_index_type
+                )
+                logger.info(f"🗂️ 使用 FAISS 向量索引（{settings.faiss_index_type}，内存映射）")
+            else:
+                from langchain_chroma import Chroma
+
+                self.vectorstore = Chroma(
+                    embedding_function=self.embeddings,
+                    persist_directory=settings.vector_store_path
+                )
+            self.keyword_index = BM25Index()
+        return self.vectorstore
+
+    def load(self) -> bool:
+        """
+        打开已有的持久化向量数据库（不同步 PDF）
+
+        Returns:
+            向量数据库是否可用
+        """
+        if self.vectorstore is not None:
+            return True
+        if not os.path.exists(settings.vector_store_path):
+            logger.warning("⚠️ 向量数据库不存在，请先初始化")
+            return False
+
+        logger.info("🔄 从持久化存储加载向量数据库...")
+        self._open_vectorstore()
+        self.index_version = read_index_version()
+        logger.info("✅ 向量数据库加载成功")
+        return True
+
+    def initialize(self):
+        """增量同步向量数据库（只嵌入新增或变更的 PDF）"""
+        try:
+            logger.info("📚 开始同步 PDF 文档索引...")
+
+            indexer = IncrementalIndexer(self._open_vectorstore(), keyword_index=self.keyword_index)
+            stats = indexer.sync()
+            self.index_version = indexer.current_version()
+            if stats.changed:
+                self._result_cache.clear()
+
+            if stats.total_chunks:
+                logger.info(f"📄 索引共 {stats.total_chunks} 个文档块（版本 {self.index_version}）")
+                return stats.summary()
+            else:
+                logger.warning("⚠️ 没有找到 PDF 文件")
+                return "没有可用的 PDF 文件"
+
+        except Exception as e:
+            logger.error(f"❌ RAG 初始化失败: {e}", exc_info=True)
+            return f"初始化失败: {str(e)}"
+
+    def retrieve(
+            self,
+            query: str,
+            ticker: Optional[str] = None,
+            fiscal_year: Optional[int] = None,
+            filing_type: Optional[str] = None,
+            k: int = 5
+    ) -> str:
+        """
+        检索相关财报
+
+        Args:
+            query: 检索问题
+            ticker: 股票代码，只在该公司的文本块中检索
+            fiscal_year: 财年过滤
+            filing_type: 报告类型过滤（10-K / 10-Q 等）
+            k: 返回的文本块数量
+
+        Returns:
+            拼接好的上下文字符串，未找到时返回空字符串
+        """
+        with span("rag.retrieve", "retrieval", **{"rag.k": k, "rag.ticker": ticker}) as retrieve_span:
+            return self._retrieve(query, ticker, fiscal_year, filing_type, k, retrieve_span)
+
+    def _retrieve(
+            self,
+            query: str,
+            ticker: Optional[str],
+            fiscal_year: Optional[int],
+            filing_type: Optional[str],
+            k: int,
+            retrieve_span: Span
+    ) -> str:
+        try:
+            # 如果检索器未初始化，尝试从持久化存储加载
+            if self.vectorstore is None and not self.load():
+                return ""
+
+            where = build_metadata_filter(ticker, fiscal_year, filing_type)
+            normalized_query = normalize_query(query)
+            result_key = (
+                normalized_query,
+                json.dumps(where, sort_keys=True),
+                k,
+                self.index_version
+            )
+
+            cached = self._result_cache.get(result_key)
+            retrieve_span.set_attribute("rag.cache_hit", cached is not None)
+            if cached is not None:
+                logger.info(f"⚡ 检索缓存命中: {query}")
+                return cached
+
+            # 执行检索：过滤条件同时下推到 Chroma where 子句和关键词索引
+            logger.info(f"🔍 检索查询: {query}，过滤条件: {where}")
+            docs = self._search(normalized_query, where, k)
+
+            if not docs:
+                logger.info("📭 未找到相关文档")
+                self._result_cache.set(result_key, "")
+                return ""
+
+            # 组装上下文：去掉重叠、合并同页文本块、装入 token 预算
+            with span("rag.pack", "retrieval"):
+                packed = pack_context(docs, settings.rag_context_token_budget)
+            self._record_context(packed)
+            retrieve_span.set_attributes(**{"rag.docs": len(docs), "rag.tokens": packed.tokens})
+            logger.info(
+                f"✅ 检索到 {len(docs)} 个相关文档 → {packed.segments} 个片段，"
+                f"{packed.tokens} tokens（直接拼接 {packed.raw_tokens}）"
+                f"{'，已按预算截断' if packed.truncated else ''}"
+            )
+            self._result_cache.set(result_key, packed.text)
+            return packed.text
+
+        except Exception as e:
+            logger.error(f"❌ 检索失败: {e}", exc_info=True)
+            return ""
+
+    def _search(self, normalized_query: str, where: Optional[dict], k: int) -> List[Document]:
+        """
+        混合检索：向量检索与 BM25 各召回候选，RRF 融合，可选交叉编码器重排
+
+        未启用混合检索和重排时等价于原来的纯向量检索。
+        """
+        query_vector = self.embed_query(normalized_query)
+        reranker = self._get_reranker()
+        if not settings.rag_hybrid_enabled and reranker is None:
+            with span("rag.search", "retrieval", **{"rag.hybrid": False}):
+                return self.vectorstore.similarity_search_by_vector(query_vector, k=k, filter=where)
+
+        with span("rag.search", "retrieval", **{"rag.hybrid": settings.rag_hybrid_enabled}):
+            candidates = self._hybrid_candidates(normalized_query, query_vector, where, k)
+
+        if reranker is not None:
+            with span("rag.rerank", "retrieval"):
+                return reranker.rerank(normalized_query, candidates, k)
+        return candidates[:k]
+
+    def _hybrid_candidates(
+            self,
+            normalized_query: str,
+            query_vector: List[float],
+            where: Optional[dict],
+            k: int
+    ) -> List[Document]:
+        """向量检索候选，启用混合检索时与 BM25 候选做 RRF 融合"""
+        candidate_k = max(k, settings.rag_candidate_k)
+        dense = self.vectorstore.similarity_search_by_vector(query_vector, k=candidate_k, filter=where)
+        docs_by_id = {doc.id: doc for doc in dense}
+
+        if settings.rag_hybrid_enabled:
+            keyword = self.keyword_index.search(normalized_query, where, limit=candidate_k)
+            fused = reciprocal_rank_fusion(
+                [[doc.id for doc in dense], [chunk_id for chunk_id, _ in keyword]],
+                k=settings.rag_rrf_k
+            )[:candidate_k]
+
+            # 只由关键词召回的文本块从向量数据库按 ID 取回原文
+            missing = [chunk_id for chunk_id in fused if chunk_id not in docs_by_id]
+            if missing:
+                fetched = self.vectorstore.get(ids=missing, include=["documents", "metadatas"])
+                for chunk_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                    docs_by_id[chunk_id] = Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+            return [docs_by_id[chunk_id] for chunk_id in fused if chunk_id in docs_by_id]
+        return dense
+
+    def _get_reranker(self) -> Optional[CrossEncoderReranker]:
+        """按配置懒加载重排模型；加载失败时记录日志并退回不重排"""
+        if not settings.rag_reranker_model or self._reranker_failed:
+            return None
+        if self._reranker is None:
+            try:
+                logger.info(f"📦 加载重排模型 {settings.rag_reranker_model}...")
+                self._reranker = CrossEncoderReranker(settings.rag_reranker_model)
+            except Exception as e:
+                logger.warning(f"⚠️ 重排模型加载失败，跳过重排: {e}")
+                self._reranker_failed = True
+                return None
+        return self._reranker
+
+    def embed_query(self, query: str) -> List[float]:
+        """生成规范化查询的向量（带缓存）"""
+        normalized_query = normalize_query(query)
+        key = (settings.embedding_model_name, normalized_query)
+        with span("rag.embed", "retrieval") as embed_span:
+            vector = self._embedding_cache.get(key)
+            embed_span.set_attribute("rag.embedding_cached", vector is not None)
+            if vector is None:
+                vector = self.embeddings.embed_query(normalized_query)
+                self._embedding_cache.set(key, vector)
+        return vector
+
+    def _record_context(self, packed: PackedContext):
+        with self._context_lock:
+            stats = self._context_stats
+            stats["calls"] += 1
+            stats["chunks"] += packed.chunks
+            stats["segments"] += packed.segments
+            stats["raw_tokens"] += packed.raw_tokens
+            stats["tokens"] += packed.tokens
+            stats["truncated"] += int(packed.truncated)
+
+    def context_stats(self) -> dict:
+        """上下文组装的 token 统计"""
+        with self._context_lock:
+            stats = dict(self._context_stats)
+        calls = stats["calls"]
+        stats["avg_tokens"] = round(stats["tokens"] / calls, 1) if calls else 0.0
+        stats["avg_raw_tokens"] = round(stats["raw_tokens"] / calls, 1) if calls else 0.0
+        stats["token_reduction"] = round(1 - stats["tokens"] / stats["raw_tokens"], 4) if stats["raw_tokens"] else 0.0
+        stats["token_budget"] = settings.rag_context_token_budget
+        return stats
+
+    def cache_stats(self) -> dict:
+        """缓存命中率等指标"""
+        return {
+            "index_version": self.index_version,
+            "vector_backend": settings.vector_backend,
+            "embedding_cache": self._embedding_cache.stats(),
+            "result_cache": self._result_cache.stats(),
+            "context": self.context_stats(),
+        }
+
+    def clear_cache(self):
+        """清空查询向量和检索结果缓存"""
+        self._embedding_cache.clear()
+        self._result_cache.clear()
+
+
+def create_rag_system():
+    """配置了共享检索服务时返回服务客户端，否则在本进程加载"""
+    if settings.rag_service_url:
+        from src.rag.client import RAGServiceClient
+        logger.info(f"🔗 使用共享检索服务 {settings.rag_service_url}")
+        return RAGServiceClient(settings.rag_service_url, timeout=settings.rag_service_timeout)
+    return RAGSystem()
+
+
+# 创建全局实例
+rag_system = create_rag_system()
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+共享检索服务
+多个 uvicorn 工作进程各自加载 embedding 模型和向量索引时，内存随工作进程数成倍增长，
+启动时还会同时同步同一个索引目录。检索服务把它们集中到一个进程：
+
+- embedding 模型和向量索引只加载一份，内存只随索引数量增长
+- 服务进程是索引的唯一写入者（同步仍持有跨进程写锁，误启动多个实例时也不会并发写入）
+- FAISS 后端以内存映射方式读取索引，不复制到进程堆内存
+
+启动（只能单进程运行）：
+    python -m src.rag.service                      # 监听 RAG_SERVICE_URL，默认 http://127.0.0.1:8100
+    RAG_SERVICE_URL=unix:///tmp/rag.sock python -m src.rag.service
+
+应用进程设置相同的 RAG_SERVICE_URL 后，通过 RAGServiceClient 调用本服务。
+"""
+
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from urllib.parse import urlparse
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+from src.core.executors import run_in_rag_executor, shutdown_executors
+from src.core.startup import get_startup_tracker
+from src.core.metrics import get_metrics_registry
+from src.core.tracing import TracingMiddleware, configure_tracing
+from src.rag.retriever import RAGSystem
+from config.settings import settings
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVICE_URL = "http://127.0.0.1:8100"
+
+# 服务进程始终在本地加载（不受 RAG_SERVICE_URL 影响）
+rag = RAGSystem()
+
+# 与应用进程区分 service.name；应用进程通过 traceparent 请求头把检索 span 挂到同一个 trace 下
+tracer = configure_tracing(f"{settings.tracing_service_name}-rag")
+
+
+# ============ 请求模型 ============
+
+class EmbedRequest(BaseModel):
+    text: str
+
+
+class RetrieveRequest(BaseModel):
+    query: str
+    ticker: Optional[str] = None
+    fiscal_year: Optional[int] = None
+    filing_type: Optional[str] = None
+    k: int = 5
+
+
+# ============ 启动预热 ============
+
+async def _warm_up():
+    """加载 embedding 模型，同步（或打开）索引"""
+    startup = get_startup_tracker()
+    try:
+        with startup.phase("embedding_model"):
+            await run_in_rag_executor(rag.load_embeddings)
+        if settings.rag_sync_on_startup:
+            with startup.phase("index_sync"):
+                message = await run_in_rag_executor(rag.initialize)
+            logger.info(f"✅ {message}")
+        else:
+            with startup.phase("index_open"):
+                await run_in_rag_executor(rag.load)
+        startup.mark_ready()
+        logger.info(f"✅ 检索服务就绪（{startup.ready_seconds:.2f}s）")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        startup.mark_failed(str(e))
+        logger.error(f"❌ 检索服务预热失败: {e}", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up_task = asyncio.create_task(_warm_up())
+    get_startup_tracker().mark_serving()
+    yield
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+    shutdown_executors()
+    tracer.shutdown()
+
+
+app = FastAPI(title="共享检索服务", lifespan=lifespan)
+app.add_middleware(TracingMiddleware)
+
+
+# ============ 接口 ============
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """预热完成前返回 503"""
+    startup = get_startup_tracker().snapshot()
+    return JSONResponse(status_code=200 if startup["ready"] else 503, content=startup)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 指标"""
+    return PlainTextResponse(get_metrics_registry().render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/embed")
+async def embed(request: EmbedRequest) -> dict:
+    vector: List[float] = await run_in_rag_executor(rag.embed_query, request.text)
+    return {"vector": vector}
+
+
+@app.post("/retrieve")
+async def retrieve(request: RetrieveRequest) -> dict:
+    context = await run_in_rag_executor(
+        rag.retrieve,
+        request.query,
+        ticker=request.ticker,
+        fiscal_year=request.fiscal_year,
+        filing_type=request.filing_type,
+        k=request.k
+    )
+    return {"context": context}
+
+
+@app.post("/initialize")
+async def initialize() -> dict:
+    return {"message": await run_in_rag_executor(rag.initialize)}
+
+
+@app.get("/stats")
+async def stats() -> dict:
+    return rag.cache_stats()
+
+
+@app.post("/cache/clear")
+async def clear_cache() -> dict:
+    rag.clear_cache()
+    return {"status": "ok"}
+
+
+# ============ 启动命令 ============
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    url = settings.rag_service_url or DEFAULT_SERVICE_URL
+    # 模型和索引只在一个进程中加载，不支持多工作进程
+    if url.startswith("unix://"):
+        uvicorn.run(app, uds=url[len("unix://"):], log_level="info")
+    else:
+        parsed = urlparse(url)
+        uvicorn.run(app, host=parsed.hostname or "127.0.0.1", port=parsed.port or 8100, log_level="info")
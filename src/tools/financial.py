@@ -1,14 +1,75 @@
-from langchain.tools import tool
-from src.rag.retriever import rag_system
-
-@tool
-def analyze_financial_statements(stock_ticker: str, query: str) -> str:
-    """分析公司财务报表"""
-    context = rag_system.retrieve(f"{stock_ticker} {query}")
-    return f"财务分析\n{stock_ticker}\n问题: {query}\n\n相关数据:\n{context}"
-
-@tool
-def extract_key_metrics(stock_ticker: str, metric_type: str) -> str:
-    """提取关键财务指标"""
-    context = rag_system.retrieve(f"{stock_ticker} {metric_type}")
-    return f"关键指标\n{stock_ticker} {metric_type}\n\n数据:\n{context}"
\ No newline at end of file
+from typing import Optional
+from langchain_core.tools import StructuredTool
+from src.core.executors import run_in_rag_executor
+from src.financials.metrics import METRICS, compute_metrics, format_metric, match_metrics
+from src.financials.store import get_financial_store
+from src.rag.retriever import rag_system
+
+
+def _analyze_financial_statements(stock_ticker: str, query: str) -> str:
+    """分析公司财务报表"""
+    context = rag_system.retrieve(query, ticker=stock_ticker)
+    if not context:
+        context = f"未找到 {stock_ticker} 的相关财报内容"
+    return f"财务分析\n{stock_ticker}\n问题: {query}\n\n相关数据:\n{context}"
+
+
+async def _aanalyze_financial_statements(stock_ticker: str, query: str) -> str:
+    """分析公司财务报表（异步，检索在 RAG 线程池中执行）"""
+    return await run_in_rag_executor(_analyze_financial_statements, stock_ticker, query)
+
+
+def _lookup_key_metrics(stock_ticker: str, metric_type: str) -> Optional[str]:
+    """从结构化报表数据直接计算指标；无法识别指标或没有数据时返回 None"""
+    metrics = match_metrics(metric_type)
+    if not metrics:
+        return None
+
+    rows = compute_metrics(get_financial_store(), stock_ticker, metrics)
+    if not rows:
+        return None
+
+    lines = [f"关键指标（财报结构化数据）\n{stock_ticker} {metric_type}\n"]
+    for name in metrics:
+        values = [
+            f"FY{fiscal_year}（截至 {period_end}）{format_metric(name, row[name])}"
+            for period_end, fiscal_year, row in rows if row[name] is not None
+        ]
+        if values:
+            lines.append(f"{METRICS[name].label}: " + "；".join(values))
+    return "\n".join(lines) if len(lines) > 1 else None
+
+
+def _extract_key_metrics(stock_ticker: str, metric_type: str) -> str:
+    """提取关键财务指标：优先查询结构化报表数据，查不到时回退到向量检索"""
+    direct = _lookup_key_metrics(stock_ticker, metric_type)
+    if direct:
+        return direct
+
+    context = rag_system.retrieve(metric_type, ticker=stock_ticker)
+    if not context:
+        context = f"未找到 {stock_ticker} 的相关财报内容"
+    return f"关键指标\n{stock_ticker} {metric_type}\n\n数据:\n{context}"
+
+
+async def _aextract_key_metrics(stock_ticker: str, metric_type: str) -> str:
+    """提取关键财务指标（异步，检索在 RAG 线程池中执行）"""
+    return await run_in_rag_executor(_extract_key_metrics, stock_ticker, metric_type)
+
+
+analyze_financial_statements = StructuredTool.from_function(
+    func=_analyze_financial_statements,
+    coroutine=_aanalyze_financial_statements,
+    name="analyze_financial_statements",
+    description="分析公司财务报表",
+)
+
+extract_key_metrics = StructuredTool.from_function(
+    func=_extract_key_metrics,
+    coroutine=_aextract_key_metrics,
+    name="extract_key_metrics",
+    description=(
+        "提取关键财务指标，如营收、净利润、毛利率、营业利润率、净利率、ROE、ROA、EPS、"
+        "自由现金流、流动比率、负债权益比、资产负债率；metric_type 可写多个指标或“关键指标”"
+    ),
+)
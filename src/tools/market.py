@@ -1,12 +1,56 @@
-from langchain.tools import tool
-
-@tool
-def get_current_stock_price(stock_ticker: str) -> str:
-    """获取股票当前价格"""
-    # 实际应调用 API，这里只是示例
-    return f"{stock_ticker} 当前价格: $150.50"
-
-@tool
-def get_market_sentiment(stock_ticker: str) -> str:
-    """获取市场情绪"""
-    return f"{stock_ticker} 市场情绪: 看涨"
\ No newline at end of file
+from langchain.tools import tool
+from src.market.store import get_market_store
+import numpy as np
+
+# 情绪判断使用的回看窗口（交易日）
+MOMENTUM_WINDOW = 20
+TREND_WINDOW = 50
+
+
+@tool
+def get_current_stock_price(stock_ticker: str) -> str:
+    """获取股票当前价格"""
+    quote = get_market_store().get_quote(stock_ticker)
+    if quote is None:
+        return f"暂无 {stock_ticker} 的行情数据"
+
+    change = f"，涨跌幅 {quote.change_pct:+.2f}%" if quote.change_pct is not None else ""
+    return (
+        f"{quote.ticker} 当前价格: ${quote.close:.2f}（{quote.date} 收盘{change}）\n"
+        f"开盘 ${quote.open:.2f}，最高 ${quote.high:.2f}，最低 ${quote.low:.2f}，成交量 {quote.volume:,.0f}"
+    )
+
+
+@tool
+def get_market_sentiment(stock_ticker: str) -> str:
+    """获取市场情绪"""
+    history = get_market_store().get_history(stock_ticker)
+    if history is None or len(history) < 2:
+        return f"暂无 {stock_ticker} 的行情数据，无法判断市场情绪"
+
+    # 只切片最近一段，内存映射数组不会被整体读入
+    close = np.asarray(history.close[-TREND_WINDOW:])
+    last = close[-1]
+    momentum_base = close[-min(MOMENTUM_WINDOW + 1, len(close))]
+    momentum = (last / momentum_base - 1) * 100
+    trend = close.mean()
+
+    if momentum > 0 and last > trend:
+        sentiment = "看涨"
+    elif momentum < 0 and last < trend:
+        sentiment = "看跌"
+    else:
+        sentiment = "中性"
+
+    return (
+        f"{stock_ticker.strip().upper()} 市场情绪: {sentiment}\n"
+        f"近 {min(MOMENTUM_WINDOW, len(close) - 1)} 个交易日涨跌幅 {momentum:+.2f}%，"
+        f"收盘价 ${last:.2f}，{len(close)} 日均线 ${trend:.2f}"
+    )
+
+
+def get_market_data_version() -> str:
+    """行情数据版本（报价快照导入时间），用于响应缓存失效"""
+    store = get_market_store()
+    store.refresh()
+    return store.snapshot_version or "none"
@@ -0,0 +1,131 @@
+"""
+技术指标工具
+指标由 src.market.indicators 向量化计算；每只股票的递推状态按 LRU 缓存，
+行情追加新 K 线后只增量计算新增部分。
+"""
+
+from threading import Lock
+from typing import Dict, List
+from langchain.tools import tool
+from src.core.cache import TTLCache
+from src.market.indicators import IndicatorState, SMA_WINDOWS
+from src.market.store import get_market_store
+from config.settings import settings
+import math
+import re
+
+# 单次筛选的股票数量上限，避免 LLM 传入过长的列表
+MAX_SCREEN_TICKERS = 200
+
+_states = TTLCache(maxsize=settings.market_history_cache_size)
+_states_lock = Lock()
+
+
+def get_latest_indicators(tickers: List[str]) -> Dict[str, Dict[str, float]]:
+    """
+    计算多只股票最新一根 K 线的技术指标
+
+    缓存的状态仍是当前历史的前缀时只追加新 K 线；
+    其余股票合并为一个矩阵批量重建。
+
+    Returns:
+        {股票代码: {指标名: 数值}}，没有行情数据的股票不出现
+    """
+    store = get_market_store()
+    results: Dict[str, Dict[str, float]] = {}
+    rebuild = []
+
+    with _states_lock:
+        for ticker in dict.fromkeys(t.strip().upper() for t in tickers if t.strip()):
+            history = store.get_history(ticker)
+            if history is None or not len(history):
+                continue
+
+            state = _states.get(ticker)
+            bars = int(state.bars[0]) if state is not None else 0
+            if state is None or bars > len(history) or history.close[bars - 1] != state.last_close[0]:
+                rebuild.append(ticker)
+                continue
+            if bars < len(history):
+                state.update(history.close[bars:][None, :])
+            results[ticker] = _row(state.latest(), 0)
+
+        if rebuild:
+            found, close = store.get_close_matrix(rebuild)
+            batch = IndicatorState.from_history(found, close)
+            latest = batch.latest()
+            for row, ticker in enumerate(found):
+                _states.set(ticker, batch.select([row]))
+                results[ticker] = _row(latest, row)
+
+    return results
+
+
+def _row(latest: Dict, row: int) -> Dict[str, float]:
+    return {name: float(values[row]) for name, values in latest.items()}
+
+
+def _fmt(value: float, pattern: str) -> str:
+    return "—" if math.isnan(value) else pattern.format(value)
+
+
+def _describe(ticker: str, ind: Dict[str, float]) -> str:
+    """单只股票的指标摘要"""
+    close = ind["close"]
+    lines = [f"{ticker} 技术指标（收盘价 ${close:.2f}）："]
+    lines.append("均线: " + "，".join(
+        f"SMA{w} {_fmt(ind[f'sma_{w}'], '${:.2f}')}" for w in SMA_WINDOWS
+    ))
+
+    rsi = ind["rsi"]
+    rsi_note = "" if math.isnan(rsi) else ("（超买）" if rsi >= 70 else "（超卖）" if rsi <= 30 else "")
+    lines.append(f"RSI(14): {_fmt(rsi, '{:.1f}')}{rsi_note}")
+
+    hist = ind["macd_hist"]
+    macd_note = "" if math.isnan(hist) else ("（多头）" if hist > 0 else "（空头）")
+    lines.append(
+        f"MACD(12,26,9): {_fmt(ind['macd'], '{:.3f}')}，信号线 {_fmt(ind['macd_signal'], '{:.3f}')}，"
+        f"柱 {_fmt(hist, '{:+.3f}')}{macd_note}"
+    )
+    lines.append(
+        f"布林带(20,2): 上轨 {_fmt(ind['bb_upper'], '${:.2f}')}，中轨 {_fmt(ind['bb_middle'], '${:.2f}')}，"
+        f"下轨 {_fmt(ind['bb_lower'], '${:.2f}')}"
+    )
+    lines.append(f"年化波动率(20日): {_fmt(ind['volatility'] * 100, '{:.1f}%')}")
+    lines.append(
+        f"回撤: 当前 {_fmt(ind['drawdown'] * 100, '{:.1f}%')}，历史最大 {_fmt(ind['max_drawdown'] * 100, '{:.1f}%')}"
+    )
+    return "\n".join(lines)
+
+
+@tool
+def get_technical_indicators(stock_ticker: str) -> str:
+    """获取单只股票的技术指标：均线、RSI、MACD、布林带、波动率和回撤"""
+    ticker = stock_ticker.strip().upper()
+    indicators = get_latest_indicators([ticker]).get(ticker)
+    if indicators is None:
+        return f"暂无 {ticker} 的行情数据，无法计算技术指标"
+    return _describe(ticker, indicators)
+
+
+@tool
+def screen_technical_indicators(stock_tickers: str) -> str:
+    """批量获取多只股票的技术指标对比（股票代码用逗号或空格分隔）"""
+    tickers = [t for t in re.split(r"[,，\s]+", stock_tickers.upper()) if t][:MAX_SCREEN_TICKERS]
+    results = get_latest_indicators(tickers)
+    if not results:
+        return "所列股票均暂无行情数据"
+
+    lines = ["股票 | 收盘价 | 相对SMA50 | RSI | MACD柱 | 年化波动率 | 当前回撤"]
+    for ticker in tickers:
+        ind = results.get(ticker)
+        if ind is None:
+            lines.append(f"{ticker} | 暂无数据")
+            continue
+        vs_sma = (ind["close"] / ind["sma_50"] - 1) * 100
+        lines.append(
+            f"{ticker} | ${ind['close']:.2f} | {_fmt(vs_sma, '{:+.1f}%')} | {_fmt(ind['rsi'], '{:.1f}')} | "
+            f"{_fmt(ind['macd_hist'], '{:+.3f}')} | {_fmt(ind['volatility'] * 100, '{:.1f}%')} | "
+            f"{_fmt(ind['drawdown'] * 100, '{:.1f}%')}"
+        )
+    return "\n".join(lines)
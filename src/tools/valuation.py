@@ -1,17 +1,195 @@
-from langchain.tools import tool
-
-@tool
-def calculate_pe_ratio(stock_ticker: str, price: float, eps: float) -> str:
-    """计算市盈率"""
-    if eps <= 0:
-        return "无法计算：每股收益为负"
-    pe = price / eps
-    return f"{stock_ticker} PE比率: {pe:.2f}"
-
-@tool
-def calculate_intrinsic_value(fcf: float, growth_rate: float, discount_rate: float) -> str:
-    """计算内在价值（DCF）"""
-    if discount_rate <= growth_rate:
-        return "折现率必须大于增长率"
-    value = fcf * (1 + growth_rate) / (discount_rate - growth_rate)
-    return f"内在价值: ${value:.2f}"
\ No newline at end of file
+from typing import List, Optional
+from langchain.tools import tool
+from src.valuation.dcf import (
+    DEFAULT_PERCENTILES,
+    comparables,
+    dcf_grid,
+    percentile_bands,
+    reverse_dcf,
+)
+from src.valuation.monte_carlo import SimulationParams, run_monte_carlo
+from config.settings import settings
+import numpy as np
+
+# 未指定情景时使用的默认网格
+DEFAULT_GROWTH_RATES = [0.0, 0.03, 0.06, 0.09, 0.12, 0.15, 0.20]
+DEFAULT_DISCOUNT_RATES = [0.07, 0.08, 0.09, 0.10, 0.11, 0.12]
+# 单次调用的网格上限，避免输出过长
+MAX_GRID_SIZE = 25
+
+@tool
+def calculate_pe_ratio(stock_ticker: str, price: float, eps: float) -> str:
+    """计算市盈率"""
+    if eps <= 0:
+        return "无法计算：每股收益为负"
+    pe = price / eps
+    return f"{stock_ticker} PE比率: {pe:.2f}"
+
+@tool
+def calculate_intrinsic_value(fcf: float, growth_rate: float, discount_rate: float) -> str:
+    """计算内在价值（DCF）"""
+    if discount_rate <= growth_rate:
+        return "折现率必须大于增长率"
+    value = fcf * (1 + growth_rate) / (discount_rate - growth_rate)
+    return f"内在价值: ${value:.2f}"
+
+
+def _format_bands(values, percentiles=DEFAULT_PERCENTILES) -> str:
+    return "，".join(f"P{p} ${v:.2f}" for p, v in zip(percentiles, values))
+
+
+def _format_grid(growth_rates, discount_rates, grid) -> str:
+    header = "增长率＼折现率 | " + " | ".join(f"{r:.1%}" for r in discount_rates)
+    rows = [header]
+    for g, values in zip(growth_rates, grid):
+        cells = ("—" if np.isnan(v) else f"${v:.2f}" for v in values)
+        rows.append(f"{g:.1%} | " + " | ".join(cells))
+    return "\n".join(rows)
+
+
+@tool
+def dcf_sensitivity_analysis(
+        stock_ticker: str,
+        fcf: float,
+        current_price: Optional[float] = None,
+        growth_rates: Optional[List[float]] = None,
+        discount_rates: Optional[List[float]] = None,
+        terminal_growth: float = 0.025,
+        high_growth_years: int = 5,
+        fade_years: int = 5,
+        shares: float = 1.0,
+        net_debt: float = 0.0
+) -> str:
+    """
+    多阶段 DCF 敏感性分析：一次计算 增长率 × 折现率 网格上的每股价值，
+    给出敏感性表、价值分位数区间；提供当前股价时附带反向 DCF 隐含增长率。
+    利率用小数表示（8% 写作 0.08）；fcf 为每股自由现金流，
+    或传入总自由现金流并同时提供 shares（总股本）和 net_debt（净负债）。
+    """
+    growth_rates = (growth_rates or DEFAULT_GROWTH_RATES)[:MAX_GRID_SIZE]
+    discount_rates = (discount_rates or DEFAULT_DISCOUNT_RATES)[:MAX_GRID_SIZE]
+    stages = dict(
+        terminal_growth=terminal_growth,
+        high_growth_years=high_growth_years,
+        fade_years=fade_years,
+        shares=shares,
+        net_debt=net_debt,
+    )
+
+    grid = dcf_grid(fcf, growth_rates, discount_rates, **stages)
+    bands = percentile_bands(grid)
+    if bands is None:
+        return "所有情景的折现率都不高于永续增长率，无法估值"
+
+    lines = [
+        f"{stock_ticker} 多阶段 DCF 每股价值（高速增长 {high_growth_years} 年，"
+        f"衰减 {fade_years} 年至永续增长 {terminal_growth:.1%}）：",
+        _format_grid(growth_rates, discount_rates, grid),
+        f"情景分位数：{_format_bands(bands)}",
+    ]
+
+    if current_price:
+        # 只统计有效情景（折现率高于永续增长率），NaN 不计入分母
+        valid = grid[np.isfinite(grid)]
+        upside = np.mean(valid > current_price) * 100
+        implied = reverse_dcf(current_price, fcf, np.asarray(discount_rates), **stages)
+        lines.append(f"当前股价 ${current_price:.2f}，{upside:.0f}% 的情景高于当前股价")
+        lines.append("反向 DCF 隐含高速增长率：" + "，".join(
+            f"折现率 {r:.1%} → {'无解' if np.isnan(g) else f'{g:.1%}'}"
+            for r, g in zip(discount_rates, implied)
+        ))
+
+    return "\n".join(lines)
+
+
+@tool
+def comparables_valuation(
+        stock_ticker: str,
+        eps: Optional[float] = None,
+        bvps: Optional[float] = None,
+        ebitda: Optional[float] = None,
+        peer_pe: Optional[List[float]] = None,
+        peer_pb: Optional[List[float]] = None,
+        peer_ev_ebitda: Optional[List[float]] = None,
+        shares: float = 1.0,
+        net_debt: float = 0.0,
+        current_price: Optional[float] = None
+) -> str:
+    """
+    可比公司估值：按同行 PE、PB、EV/EBITDA 倍数分布一次给出各方法的公允价值分位数区间。
+    eps / bvps 为每股数据；ebitda 与 net_debt 为总额时需提供 shares（总股本）。
+    """
+    result = comparables(
+        {"eps": eps, "bvps": bvps, "ebitda": ebitda},
+        {"pe": peer_pe, "pb": peer_pb, "ev_ebitda": peer_ev_ebitda},
+        shares=shares,
+        net_debt=net_debt,
+    )
+    if not result:
+        return "缺少公司指标或同行倍数，无法进行可比公司估值"
+
+    names = {"pe": "PE", "pb": "PB", "ev_ebitda": "EV/EBITDA"}
+    lines = [f"{stock_ticker} 可比公司估值（每股公允价值）："]
+    for method, values in result.items():
+        lines.append(f"{names[method]}：{_format_bands(values)}")
+
+    medians = np.array([values[DEFAULT_PERCENTILES.index(50)] for values in result.values()])
+    summary = f"各方法中位数均值 ${medians.mean():.2f}"
+    if current_price:
+        summary += f"，相对当前股价 ${current_price:.2f} 的空间 {(medians.mean() / current_price - 1):+.1%}"
+    lines.append(summary)
+    return "\n".join(lines)
+
+
+@tool
+def monte_carlo_valuation(
+        stock_ticker: str,
+        revenue: float,
+        margin_mean: float,
+        margin_std: float,
+        growth_mean: float,
+        growth_std: float,
+        discount_mean: float,
+        discount_std: float,
+        terminal_growth: float = 0.025,
+        shares: float = 1.0,
+        net_debt: float = 0.0,
+        current_price: Optional[float] = None,
+        paths: int = 1_000_000,
+        seed: int = 42
+) -> str:
+    """
+    蒙特卡洛估值：对营收增长率、自由现金流利润率（FCF / 营收）、折现率按正态分布抽样，
+    逐路径计算多阶段 DCF，返回公允价值分布、置信区间和高于当前股价的概率。
+    利率用小数表示；revenue 为每股营收，或传入总营收并提供 shares 和 net_debt。
+    相同 seed 的结果可复现。
+    """
+    params = SimulationParams(
+        revenue=revenue,
+        margin_mean=margin_mean,
+        margin_std=margin_std,
+        growth_mean=growth_mean,
+        growth_std=growth_std,
+        discount_mean=discount_mean,
+        discount_std=discount_std,
+        terminal_growth=terminal_growth,
+        shares=shares,
+        net_debt=net_debt,
+    )
+    paths = max(1, min(paths, settings.monte_carlo_max_paths))
+    try:
+        result = run_monte_carlo(params, paths=paths, seed=seed, price=current_price)
+    except ValueError as e:
+        return str(e)
+
+    low_90, high_90 = result.confidence_interval(0.9)
+    low_95, high_95 = result.confidence_interval(0.95)
+    lines = [
+        f"{stock_ticker} 蒙特卡洛估值（{result.paths:,} 条路径，有效 {result.valid_paths:,}，seed={seed}）：",
+        f"公允价值均值 ${result.mean:.2f}，标准差 ${result.std:.2f}，中位数 ${result.percentiles[50]:.2f}",
+        f"90% 置信区间 ${low_90:.2f} – ${high_90:.2f}；95% 置信区间 ${low_95:.2f} – ${high_95:.2f}",
+        f"分位数：{_format_bands([result.percentiles[p] for p in DEFAULT_PERCENTILES])}",
+    ]
+    if result.prob_above_price is not None:
+        lines.append(f"公允价值高于当前股价 ${current_price:.2f} 的概率：{result.prob_above_price:.1%}")
+    return "\n".join(lines)
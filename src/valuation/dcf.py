@@ -0,0 +1,164 @@
+"""
+估值引擎
+- 多阶段 DCF：高速增长期 → 线性衰减期 → 永续增长（Gordon 终值）
+- 反向 DCF：由当前股价倒推市场隐含的高速增长率
+- 可比公司估值：按同行 PE / PB / EV/EBITDA 倍数分布给出公允价值区间
+
+所有参数均可传入 NumPy 数组并按广播规则组合，
+一次调用即可算完整个增长率 × 折现率情景网格。利率一律用小数表示（8% 写作 0.08）。
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+
+# 反向 DCF 求解区间与迭代次数（二分法，误差约 1.5 / 2^60）
+IMPLIED_GROWTH_BOUNDS = (-0.5, 1.0)
+BISECTION_STEPS = 60
+
+
+def _fade_weights(high_growth_years: int, fade_years: int) -> np.ndarray:
+    """逐年衰减权重：高速期为 0，衰减期线性增加，最后一年为 1"""
+    years = np.arange(1, high_growth_years + fade_years + 1)
+    return np.clip((years - high_growth_years) / max(fade_years, 1), 0.0, 1.0)
+
+
+def multi_stage_dcf(
+        fcf,
+        growth_rate,
+        discount_rate,
+        terminal_growth=0.025,
+        high_growth_years: int = 5,
+        fade_years: int = 5,
+        shares=1.0,
+        net_debt=0.0
+) -> np.ndarray:
+    """
+    多阶段 DCF 每股价值
+
+    Args:
+        fcf: 基期自由现金流
+        growth_rate: 高速增长期增长率
+        discount_rate: 折现率（WACC）
+        terminal_growth: 永续增长率
+        high_growth_years / fade_years: 高速期与衰减期年数
+        shares: 总股本；fcf 已是每股数据时保持 1
+        net_debt: 净负债（与 fcf 同单位），从企业价值中扣除
+
+    Returns:
+        按参数广播后的每股价值数组；折现率不高于永续增长率的情景为 NaN
+    """
+    fcf, growth_rate, discount_rate, terminal_growth, shares, net_debt = (
+        np.asarray(x, dtype=np.float64)
+        for x in (fcf, growth_rate, discount_rate, terminal_growth, shares, net_debt)
+    )
+    years = high_growth_years + fade_years
+    fade = _fade_weights(high_growth_years, fade_years)
+
+    # 逐年累乘：年数很少，每一步都是对全部情景的向量运算，比沿短轴 cumprod 更快
+    cash_flow = fcf
+    discount = 1.0
+    explicit = 0.0
+    step = 1.0 / (1.0 + discount_rate)
+    for year in range(years):
+        cash_flow = cash_flow * (1.0 + growth_rate + (terminal_growth - growth_rate) * fade[year])
+        discount = discount * step
+        explicit = explicit + cash_flow * discount
+
+    spread = discount_rate - terminal_growth
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terminal = cash_flow * (1.0 + terminal_growth) / spread * discount
+        value = (explicit + terminal - net_debt) / shares
+    return np.where(spread > 0, value, np.nan)
+
+
+def dcf_grid(
+        fcf: float,
+        growth_rates: Sequence[float],
+        discount_rates: Sequence[float],
+        **kwargs
+) -> np.ndarray:
+    """
+    DCF 敏感性网格
+
+    Returns:
+        形状为 (增长率数, 折现率数) 的每股价值矩阵
+    """
+    growth = np.asarray(growth_rates, dtype=np.float64)[:, None]
+    discount = np.asarray(discount_rates, dtype=np.float64)[None, :]
+    return multi_stage_dcf(fcf, growth, discount, **kwargs)
+
+
+def reverse_dcf(price, fcf, discount_rate, **kwargs) -> np.ndarray:
+    """
+    反向 DCF：求使每股价值等于当前股价的高速增长率
+
+    价值随增长率单调递增，对所有情景同时做向量化二分。
+
+    Returns:
+        按参数广播后的隐含增长率；在 IMPLIED_GROWTH_BOUNDS 内无解的情景为 NaN
+    """
+    price = np.asarray(price, dtype=np.float64)
+    shape = np.broadcast_shapes(price.shape, np.shape(fcf), np.shape(discount_rate))
+    low = np.full(shape, IMPLIED_GROWTH_BOUNDS[0])
+    high = np.full(shape, IMPLIED_GROWTH_BOUNDS[1])
+
+    value_low = multi_stage_dcf(fcf, low, discount_rate, **kwargs)
+    value_high = multi_stage_dcf(fcf, high, discount_rate, **kwargs)
+    solvable = (value_low <= price) & (value_high >= price)
+
+    for _ in range(BISECTION_STEPS):
+        middle = (low + high) / 2
+        too_low = multi_stage_dcf(fcf, middle, discount_rate, **kwargs) < price
+        low = np.where(too_low, middle, low)
+        high = np.where(too_low, high, middle)
+
+    return np.where(solvable, (low + high) / 2, np.nan)
+
+
+def comparables(
+        metrics: Dict[str, float],
+        peer_multiples: Dict[str, Sequence[float]],
+        shares: float = 1.0,
+        net_debt: float = 0.0,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES
+) -> Dict[str, np.ndarray]:
+    """
+    可比公司估值
+
+    Args:
+        metrics: 公司指标，键为 eps / bvps / ebitda（ebitda 与 net_debt 同单位）
+        peer_multiples: 同行倍数，键为 pe / pb / ev_ebitda
+        shares: 总股本，用于把 EV/EBITDA 得到的股权价值换算为每股
+        net_debt: 净负债
+
+    Returns:
+        {方法: 各分位数对应的每股公允价值}；缺少指标或倍数的方法不出现
+    """
+    methods = {
+        "pe": ("eps", lambda m, x: m * x),
+        "pb": ("bvps", lambda m, x: m * x),
+        "ev_ebitda": ("ebitda", lambda m, x: (m * x - net_debt) / shares),
+    }
+    result = {}
+    for method, (metric, to_price) in methods.items():
+        multiples = np.asarray(peer_multiples.get(method) or [], dtype=np.float64)
+        multiples = multiples[np.isfinite(multiples) & (multiples > 0)]
+        if metrics.get(metric) is None or not multiples.size:
+            continue
+        result[method] = to_price(metrics[metric], np.percentile(multiples, percentiles))
+    return result
+
+
+def percentile_bands(
+        values,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES
+) -> Optional[np.ndarray]:
+    """情景价值的分位数区间（忽略 NaN），全部无效时返回 None"""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if not values.size:
+        return None
+    return np.percentile(values, percentiles)
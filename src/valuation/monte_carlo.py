@@ -0,0 +1,246 @@
+"""
+蒙特卡洛估值模拟
+- 对营收增长率、自由现金流利润率、折现率抽样，逐路径计算多阶段 DCF 每股价值
+- 分块向量化生成：每块的随机数由 SeedSequence.spawn 派生，结果与分块执行顺序、
+  进程数无关，固定 seed 即可复现
+- 内存有界：每块只保留流式统计量（均值 / 方差 / 极值）和固定分箱的直方图，
+  分位数由直方图插值得到，不保存全部路径
+- 路径数超过阈值时可用进程池并行
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Tuple
+from src.valuation.dcf import DEFAULT_PERCENTILES, multi_stage_dcf
+from config.settings import settings
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+HISTOGRAM_BINS = 4096
+
+
+@dataclass(frozen=True)
+class SimulationParams:
+    """
+    模拟参数（利率均为小数）
+
+    增长率、利润率、折现率服从正态分布；利润率截断到 [-1, 1]，
+    折现率截断到不低于 0.1%。折现率不高于永续增长率的路径记为无效。
+    """
+    revenue: float
+    margin_mean: float
+    margin_std: float
+    growth_mean: float
+    growth_std: float
+    discount_mean: float
+    discount_std: float
+    terminal_growth: float = 0.025
+    high_growth_years: int = 5
+    fade_years: int = 5
+    shares: float = 1.0
+    net_debt: float = 0.0
+
+
+@dataclass
+class _ChunkStats:
+    """单块（或合并后）的流式统计量"""
+    count: int = 0
+    invalid: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    minimum: float = np.inf
+    maximum: float = -np.inf
+    above_price: int = 0
+    # 首尾两格分别统计低于 / 高于分箱范围的路径
+    histogram: np.ndarray = field(default_factory=lambda: np.zeros(HISTOGRAM_BINS + 2, dtype=np.int64))
+
+    def merge(self, other: "_ChunkStats"):
+        """合并两组统计量（Chan 并行方差公式）"""
+        total = self.count + other.count
+        if other.count:
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / total
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.invalid += other.invalid
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.above_price += other.above_price
+        self.histogram += other.histogram
+
+
+@dataclass
+class MonteCarloResult:
+    """模拟结果"""
+    paths: int
+    valid_paths: int
+    mean: float
+    std: float
+    minimum: float
+    maximum: float
+    percentiles: Dict[float, float]
+    prob_above_price: Optional[float]
+    elapsed_seconds: float
+    workers: int
+
+    def confidence_interval(self, level: float = 0.9) -> Tuple[float, float]:
+        """等尾置信区间；对应的分位数需包含在 run_monte_carlo 的 percentiles 参数中"""
+        return (
+            self.percentiles[round((1 - level) / 2 * 100, 4)],
+            self.percentiles[round((1 + level) / 2 * 100, 4)],
+        )
+
+
+def _sample_values(params: SimulationParams, rng: np.random.Generator, size: int) -> np.ndarray:
+    growth = rng.normal(params.growth_mean, params.growth_std, size)
+    margin = np.clip(rng.normal(params.margin_mean, params.margin_std, size), -1.0, 1.0)
+    discount = np.maximum(rng.normal(params.discount_mean, params.discount_std, size), 0.001)
+    return multi_stage_dcf(
+        params.revenue * margin,
+        growth,
+        discount,
+        terminal_growth=params.terminal_growth,
+        high_growth_years=params.high_growth_years,
+        fade_years=params.fade_years,
+        shares=params.shares,
+        net_debt=params.net_debt,
+    )
+
+
+def _summarize(values: np.ndarray, edges: Tuple[float, float], price: Optional[float]) -> _ChunkStats:
+    stats = _ChunkStats()
+    valid = values[np.isfinite(values)]
+    stats.invalid = len(values) - len(valid)
+    if not len(valid):
+        return stats
+
+    stats.count = len(valid)
+    stats.mean = float(valid.mean())
+    stats.m2 = float(((valid - stats.mean) ** 2).sum())
+    stats.minimum = float(valid.min())
+    stats.maximum = float(valid.max())
+    if price is not None:
+        stats.above_price = int((valid > price).sum())
+
+    low, high = edges
+    index = np.floor((valid - low) * (HISTOGRAM_BINS / (high - low))).astype(np.int64) + 1
+    np.clip(index, 0, HISTOGRAM_BINS + 1, out=index)
+    stats.histogram = np.bincount(index, minlength=HISTOGRAM_BINS + 2)
+    return stats
+
+
+def _simulate_chunk(
+        params: SimulationParams,
+        seed: np.random.SeedSequence,
+        size: int,
+        edges: Tuple[float, float],
+        price: Optional[float]
+) -> _ChunkStats:
+    """模拟一块路径并返回统计量（可在子进程中执行）"""
+    rng = np.random.default_rng(seed)
+    return _summarize(_sample_values(params, rng, size), edges, price)
+
+
+def _histogram_edges(values: np.ndarray) -> Tuple[float, float]:
+    """用试算块确定分箱范围：覆盖 0.05%–99.95% 分位并向两侧各留出 25%"""
+    valid = values[np.isfinite(values)]
+    if not len(valid):
+        return 0.0, 1.0
+    low, high = np.percentile(valid, [0.05, 99.95])
+    margin = (high - low) * 0.25 or abs(high) * 0.01 or 1.0
+    return float(low - margin), float(high + margin)
+
+
+def _percentiles_from_histogram(stats: _ChunkStats, edges: Tuple[float, float], percentiles) -> Dict[float, float]:
+    """按累计分布在分箱内线性插值；落在分箱范围外的用极值代替"""
+    low, high = edges
+    width = (high - low) / HISTOGRAM_BINS
+    cumulative = np.cumsum(stats.histogram)
+    result = {}
+    for p in percentiles:
+        target = p / 100 * stats.count
+        slot = int(np.searchsorted(cumulative, target, side="left"))
+        if slot == 0:
+            result[p] = stats.minimum
+        elif slot > HISTOGRAM_BINS:
+            result[p] = stats.maximum
+        else:
+            before = cumulative[slot - 1]
+            inside = stats.histogram[slot]
+            fraction = (target - before) / inside if inside else 0.0
+            result[p] = float(np.clip(low + (slot - 1 + fraction) * width, stats.minimum, stats.maximum))
+    return result
+
+
+def run_monte_carlo(
+        params: SimulationParams,
+        paths: int = 1_000_000,
+        seed: Optional[int] = None,
+        price: Optional[float] = None,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES + (2.5, 5, 95, 97.5),
+        chunk_size: Optional[int] = None,
+        workers: Optional[int] = None
+) -> MonteCarloResult:
+    """
+    运行蒙特卡洛估值
+
+    Args:
+        params: 模拟参数
+        paths: 路径数
+        seed: 随机种子，None 时每次结果不同
+        price: 当前股价，提供时统计公允价值高于股价的概率
+        chunk_size: 每块路径数，None 时使用 settings.monte_carlo_chunk_size
+        workers: 进程数；None 时路径数达到 settings.monte_carlo_parallel_threshold
+                 才按 settings.monte_carlo_workers 并行，否则单进程
+
+    Returns:
+        MonteCarloResult
+    """
+    start = time.perf_counter()
+    chunk_size = chunk_size or settings.monte_carlo_chunk_size
+    sizes = [chunk_size] * (paths // chunk_size) + ([paths % chunk_size] if paths % chunk_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if workers is None:
+        workers = settings.monte_carlo_workers if paths >= settings.monte_carlo_parallel_threshold else 1
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    workers = max(1, min(workers, len(sizes) - 1))
+
+    # 第一块在本进程中计算，同时用来确定直方图分箱范围
+    pilot = _sample_values(params, np.random.default_rng(seeds[0]), sizes[0])
+    edges = _histogram_edges(pilot)
+    total = _summarize(pilot, edges, price)
+    del pilot
+
+    rest = list(zip(seeds[1:], sizes[1:]))
+    if workers > 1:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [
+                executor.submit(_simulate_chunk, params, chunk_seed, size, edges, price)
+                for chunk_seed, size in rest
+            ]
+            for future in futures:
+                total.merge(future.result())
+    else:
+        for chunk_seed, size in rest:
+            total.merge(_simulate_chunk(params, chunk_seed, size, edges, price))
+
+    if not total.count:
+        raise ValueError("所有路径的折现率都不高于永续增长率，无法估值")
+
+    return MonteCarloResult(
+        paths=paths,
+        valid_paths=total.count,
+        mean=total.mean,
+        std=float(np.sqrt(total.m2 / max(total.count - 1, 1))),
+        minimum=total.minimum,
+        maximum=total.maximum,
+        percentiles=_percentiles_from_histogram(total, edges, sorted(percentiles)),
+        prob_above_price=total.above_price / total.count if price is not None else None,
+        elapsed_seconds=time.perf_counter() - start,
+        workers=workers,
+    )
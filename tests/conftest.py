@@ -0,0 +1,15 @@
+"""
+测试公共配置
+项目根目录加入导入路径；提供不访问外部服务的默认环境变量（在导入 config.settings 之前设置）。
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+os.environ.setdefault("TRACING_EXPORT_PATH", "")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
@@ -0,0 +1,127 @@
+"""FAISS 向量索引：重启后增量写入、删除、元数据过滤"""
+
+import hashlib
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+faiss = pytest.importorskip("faiss")
+
+from src.rag import faiss_store  # noqa: E402
+from src.rag.faiss_store import FaissVectorStore  # noqa: E402
+
+DIMENSION = 16
+
+
+class FakeEmbeddings:
+    """按文本哈希生成确定的向量"""
+
+    def _vector(self, text):
+        seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).standard_normal(DIMENSION).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def _documents(ticker, count, start=0):
+    docs = [
+        Document(page_content=f"{ticker} chunk {i}", metadata={"ticker": ticker, "fiscal_year": 2024})
+        for i in range(start, start + count)
+    ]
+    return docs, [f"{ticker}-{i}" for i in range(start, start + count)]
+
+
+def _open(tmp_path, index_type):
+    return FaissVectorStore(FakeEmbeddings(), str(tmp_path), index_type=index_type)
+
+
+def _search(store, text, ticker, k=5):
+    vector = FakeEmbeddings().embed_query(text)
+    return store.similarity_search_by_vector(vector, k=k, filter={"ticker": ticker})
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8"])
+def test_add_after_restart_keeps_existing_vectors(tmp_path, index_type, monkeypatch):
+    # 第一个实例写入后量化索引已完成训练
+    monkeypatch.setattr(faiss_store, "_MIN_TRAIN_SAMPLES", 32)
+    first = _open(tmp_path, index_type)
+    first.add_documents(*_documents("AAA", 50))
+    first.flush()
+
+    # 重启：新实例直接增量写入，之前没有检索过
+    second = _open(tmp_path, index_type)
+    second.add_documents(*_documents("BBB", 10))
+    second.flush()
+
+    third = _open(tmp_path, index_type)
+    assert third.stats()["vectors"] == 60
+    assert len(third.get()["ids"]) == 60
+    results = _search(third, "AAA chunk 7", "AAA")
+    assert results and all(doc.metadata["ticker"] == "AAA" for doc in results)
+    assert results[0].page_content == "AAA chunk 7"
+
+
+def test_delete_after_restart(tmp_path):
+    first = _open(tmp_path, "flat")
+    first.add_documents(*_documents("AAA", 5))
+    first.flush()
+
+    second = _open(tmp_path, "flat")
+    second.delete(["AAA-0", "AAA-1"])
+    second.flush()
+
+    third = _open(tmp_path, "flat")
+    assert third.stats()["vectors"] == 3
+    assert sorted(third.get()["ids"]) == ["AAA-2", "AAA-3", "AAA-4"]
+
+
+def test_upsert_replaces_vector(tmp_path):
+    store = _open(tmp_path, "flat")
+    store.add_documents(*_documents("AAA", 3))
+    store.add_documents([Document(page_content="updated", metadata={"ticker": "AAA"})], ["AAA-0"])
+    store.flush()
+
+    assert store.stats()["vectors"] == 3
+    assert store.get(ids=["AAA-0"])["documents"] == ["updated"]
+
+
+def test_filter_excludes_other_tickers(tmp_path):
+    store = _open(tmp_path, "flat")
+    store.add_documents(*_documents("AAA", 5))
+    store.add_documents(*_documents("BBB", 5))
+    store.flush()
+
+    assert all(doc.metadata["ticker"] == "BBB" for doc in _search(store, "AAA chunk 1", "BBB"))
+    assert _search(store, "AAA chunk 1", "CCC") == []
+
+
+def test_small_first_batch_does_not_fix_quantizer_range(tmp_path):
+    # 第一个文件只有 2 个文本块：攒够训练样本之前不训练量化范围
+    quantized = FaissVectorStore(FakeEmbeddings(), str(tmp_path / "sq8"), index_type="sq8")
+    exact = FaissVectorStore(FakeEmbeddings(), str(tmp_path / "flat"), index_type="flat")
+    for store in (quantized, exact):
+        store.add_documents(*_documents("AAA", 2))
+        store.flush()
+    assert isinstance(faiss.downcast_index(quantized._index.index), faiss.IndexFlat)
+
+    # 重启后继续写入，样本足够时转换为量化索引
+    quantized = FaissVectorStore(FakeEmbeddings(), str(tmp_path / "sq8"), index_type="sq8")
+    for start in range(2, 402, 50):
+        for store in (quantized, exact):
+            store.add_documents(*_documents("AAA", 50, start))
+    quantized.flush()
+    assert isinstance(faiss.downcast_index(quantized._index.index), faiss.IndexScalarQuantizer)
+    assert quantized.stats()["vectors"] == 402
+
+    overlap = []
+    for i in range(20):
+        vector = FakeEmbeddings().embed_query(f"query {i}")
+        expected = {doc.id for doc in exact.similarity_search_by_vector(vector, k=10)}
+        actual = {doc.id for doc in quantized.similarity_search_by_vector(vector, k=10)}
+        overlap.append(len(expected & actual) / 10)
+    assert np.mean(overlap) >= 0.9
@@ -0,0 +1,33 @@
+"""财务指标识别：问题中的关键词映射到正确的指标"""
+
+import pytest
+
+from src.financials.metrics import SUMMARY_METRICS, match_metrics
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ROE 和 ROA", ["roe", "roa"]),
+    ("ROE和ROA", ["roe", "roa"]),
+    ("苹果ROE", ["roe"]),
+    ("EPS多少", ["eps"]),
+    ("heroes aroar", []),
+    ("净资产收益率", ["roe"]),
+    ("broad market exposure abroad", []),
+    ("资产负债率", ["debt_to_assets"]),
+    ("debt to equity", ["debt_to_equity"]),
+    ("负债权益比", ["debt_to_equity"]),
+    ("营收同比增长", ["revenue_growth"]),
+    ("revenue growth", ["revenue_growth"]),
+    ("净利率", ["net_margin"]),
+    ("EPS", ["eps"]),
+])
+def test_match_metrics(text, expected):
+    assert match_metrics(text) == expected
+
+
+def test_bare_growth_rate_is_not_revenue_growth():
+    assert "revenue_growth" not in match_metrics("净利润增长率")
+
+
+def test_summary_words_return_key_metrics():
+    assert match_metrics("关键指标") == SUMMARY_METRICS
@@ -0,0 +1,154 @@
+"""LLM 网关：许可发放与归还的计数、优先级、取消、429 暂停，以及同步客户端的重试配置"""
+
+import asyncio
+import time
+
+import httpx
+from src.core.llm_gateway import BATCH, INTERACTIVE, GatewayTransport, LLMGateway
+
+
+def _gateway(**kwargs):
+    options = dict(max_concurrency=2, batch_max_concurrency=1, backoff_base=0.01, backoff_max=0.05)
+    options.update(kwargs)
+    return LLMGateway(**options)
+
+
+async def _settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_concurrency_limit_and_release():
+    async def _main():
+        gateway = _gateway()
+        await gateway.acquire(INTERACTIVE, 10)
+        await gateway.acquire(INTERACTIVE, 10)
+        third = asyncio.create_task(gateway.acquire(INTERACTIVE, 10))
+        await _settle()
+        assert not third.done()
+        assert gateway.stats()["lanes"][INTERACTIVE]["queued"] == 1
+
+        gateway.release(INTERACTIVE, 10, used=7)
+        await _settle()
+        assert third.done()
+
+        gateway.release(INTERACTIVE, 10, used=None)
+        gateway.release(INTERACTIVE, 10, used=3)
+        stats = gateway.stats()
+        assert stats["lanes"][INTERACTIVE]["in_flight"] == 0
+        assert stats["lanes"][INTERACTIVE]["granted"] == 3
+        assert stats["tokens_reserved"] == 30
+        assert stats["tokens_used"] == 7 + 10 + 3
+
+    asyncio.run(_main())
+
+
+def test_batch_lane_limit_and_interactive_priority():
+    async def _main():
+        gateway = _gateway()
+        await gateway.acquire(BATCH, 1)
+        # batch 通道已满，后续 batch 请求排队，interactive 仍可获得名额
+        queued_batch = asyncio.create_task(gateway.acquire(BATCH, 1))
+        await _settle()
+        assert not queued_batch.done()
+        await asyncio.wait_for(gateway.acquire(INTERACTIVE, 1), timeout=1)
+
+        # 总并发已满：interactive 和 batch 同时排队时，interactive 先发放
+        queued_interactive = asyncio.create_task(gateway.acquire(INTERACTIVE, 1))
+        await _settle()
+        gateway.release(BATCH, 1, used=1)
+        await _settle()
+        assert queued_interactive.done() and not queued_batch.done()
+
+        gateway.release(INTERACTIVE, 1, used=1)
+        await _settle()
+        assert queued_batch.done()
+
+    asyncio.run(_main())
+
+
+def test_cancelled_waiters_do_not_leak_slots():
+    async def _main():
+        gateway = _gateway(max_concurrency=1)
+        await gateway.acquire(INTERACTIVE, 1)
+        waiter = asyncio.create_task(gateway.acquire(INTERACTIVE, 1))
+        await _settle()
+        waiter.cancel()
+        await _settle()
+        assert gateway.stats()["lanes"][INTERACTIVE]["queued"] == 0
+
+        gateway.release(INTERACTIVE, 1, used=1)
+        assert gateway.stats()["lanes"][INTERACTIVE]["in_flight"] == 0
+        await asyncio.wait_for(gateway.acquire(INTERACTIVE, 1), timeout=1)
+
+    asyncio.run(_main())
+
+
+def test_token_budget_is_refunded_with_actual_usage():
+    async def _main():
+        # 每分钟 100 token：预留 80 后无法再预留 80，按实际用量 20 归还后可以
+        gateway = _gateway(tokens_per_minute=100)
+        await gateway.acquire(INTERACTIVE, 80)
+        second = asyncio.create_task(gateway.acquire(INTERACTIVE, 80))
+        await _settle()
+        assert not second.done()
+
+        gateway.release(INTERACTIVE, 80, used=20)
+        await asyncio.wait_for(second, timeout=1)
+
+    asyncio.run(_main())
+
+
+class _Body(httpx.AsyncByteStream):
+    """流式响应体：与真实连接一样读完时才关闭（json= 构造的响应会被提前读入，不经过网关的关闭回调）"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+
+
+def test_rate_limit_pauses_before_releasing_slot():
+    """429 后在 Retry-After 内不会把排队的请求发给服务端"""
+    calls = []
+
+    async def _handler(request):
+        calls.append((request.content, time.monotonic()))
+        if len(calls) == 1:
+            # 第二个请求在第一个请求进行中排队
+            await asyncio.sleep(0.05)
+            return httpx.Response(429, headers={"retry-after": "0.3"}, stream=_Body(b""))
+        return httpx.Response(
+            200, headers={"content-type": "application/json"}, stream=_Body(b'{"usage": {"total_tokens": 5}}')
+        )
+
+    async def _main():
+        gateway = _gateway(max_concurrency=1)
+        transport = GatewayTransport(gateway, httpx.MockTransport(_handler))
+        async with httpx.AsyncClient(transport=transport, base_url="http://llm") as client:
+            first = asyncio.create_task(client.post("/chat", json={"messages": ["a"]}))
+            await asyncio.sleep(0.01)
+            second = asyncio.create_task(client.post("/chat", json={"messages": ["b"]}))
+            responses = await asyncio.gather(first, second)
+
+        assert [r.status_code for r in responses] == [200, 200]
+        assert gateway.rate_limited == 1 and gateway.retries == 1
+        assert gateway.stats()["lanes"][INTERACTIVE]["in_flight"] == 0
+        rejected_at = calls[0][1] + 0.05
+        assert all(at - rejected_at >= 0.3 for _, at in calls[1:])
+
+    asyncio.run(_main())
+
+
+def test_sync_client_keeps_openai_retries(monkeypatch):
+    import openai
+    from config.settings import settings
+    from src.core.llm import get_deepseek_llm
+
+    monkeypatch.setattr(settings, "llm_gateway_enabled", True)
+    llm = get_deepseek_llm()
+
+    assert llm.root_async_client.max_retries == 0
+    assert llm.root_client.max_retries == openai.DEFAULT_MAX_RETRIES
+    assert llm.client._client is llm.root_client
@@ -0,0 +1,88 @@
+"""行情存储：其他进程导入后，运行中的实例重新加载报价、历史数据和数据版本；不会读到导入到一半的列"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.market.store import MarketDataStore, SNAPSHOT_FILENAME
+
+
+def _write_csv(path, closes, start="2024-01-01"):
+    dates = pd.date_range(start, periods=len(closes), freq="D")
+    pd.DataFrame({
+        "date": dates, "open": closes, "high": closes, "low": closes, "close": closes, "volume": 1000,
+    }).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def root(tmp_path):
+    return tmp_path / "market_data"
+
+
+def test_reader_picks_up_import_from_another_process(root, tmp_path):
+    importer = MarketDataStore(str(root))
+    importer.import_csv(_write_csv(tmp_path / "AAPL.csv", [10.0, 11.0]))
+
+    reader = MarketDataStore(str(root))
+    reader.snapshot_check_interval = 0
+    assert reader.get_quote("AAPL").close == 11.0
+    assert len(reader.get_history("AAPL")) == 2
+
+    # 另一个实例（相当于命令行导入）追加数据并写入新快照
+    importer.import_csv(_write_csv(tmp_path / "AAPL.csv", [12.0, 13.0], start="2024-01-03"))
+    # 两次导入可能落在文件系统时间戳的同一刻度内
+    snapshot = root / SNAPSHOT_FILENAME
+    stat = snapshot.stat()
+    os.utime(snapshot, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert reader.get_quote("AAPL").close == 13.0
+    assert list(reader.get_history("AAPL").close) == [10.0, 11.0, 12.0, 13.0]
+    assert reader.snapshot_version == importer.snapshot_version
+
+
+def test_reader_started_before_first_import(root, tmp_path):
+    reader = MarketDataStore(str(root))
+    reader.snapshot_check_interval = 0
+    assert reader.get_quote("MSFT") is None
+
+    MarketDataStore(str(root)).import_csv(_write_csv(tmp_path / "MSFT.csv", [50.0]))
+
+    assert reader.get_quote("MSFT").close == 50.0
+    assert reader.tickers() == ["MSFT"]
+
+
+def test_checks_are_rate_limited(root, tmp_path):
+    reader = MarketDataStore(str(root))
+    MarketDataStore(str(root)).import_csv(_write_csv(tmp_path / "NVDA.csv", [5.0]))
+
+    # 间隔内不检查快照
+    assert reader.get_quote("NVDA") is None
+    reader.snapshot_check_interval = 0
+    assert reader.get_quote("NVDA").close == 5.0
+
+
+def test_history_is_not_read_mid_import(root, tmp_path, monkeypatch):
+    MarketDataStore(str(root)).import_csv(_write_csv(tmp_path / "AAPL.csv", [10.0, 11.0]))
+
+    # 模拟导入进程只替换了 date.npy，其余列稍后才替换
+    ticker_dir = root / "AAPL"
+    dates = np.load(ticker_dir / "date.npy")
+    np.save(ticker_dir / "date.npy", np.append(dates, dates[-1] + 1))
+
+    def finish_import():
+        for column in ("open", "high", "low", "close", "volume"):
+            np.save(ticker_dir / f"{column}.npy", np.array([10.0, 11.0, 12.0]))
+
+    timer = threading.Timer(0.1, finish_import)
+    timer.start()
+    try:
+        history = MarketDataStore(str(root)).get_history("AAPL")
+    finally:
+        timer.join()
+
+    assert len(history) == 3
+    assert list(history.close) == [10.0, 11.0, 12.0]
@@ -0,0 +1,64 @@
+"""检索服务客户端：服务不可用时预热有限次重试后失败，就绪查询限频，服务退出后响应缓存降级"""
+
+import httpx
+import pytest
+
+from config.settings import settings
+from src.core.response_cache import ResponseCache
+from src.rag import client as rag_client
+from src.rag.client import RAGServiceClient, RAGServiceUnavailable
+
+
+@pytest.fixture
+def unreachable(monkeypatch):
+    """指向没有服务监听的地址，轮询和退避都缩短"""
+    monkeypatch.setattr(settings, "rag_service_timeout", 0.05)
+    monkeypatch.setattr(settings, "rag_service_ready_attempts", 2)
+    monkeypatch.setattr(rag_client, "_READY_POLL_INTERVAL", 0.01)
+    return RAGServiceClient("http://127.0.0.1:9", timeout=0.5)
+
+
+def test_load_embeddings_gives_up(unreachable):
+    with pytest.raises(RuntimeError, match="未就绪"):
+        unreachable.load_embeddings()
+
+
+def test_embeddings_loaded_is_rate_limited(unreachable, monkeypatch):
+    calls = []
+
+    def _get(path, **kwargs):
+        calls.append(path)
+        raise httpx.ConnectError("connection refused")
+
+    monkeypatch.setattr(unreachable._client, "get", _get)
+
+    assert not unreachable.embeddings_loaded
+    assert not unreachable.embeddings_loaded
+    assert len(calls) == 1
+
+
+def test_embed_query_resets_ready_when_service_goes_down(unreachable):
+    unreachable._ready = True
+
+    with pytest.raises(RAGServiceUnavailable):
+        unreachable.embed_query("AAPL 值得买吗")
+
+    assert not unreachable._ready
+    assert not unreachable.embeddings_loaded
+
+
+def test_response_cache_survives_service_going_down(unreachable, tmp_path):
+    unreachable._ready = True
+    cache = ResponseCache(
+        path=str(tmp_path / "responses.sqlite3"),
+        embed=unreachable.embed_query,
+        embed_ready=lambda: unreachable.embeddings_loaded,
+    )
+
+    # 服务退出：查找按未命中处理，写入不带向量
+    hit, vector = cache.lookup("AAPL", "market", "v1", "AAPL 值得买吗")
+    assert hit is None and vector is None
+    cache.store("AAPL", "market", "v1", "AAPL 值得买吗", "持有")
+
+    hit, _ = cache.lookup("AAPL", "market", "v1", "AAPL 值得买吗")
+    assert hit is not None and hit.analysis == "持有"
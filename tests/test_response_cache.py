@@ -0,0 +1,162 @@
+"""语义响应缓存：精确 / 相似度命中、阈值、TTL 过期、数据版本失效"""
+
+from types import SimpleNamespace
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from src.core.response_cache import ResponseCache
+
+# 测试用向量：问题 → 固定方向；与 "aapl 值得买吗" 余弦相似度约 0.98 / 0.6
+VECTORS = {
+    "aapl 值得买吗": [1.0, 0.0, 0.0],
+    "aapl 值得买入吗": [0.98, 0.2, 0.0],
+    "aapl 风险大吗": [0.6, 0.8, 0.0],
+}
+
+
+class FakeEmbed:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return VECTORS.get(text, [0.0, 0.0, 1.0])
+
+
+@pytest.fixture
+def embed():
+    return FakeEmbed()
+
+
+@pytest.fixture
+def cache(tmp_path, embed):
+    return ResponseCache(path=str(tmp_path / "responses.sqlite3"), embed=embed, similarity_threshold=0.95)
+
+
+def test_exact_hit_skips_embedding(cache, embed):
+    cache.store("AAPL", "financial", "v1", "AAPL 值得买吗", "持有")
+    calls = embed.calls
+
+    hit, vector = cache.lookup("AAPL", "financial", "v1", "  aapl   值得买吗 ")
+
+    assert hit is not None and hit.analysis == "持有" and hit.similarity == 1.0
+    assert vector is None
+    assert embed.calls == calls
+
+
+def test_similar_question_hits_above_threshold(cache):
+    cache.store("AAPL", "financial", "v1", "AAPL 值得买吗", "持有")
+
+    hit, _ = cache.lookup("AAPL", "financial", "v1", "AAPL 值得买入吗")
+
+    assert hit is not None
+    assert hit.similarity == pytest.approx(0.98 / np.linalg.norm([0.98, 0.2]), rel=1e-5)
+
+
+def test_question_below_threshold_misses(cache):
+    cache.store("AAPL", "financial", "v1", "AAPL 值得买吗", "持有")
+
+    hit, vector = cache.lookup("AAPL", "financial", "v1", "AAPL 风险大吗")
+
+    assert hit is None
+    # 未命中时返回的向量可直接用于写入
+    assert vector == VECTORS["aapl 风险大吗"]
+    assert cache.stats()["misses"] == 1
+
+
+def test_other_ticker_scope_or_data_version_misses(cache):
+    cache.store("AAPL", "financial", "v1", "AAPL 值得买吗", "持有")
+
+    assert cache.lookup("MSFT", "financial", "v1", "AAPL 值得买吗")[0] is None
+    assert cache.lookup("AAPL", "financial+market", "v1", "AAPL 值得买吗")[0] is None
+    assert cache.lookup("AAPL", "financial", "v2", "AAPL 值得买吗")[0] is None
+
+
+def test_expired_entries_miss_and_are_purged(tmp_path, embed, monkeypatch):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite3"), embed=embed, ttl=60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.store("AAPL", "financial", "v1", "AAPL 值得买吗", "持有")
+    assert cache.lookup("AAPL", "financial", "v1", "AAPL 值得买吗")[0] is not None
+
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.lookup("AAPL", "financial", "v1", "AAPL 值得买吗")[0] is None
+    assert cache.lookup("AAPL", "financial", "v1", "AAPL 值得买入吗")[0] is None
+
+    cache.store("AAPL", "market", "v1", "AAPL 风险大吗", "中性")
+    assert cache.stats()["size"] == 1
+
+
+def test_entries_stored_before_model_ready_only_match_exactly(tmp_path, embed):
+    ready = {"value": False}
+    cache = ResponseCache(
+        path=str(tmp_path / "responses.sqlite3"), embed=embed, embed_ready=lambda: ready["value"]
+    )
+    cache.store("AAPL", "financial", "v1", "AAPL 值得买吗", "持有")
+    assert embed.calls == 0
+    assert cache.lookup("AAPL", "financial", "v1", "AAPL 值得买入吗") == (None, None)
+
+    ready["value"] = True
+    assert cache.lookup("AAPL", "financial", "v1", "AAPL 值得买入吗")[0] is None
+    assert cache.lookup("AAPL", "financial", "v1", "AAPL 值得买吗")[0] is not None
+
+
+
+def test_embedding_failure_is_a_miss_and_stores_without_vector(tmp_path):
+    def embed(text):
+        raise ConnectionError("检索服务不可用")
+
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite3"), embed=embed)
+
+    assert cache.lookup("AAPL", "financial", "v1", "AAPL 值得买吗") == (None, None)
+    cache.store("AAPL", "financial", "v1", "AAPL 值得买吗", "持有")
+    assert cache.lookup("AAPL", "financial", "v1", "AAPL 值得买吗")[0].analysis == "持有"
+    assert cache.misses == 1 and cache.hits == 1
+
+# ============ run_analysis 与缓存 ============
+
+@pytest.fixture
+def analysis(tmp_path, embed, monkeypatch):
+    """run_analysis 使用临时缓存，专家和主管替换为计数的假实现"""
+    from src.agents import supervisor
+    from src.agents.supervisor import AnalysisOutcome, SpecialistReport
+
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite3"), embed=embed)
+    calls = []
+
+    async def _fake_parallel(stock_ticker, user_query, specialists):
+        calls.append(specialists)
+        reports = [SpecialistReport(name, name, "ok", 0.0) for name in specialists]
+        return AnalysisOutcome(analysis=f"分析 {len(calls)}", mode="parallel", specialists=reports)
+
+    version = {"value": "index:1|market:1"}
+    monkeypatch.setattr(supervisor, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(supervisor, "_data_version", lambda: version["value"])
+    monkeypatch.setattr(supervisor, "_analyze_parallel", _fake_parallel)
+
+    def _run(query="AAPL 值得买吗"):
+        return asyncio.run(supervisor.run_analysis("AAPL", query, parallel=True))
+
+    return SimpleNamespace(run=_run, calls=calls, version=version)
+
+
+def test_run_analysis_serves_repeat_from_cache(analysis):
+    first = analysis.run()
+    second = analysis.run("AAPL 值得买入吗")
+
+    assert not first.cached and second.cached
+    assert second.analysis == first.analysis
+    assert len(analysis.calls) == 1
+
+
+def test_run_analysis_data_version_change_invalidates(analysis):
+    analysis.run()
+    analysis.version["value"] = "index:1|market:2"
+
+    outcome = analysis.run()
+
+    assert not outcome.cached
+    assert outcome.analysis == "分析 2"
@@ -0,0 +1,71 @@
+"""专家任务合并：等待方计数、全部离开时取消、按 LLM 优先级通道区分"""
+
+import asyncio
+
+import pytest
+
+from src.agents import supervisor
+from src.agents.supervisor import SpecialistReport
+from src.core.llm_gateway import BATCH, llm_priority
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """把 run_specialist 替换为记录启动和取消的慢任务"""
+    state = {"started": 0, "cancelled": 0}
+
+    async def _fake_run(name, stock_ticker, query, data=None):
+        state["started"] += 1
+        try:
+            await asyncio.sleep(0.2)
+        except asyncio.CancelledError:
+            state["cancelled"] += 1
+            raise
+        return SpecialistReport(name, name, "ok", 0.2)
+
+    monkeypatch.setattr(supervisor, "run_specialist", _fake_run)
+    return state
+
+
+def test_concurrent_requests_share_one_run(runs):
+    async def _main():
+        return await asyncio.gather(*(
+            supervisor.run_specialist_shared("financial", "AAPL", "营收") for _ in range(3)
+        ))
+
+    reports = asyncio.run(_main())
+
+    assert [r.content for r in reports] == ["ok"] * 3
+    assert runs["started"] == 1
+    assert not supervisor._inflight_specialists
+
+
+def test_shared_run_survives_until_last_waiter_leaves(runs):
+    async def _main():
+        first = asyncio.create_task(supervisor.run_specialist_shared("financial", "AAPL", "营收"))
+        second = asyncio.create_task(supervisor.run_specialist_shared("financial", "AAPL", "营收"))
+        await asyncio.sleep(0.05)
+
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert runs["cancelled"] == 0
+
+        second.cancel()
+        await asyncio.sleep(0.01)
+        assert runs["cancelled"] == 1
+        assert not supervisor._inflight_specialists
+
+    asyncio.run(_main())
+
+
+def test_batch_and_interactive_lanes_do_not_merge(runs):
+    async def _batch():
+        with llm_priority(BATCH):
+            return await supervisor.run_specialist_shared("financial", "AAPL", "营收")
+
+    async def _main():
+        await asyncio.gather(_batch(), supervisor.run_specialist_shared("financial", "AAPL", "营收"))
+
+    asyncio.run(_main())
+
+    assert runs["started"] == 2
@@ -0,0 +1,37 @@
+"""span 导出：批次边界不丢 span，停止时导出队列中剩余的 span"""
+
+import json
+
+from src.core import tracing
+from src.core.tracing import Span, SpanExporter
+
+
+def _exported_spans(path):
+    with open(path, encoding="utf-8") as f:
+        return [
+            span
+            for line in f
+            for resource in json.loads(line)["resourceSpans"]
+            for scope in resource["scopeSpans"]
+            for span in scope["spans"]
+        ]
+
+
+def test_full_batches_do_not_drop_spans(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_EXPORT_BATCH_SIZE", 10)
+    path = tmp_path / "spans.jsonl"
+    exporter = SpanExporter("test", path=str(path), interval=0.05)
+
+    spans = []
+    for i in range(35):
+        span = Span(f"span.{i}")
+        span.finish()
+        spans.append(span)
+        # 先全部放入队列再启动导出线程，保证跨越多个满批次
+        exporter._queue.put_nowait(span)
+    exporter._start()
+    exporter.shutdown()
+
+    exported = _exported_spans(path)
+    assert exporter.exported == 35
+    assert sorted(span["spanId"] for span in exported) == sorted(span.span_id for span in spans)
@@ -0,0 +1,16 @@
+"""估值工具：DCF 敏感性分析的上涨情景占比只统计有效情景"""
+
+from src.tools.valuation import dcf_sensitivity_analysis
+
+
+def test_upside_share_ignores_invalid_scenarios():
+    # 2% 的折现率低于 3% 的永续增长率，该列全部无效；其余 21 个情景中 17 个高于 $100
+    result = dcf_sensitivity_analysis.invoke({
+        "stock_ticker": "TEST",
+        "fcf": 5,
+        "current_price": 100,
+        "discount_rates": [0.02, 0.05, 0.08, 0.10],
+        "terminal_growth": 0.03,
+    })
+
+    assert "81% 的情景高于当前股价" in result